@@ -16,15 +16,16 @@ cd "$(dirname "$0")/.."
 echo "----------------------------------------"
 echo "TEST 1: Sequential Scraping (Baseline)"
 echo "----------------------------------------"
-echo "Command: python3 execution/scrape_apify.py --query 'Dentist' --location 'United States' --max_items 4000 --no-email-filter"
+echo "Command: python3 execution/scrape_apify_parallel.py --query 'Dentist' --location 'United States' --total_count 4000 --partitions 1 --no-email-filter"
 echo ""
 echo "Starting test..."
 START_SEQUENTIAL=$(date +%s)
 
-python3 execution/scrape_apify.py \
+python3 execution/scrape_apify_parallel.py \
   --query "Dentist" \
   --location "United States" \
-  --max_items 4000 \
+  --total_count 4000 \
+  --partitions 1 \
   --no-email-filter \
   --output_prefix "dentist_baseline"
 
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Lead scrape partitioning, shared by scrape_apify_parallel.py (CLI) and modal_webhook.py.
+
+Splits one large leads-finder pull into per-partition actor inputs, and identifies leads
+so results from overlapping partitions can be deduplicated.
+
+Partition strategies:
+    regions   Split the location: "United States" by state, or an explicit
+              "Texas; Florida; Ohio" list by its entries (default)
+    keywords  Split a comma-separated query ("dentist, orthodontist") by keyword
+
+Usage:
+    from lead_partitions import build_run_inputs, lead_key
+
+    run_inputs = build_run_inputs("Dentist", "United States", 4000, partitions=4)
+"""
+
+import re
+
+MAX_PARTITIONS = 8  # Concurrent actor runs per scrape (Apify account concurrency)
+STRATEGIES = ("regions", "keywords")
+
+# US states (+ DC) ordered by population, so dealing them round-robin gives evenly sized partitions
+US_STATES = [
+    "california", "texas", "florida", "new york", "pennsylvania", "illinois", "ohio", "georgia",
+    "north carolina", "michigan", "new jersey", "virginia", "washington", "arizona", "tennessee",
+    "massachusetts", "indiana", "missouri", "maryland", "wisconsin", "colorado", "minnesota",
+    "south carolina", "alabama", "louisiana", "kentucky", "oregon", "oklahoma", "connecticut",
+    "utah", "iowa", "nevada", "arkansas", "mississippi", "kansas", "new mexico", "nebraska",
+    "idaho", "west virginia", "hawaii", "new hampshire", "maine", "montana", "rhode island",
+    "delaware", "south dakota", "north dakota", "alaska", "district of columbia", "vermont", "wyoming",
+]
+US_ALIASES = {"united states", "united states of america", "usa", "us"}
+
+
+def split_evenly(values: list, partitions: int) -> list:
+    """Deal values round-robin into at most `partitions` non-empty groups."""
+    count = max(1, min(partitions, MAX_PARTITIONS, len(values)))
+    return [values[i::count] for i in range(count)]
+
+
+def build_run_inputs(query: str, location: str, total_count: int, partitions: int, strategy: str = "regions") -> list:
+    """One leads-finder actor input per partition; fetch counts add up to total_count."""
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown strategy: {strategy} (use one of {', '.join(STRATEGIES)})")
+
+    keywords = [k.strip() for k in query.split(",") if k.strip()]
+    locations = [loc.strip().lower() for loc in re.split(r"[;|]", location) if loc.strip()]
+
+    if strategy == "keywords":
+        shards = [(group, locations) for group in split_evenly(keywords, partitions)]
+    else:
+        if len(locations) == 1 and locations[0] in US_ALIASES and partitions > 1:
+            locations = US_STATES
+        shards = [(keywords, group) for group in split_evenly(locations, partitions)]
+
+    per_partition = -(-total_count // len(shards))  # Ceil so the partitions add up to the total
+    return [{
+        "fetch_count": per_partition,
+        "contact_job_title": shard_keywords,
+        "company_keywords": shard_keywords,
+        "contact_location": shard_locations,
+        "language": "en",
+    } for shard_keywords, shard_locations in shards]
+
+
+def normalize(value) -> str:
+    """Case- and whitespace-insensitive form of a name."""
+    return " ".join(str(value).lower().split())
+
+
+def lead_key(item: dict) -> str:
+    """Stable identity of a scraped lead: place/LinkedIn/email id, else normalized name + company."""
+    for field in ("placeId", "place_id", "linkedin", "linkedin_url", "email"):
+        if item.get(field):
+            return f"{field}:{str(item[field]).strip().lower()}"
+    name = item.get("full_name") or item.get("contact_name") or f"{item.get('first_name', '')} {item.get('last_name', '')}"
+    org = item.get("website") or item.get("company_website") or item.get("company_domain") or item.get("company_name") or item.get("title") or ""
+    return f"name:{normalize(name)}|{normalize(org)}"
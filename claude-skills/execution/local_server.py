@@ -7,18 +7,34 @@ Expose: ngrok http 8000
 
 Endpoints:
   GET  /               - Server info
-  POST /webhook/{slug} - Execute directive by slug
+  POST /webhook/{slug} - Execute directive by slug ({"async": true} queues it and returns a job id;
+                         retries with the same "idempotency_key", or the same body within a few
+                         minutes, reuse the original run)
   GET  /webhooks       - List available webhooks
+  GET  /jobs/{job_id}  - Status, steps and result of a webhook run (stored in .tmp/jobs.db)
+
+Concurrency: directives and scripts run on a worker pool (LOCAL_MAX_WORKERS, default 8)
+with at most LOCAL_MAX_IN_FLIGHT per slug (default 2, or "max_in_flight" in webhooks.json).
 """
 
+import asyncio
+import functools
+import hashlib
 import os
+import re
 import json
 import logging
+import sqlite3
 import subprocess
 import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
 from pathlib import Path
 from typing import Optional
-from datetime import datetime
+from datetime import datetime, timedelta
 
 from fastapi import FastAPI, HTTPException
 from fastapi.responses import JSONResponse
@@ -34,38 +50,101 @@ logger = logging.getLogger("local-orchestrator")
 
 app = FastAPI(title="Claude Orchestrator (Local)", version="1.0")
 
+# ============================================================================
+# GOOGLE CLIENTS (cached per process)
+# ============================================================================
+
+TOKEN_PATH = Path("token.json")
+
+# Access tokens are refreshed only when they are this close to expiring
+TOKEN_REFRESH_MARGIN = timedelta(minutes=5)
+
+_google_lock = threading.Lock()
+_google_credentials = {}  # token.json mtime -> Credentials (reloaded when the file changes)
+_google_refresh_lock = threading.Lock()  # Held while the access token refreshes (not the cache lock)
+_google_services = threading.local()  # Per-thread discovery clients (httplib2 is not thread-safe)
+
+
+def _parse_token_expiry(value):
+    """Parse the 'expiry' field of token.json (naive UTC, as google-auth expects)."""
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value.rstrip("Z").split(".")[0], "%Y-%m-%dT%H:%M:%S")
+    except ValueError:
+        return None
+
+
+def get_google_credentials():
+    """Return cached credentials from token.json, refreshing only near expiry. None if no token."""
+    from google.oauth2.credentials import Credentials
+    from google.auth.transport.requests import Request
+
+    if not TOKEN_PATH.exists():
+        return None
+
+    mtime = TOKEN_PATH.stat().st_mtime_ns
+    with _google_lock:
+        creds = _google_credentials.get(mtime)
+        if creds is None:
+            token_data = json.loads(TOKEN_PATH.read_text())
+            creds = Credentials(
+                token=token_data["token"],
+                refresh_token=token_data["refresh_token"],
+                token_uri=token_data["token_uri"],
+                client_id=token_data["client_id"],
+                client_secret=token_data["client_secret"],
+                scopes=token_data["scopes"],
+                expiry=_parse_token_expiry(token_data.get("expiry"))
+            )
+            _google_credentials.clear()
+            _google_credentials[mtime] = creds
+
+    with _google_refresh_lock:
+        near_expiry = creds.expiry is None or creds.expiry - datetime.utcnow() < TOKEN_REFRESH_MARGIN
+        if near_expiry and creds.refresh_token:
+            creds.refresh(Request())
+
+    return creds
+
+
+def _credentials_identity(creds) -> str:
+    """Cache key for credentials by token contents (id() can be reused once old credentials are collected)."""
+    raw = f"{creds.client_id}:{creds.refresh_token}"
+    return hashlib.sha256(raw.encode()).hexdigest()[:16]
+
+
+def get_google_service(api: str, version: str):
+    """Return a discovery client (built once per thread from the static discovery document; tool calls run on the long-lived _tool_pool)."""
+    from googleapiclient.discovery import build
+
+    creds = get_google_credentials()
+    if creds is None:
+        return None
+
+    services = getattr(_google_services, "cache", None)
+    if services is None:
+        services = _google_services.cache = {}
+
+    key = (api, version, _credentials_identity(creds))
+    if key not in services:
+        services[key] = build(api, version, credentials=creds, cache_discovery=False, static_discovery=True)
+    return services[key]
+
+
 # ============================================================================
 # TOOL IMPLEMENTATIONS
 # ============================================================================
 
 def send_email_impl(to: str, subject: str, body: str) -> dict:
     """Send email via Gmail API."""
-    from google.oauth2.credentials import Credentials
-    from googleapiclient.discovery import build
-    from google.auth.transport.requests import Request
     from email.mime.text import MIMEText
     import base64
 
-    # Load token
-    token_path = Path("token.json")
-    if not token_path.exists():
+    service = get_google_service("gmail", "v1")
+    if service is None:
         return {"error": "token.json not found"}
 
-    token_data = json.loads(token_path.read_text())
-
-    creds = Credentials(
-        token=token_data["token"],
-        refresh_token=token_data["refresh_token"],
-        token_uri=token_data["token_uri"],
-        client_id=token_data["client_id"],
-        client_secret=token_data["client_secret"],
-        scopes=token_data["scopes"]
-    )
-
-    if creds.expired and creds.refresh_token:
-        creds.refresh(Request())
-
-    service = build("gmail", "v1", credentials=creds)
     message = MIMEText(body)
     message["to"] = to
     message["subject"] = subject
@@ -78,29 +157,10 @@ def send_email_impl(to: str, subject: str, body: str) -> dict:
 
 def read_sheet_impl(spreadsheet_id: str, range: str) -> dict:
     """Read from Google Sheet."""
-    from google.oauth2.credentials import Credentials
-    from googleapiclient.discovery import build
-    from google.auth.transport.requests import Request
-
-    token_path = Path("token.json")
-    if not token_path.exists():
+    service = get_google_service("sheets", "v4")
+    if service is None:
         return {"error": "token.json not found"}
 
-    token_data = json.loads(token_path.read_text())
-
-    creds = Credentials(
-        token=token_data["token"],
-        refresh_token=token_data["refresh_token"],
-        token_uri=token_data["token_uri"],
-        client_id=token_data["client_id"],
-        client_secret=token_data["client_secret"],
-        scopes=token_data["scopes"]
-    )
-
-    if creds.expired and creds.refresh_token:
-        creds.refresh(Request())
-
-    service = build("sheets", "v4", credentials=creds)
     result = service.spreadsheets().values().get(
         spreadsheetId=spreadsheet_id,
         range=range
@@ -113,29 +173,10 @@ def read_sheet_impl(spreadsheet_id: str, range: str) -> dict:
 
 def update_sheet_impl(spreadsheet_id: str, range: str, values: list) -> dict:
     """Update Google Sheet."""
-    from google.oauth2.credentials import Credentials
-    from googleapiclient.discovery import build
-    from google.auth.transport.requests import Request
-
-    token_path = Path("token.json")
-    if not token_path.exists():
+    service = get_google_service("sheets", "v4")
+    if service is None:
         return {"error": "token.json not found"}
 
-    token_data = json.loads(token_path.read_text())
-
-    creds = Credentials(
-        token=token_data["token"],
-        refresh_token=token_data["refresh_token"],
-        token_uri=token_data["token_uri"],
-        client_id=token_data["client_id"],
-        client_secret=token_data["client_secret"],
-        scopes=token_data["scopes"]
-    )
-
-    if creds.expired and creds.refresh_token:
-        creds.refresh(Request())
-
-    service = build("sheets", "v4", credentials=creds)
     result = service.spreadsheets().values().update(
         spreadsheetId=spreadsheet_id,
         range=range,
@@ -154,6 +195,30 @@ TOOL_IMPLEMENTATIONS = {
     "update_sheet": lambda **kwargs: update_sheet_impl(**kwargs),
 }
 
+# Max tool calls run concurrently within one directive turn (override per webhook with "max_parallel_tools")
+MAX_PARALLEL_TOOLS = 4
+TOOL_POOL_WORKERS = 16  # Tool threads kept for the process's lifetime, so their per-thread Google clients stay warm
+
+_tool_pool = ThreadPoolExecutor(max_workers=TOOL_POOL_WORKERS, thread_name_prefix="tools")
+
+
+def execute_tool_call(tool_use, allowed_tools: list) -> tuple:
+    """Execute a single tool_use block. Returns (tool_result_json, is_error)."""
+    # Security check
+    if tool_use.name not in allowed_tools:
+        return json.dumps({"error": f"Tool '{tool_use.name}' not permitted"}), True
+
+    impl = TOOL_IMPLEMENTATIONS.get(tool_use.name)
+    if not impl:
+        return json.dumps({"error": f"No implementation for {tool_use.name}"}), True
+
+    try:
+        return json.dumps(impl(**tool_use.input)), False
+    except Exception as e:
+        logger.error(f"Tool error ({tool_use.name}): {e}")
+        return json.dumps({"error": str(e)}), True
+
+
 # Tool definitions for Claude
 ALL_TOOLS = {
     "send_email": {
@@ -346,12 +411,135 @@ def run_script(script_name: str, input_data: dict) -> dict:
 # CORE FUNCTIONS
 # ============================================================================
 
+# Prompt caching: tool schemas and the directive prompt get fixed cache breakpoints,
+# the latest tool results get a rolling one (max 4 breakpoints per request).
+CACHE_CONTROL = {"type": "ephemeral"}
+
+
+def cached_tools(tools: list) -> list:
+    """Copy tool schemas with a cache breakpoint on the last one (caches the full tool prefix)."""
+    if not tools:
+        return tools
+    return tools[:-1] + [{**tools[-1], "cache_control": CACHE_CONTROL}]
+
+
+def set_rolling_cache_breakpoint(messages: list):
+    """Move the rolling cache breakpoint to the last block of the latest user message."""
+    for message in messages[1:]:  # The first message keeps its fixed breakpoint
+        if message["role"] == "user" and isinstance(message["content"], list):
+            for block in message["content"]:
+                block.pop("cache_control", None)
+
+    last = messages[-1]
+    if last["role"] == "user" and isinstance(last["content"], list) and last["content"]:
+        last["content"][-1]["cache_control"] = CACHE_CONTROL
+
+
+# Conversation compaction: once the prompt of a directive run grows past the context budget,
+# older turns lose their thinking blocks and their tool results are truncated. The most recent
+# turns stay verbatim so tool_use/tool_result pairing and the last thinking block remain valid.
+# Compaction overshoots (down to COMPACT_TARGET_RATIO of the budget) so it happens rarely: every
+# compaction rewrites history and invalidates the prompt cache from the first changed message on.
+CONTEXT_BUDGET_TOKENS = 60000  # Override per webhook with "context_budget_tokens"
+COMPACT_TARGET_RATIO = 0.5  # Share of the budget a compaction aims to bring the context down to
+COMPACT_KEEP_TURNS = 2
+COMPACTED_RESULT_CHARS = 1500
+COMPACTED_RESULT_MIN_CHARS = 300  # Tighter truncation when the first pass doesn't free enough
+CHARS_PER_TOKEN = 4  # Rough conversion for turning a token excess into characters to remove
+COMPACTED_MARKER = re.compile(r"\.\.\. \[compacted: (\d+) chars omitted\]$")
+
+
+def context_tokens(usage) -> int:
+    """Size of the conversation after a response: full prompt (cached or not) plus the new output."""
+    return (
+        usage.input_tokens
+        + (getattr(usage, "cache_read_input_tokens", 0) or 0)
+        + (getattr(usage, "cache_creation_input_tokens", 0) or 0)
+        + usage.output_tokens
+    )
+
+
+def truncate_result(content: str, limit: int) -> tuple:
+    """Truncate a tool result to limit chars (keeping an earlier compaction's count). Returns (content, chars removed)."""
+    marker = COMPACTED_MARKER.search(content)
+    body, omitted = (content[:marker.start()], int(marker.group(1))) if marker else (content, 0)
+    if len(body) <= limit:
+        return content, 0
+    return body[:limit] + f"... [compacted: {omitted + len(body) - limit} chars omitted]", len(body) - limit
+
+
+def compact_messages(messages: list, keep_turns: int = COMPACT_KEEP_TURNS, min_removed: int = 0) -> int:
+    """
+    Compact all but the last keep_turns assistant/tool_result pairs in place.
+    messages[0] is the directive prompt and is never touched. Returns characters removed.
+    If a pass frees fewer than min_removed characters, later passes truncate results harder
+    and then compact all but the latest turn.
+    """
+    removed = 0
+    passes = [(keep_turns, COMPACTED_RESULT_CHARS), (keep_turns, COMPACTED_RESULT_MIN_CHARS), (1, COMPACTED_RESULT_MIN_CHARS)]
+
+    for keep, result_chars in passes:
+        cutoff = len(messages) - 2 * keep
+
+        for idx in range(1, max(cutoff, 1)):
+            message = messages[idx]
+
+            if message["role"] == "assistant":
+                # Drop stale thinking - tool_use blocks must stay so results keep their pairing
+                kept = []
+                for block in message["content"]:
+                    if getattr(block, "type", None) in ("thinking", "redacted_thinking"):
+                        removed += len(getattr(block, "thinking", "") or "")
+                    else:
+                        kept.append(block)
+                message["content"] = kept
+
+            elif isinstance(message["content"], list):
+                for block in message["content"]:
+                    if block.get("type") == "tool_result" and isinstance(block.get("content"), str):
+                        block["content"], cut = truncate_result(block["content"], result_chars)
+                        removed += cut
+
+        if removed >= min_removed:
+            break
+
+    return removed
+
+
+def add_usage(totals: dict, usage):
+    """Accumulate an API response's usage (including cache reads/writes) into totals."""
+    totals["input_tokens"] += usage.input_tokens
+    totals["output_tokens"] += usage.output_tokens
+    totals["cache_read_input_tokens"] += getattr(usage, "cache_read_input_tokens", 0) or 0
+    totals["cache_creation_input_tokens"] += getattr(usage, "cache_creation_input_tokens", 0) or 0
+
+
+_file_cache = {}  # (path, parser) -> (mtime_ns, parsed value)
+_file_cache_lock = threading.Lock()
+
+
+def read_cached(path: Path, parse=None):
+    """Return the (optionally parsed) contents of path, re-reading only when its mtime changes."""
+    mtime = path.stat().st_mtime_ns
+    key = (str(path), parse)
+    with _file_cache_lock:
+        cached = _file_cache.get(key)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    text = path.read_text()
+    value = parse(text) if parse else text
+    with _file_cache_lock:
+        _file_cache[key] = (mtime, value)
+    return value
+
+
 def load_webhook_config() -> dict:
-    """Load webhook configuration."""
+    """Load webhook configuration (edits to webhooks.json are picked up without a restart)."""
     config_path = Path("execution/webhooks.json")
     if not config_path.exists():
         return {"webhooks": {}}
-    return json.loads(config_path.read_text())
+    return read_cached(config_path, json.loads)
 
 
 def load_directive(directive_name: str) -> str:
@@ -359,7 +547,7 @@ def load_directive(directive_name: str) -> str:
     directive_path = Path(f"directives/{directive_name}.md")
     if not directive_path.exists():
         raise FileNotFoundError(f"Directive not found: {directive_name}")
-    return directive_path.read_text()
+    return read_cached(directive_path)
 
 
 def run_directive(
@@ -367,9 +555,12 @@ def run_directive(
     directive_content: str,
     input_data: dict,
     allowed_tools: list,
-    max_turns: int = 15
+    max_turns: int = 15,
+    max_parallel_tools: int = MAX_PARALLEL_TOOLS,
+    context_budget_tokens: int = CONTEXT_BUDGET_TOKENS,
+    job_id: str = None
 ) -> dict:
-    """Execute a directive with scoped tools."""
+    """Execute a directive with scoped tools. Tool calls within a turn run concurrently and become job steps."""
     client = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
 
     # Build prompt
@@ -389,14 +580,16 @@ def run_directive(
 Execute the directive now."""
 
     # Filter tools
-    tools = [ALL_TOOLS[t] for t in allowed_tools if t in ALL_TOOLS]
+    tools = cached_tools([ALL_TOOLS[t] for t in allowed_tools if t in ALL_TOOLS])
 
-    messages = [{"role": "user", "content": prompt}]
+    # Directive + input never change during the run - cache them with the tools
+    messages = [{"role": "user", "content": [{"type": "text", "text": prompt, "cache_control": CACHE_CONTROL}]}]
     conversation_log = []
     thinking_log = []
-    total_input_tokens = 0
-    total_output_tokens = 0
+    totals = {"input_tokens": 0, "output_tokens": 0, "cache_read_input_tokens": 0, "cache_creation_input_tokens": 0}
     turn_count = 0
+    model_calls = 0  # Reported as usage turns: every API call, including the final answer
+    compactions = 0
 
     logger.info(f"🎯 Executing directive: {slug}")
 
@@ -408,8 +601,8 @@ Execute the directive now."""
         thinking={"type": "enabled", "budget_tokens": 32000}
     )
 
-    total_input_tokens += response.usage.input_tokens
-    total_output_tokens += response.usage.output_tokens
+    add_usage(totals, response.usage)
+    model_calls += 1
 
     while response.stop_reason == "tool_use" and turn_count < max_turns:
         turn_count += 1
@@ -420,42 +613,44 @@ Execute the directive now."""
                 thinking_log.append({"turn": turn_count, "thinking": block.thinking})
                 logger.info(f"💭 Turn {turn_count} thinking: {block.thinking[:100]}...")
 
-        # Find tool call
-        tool_use = next((b for b in response.content if b.type == "tool_use"), None)
-        if not tool_use:
+        # Collect every tool call in this turn
+        tool_uses = [b for b in response.content if b.type == "tool_use"]
+        if not tool_uses:
             break
 
-        # Security check
-        if tool_use.name not in allowed_tools:
-            tool_result = json.dumps({"error": f"Tool '{tool_use.name}' not permitted"})
-            is_error = True
-        else:
+        for tool_use in tool_uses:
             logger.info(f"🔧 Turn {turn_count} - {tool_use.name}: {tool_use.input}")
-            conversation_log.append({"turn": turn_count, "tool": tool_use.name, "input": tool_use.input})
-
-            # Execute tool
-            is_error = False
-            try:
-                impl = TOOL_IMPLEMENTATIONS.get(tool_use.name)
-                if impl:
-                    result = impl(**tool_use.input)
-                    tool_result = json.dumps(result)
-                else:
-                    tool_result = json.dumps({"error": f"No implementation for {tool_use.name}"})
-                    is_error = True
-            except Exception as e:
-                logger.error(f"Tool error: {e}")
-                tool_result = json.dumps({"error": str(e)})
-                is_error = True
-
-            conversation_log[-1]["result"] = tool_result
-            logger.info(f"{'❌' if is_error else '✅'} Result: {tool_result[:200]}")
-
-        # Continue conversation
+            job_step(job_id, f"Turn {turn_count}: {tool_use.name}")
+
+        # Execute tool calls concurrently on the shared tool pool, at most max_parallel_tools at a time
+        # (results keep the order Claude requested them in)
+        workers = max(1, min(max_parallel_tools, TOOL_POOL_WORKERS))
+        outcomes = []
+        for i in range(0, len(tool_uses), workers):
+            outcomes.extend(_tool_pool.map(lambda b: execute_tool_call(b, allowed_tools), tool_uses[i:i + workers]))
+
+        tool_results = []
+        for tool_use, (tool_result, is_error) in zip(tool_uses, outcomes):
+            if tool_use.name in allowed_tools:
+                conversation_log.append({"turn": turn_count, "tool": tool_use.name, "input": tool_use.input, "result": tool_result})
+            logger.info(f"{'❌' if is_error else '✅'} {tool_use.name} result: {tool_result[:200]}")
+
+            tool_results.append({"type": "tool_result", "tool_use_id": tool_use.id, "content": tool_result, "is_error": is_error})
+
+        # Continue conversation - all tool results go back in a single user message
         messages.append({"role": "assistant", "content": response.content})
-        messages.append({"role": "user", "content": [
-            {"type": "tool_result", "tool_use_id": tool_use.id, "content": tool_result}
-        ]})
+        messages.append({"role": "user", "content": tool_results})
+
+        # Keep per-turn input flat on long runs
+        context_size = context_tokens(response.usage)
+        if context_size > context_budget_tokens:
+            excess = context_size - int(context_budget_tokens * COMPACT_TARGET_RATIO)
+            removed = compact_messages(messages, min_removed=excess * CHARS_PER_TOKEN)
+            if removed:
+                compactions += 1
+                logger.info(f"🗜️ Compacted context at turn {turn_count} ({context_size} tokens, {removed} chars removed)")
+
+        set_rolling_cache_breakpoint(messages)
 
         response = client.messages.create(
             model="claude-opus-4-5-20251101",
@@ -465,8 +660,8 @@ Execute the directive now."""
             thinking={"type": "enabled", "budget_tokens": 32000}
         )
 
-        total_input_tokens += response.usage.input_tokens
-        total_output_tokens += response.usage.output_tokens
+        add_usage(totals, response.usage)
+        model_calls += 1
 
     # Extract final response
     final_text = ""
@@ -476,13 +671,12 @@ Execute the directive now."""
         if block.type == "thinking":
             thinking_log.append({"turn": "final", "thinking": block.thinking})
 
-    usage = {
-        "input_tokens": total_input_tokens,
-        "output_tokens": total_output_tokens,
-        "turns": turn_count
-    }
+    usage = {**totals, "turns": model_calls, "compactions": compactions}
 
-    logger.info(f"✨ Complete - {usage['turns']} turns, {usage['input_tokens']}→{usage['output_tokens']} tokens")
+    logger.info(
+        f"✨ Complete - {usage['turns']} turns, {usage['input_tokens']}→{usage['output_tokens']} tokens "
+        f"(cache: {usage['cache_read_input_tokens']} read / {usage['cache_creation_input_tokens']} written)"
+    )
 
     return {
         "response": final_text,
@@ -492,6 +686,211 @@ Execute the directive now."""
     }
 
 
+# ============================================================================
+# JOBS (SQLite, survives restarts)
+# ============================================================================
+
+# status: queued -> running -> completed | failed
+JOBS_DB = Path(".tmp/jobs.db")
+JOB_MAX_STEPS = 200  # Keep only the newest steps so chatty directives don't grow rows unbounded
+JOB_JSON_FIELDS = ("params", "steps", "result")
+
+
+def _jobs_db() -> sqlite3.Connection:
+    """Open the jobs database, creating it on first use (one connection per call; workers are threads)."""
+    JOBS_DB.parent.mkdir(exist_ok=True)
+    conn = sqlite3.connect(JOBS_DB, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            job_id TEXT PRIMARY KEY,
+            kind TEXT,
+            status TEXT,
+            params TEXT,
+            steps TEXT,
+            result TEXT,
+            error TEXT,
+            created_at TEXT,
+            updated_at TEXT
+        )
+    """)
+    conn.execute("CREATE TABLE IF NOT EXISTS idempotency (key TEXT PRIMARY KEY, job_id TEXT, claimed_at REAL)")
+    return conn
+
+
+def job_create(kind: str, params: dict = None, job_id: str = None) -> str:
+    """Register a queued job (under job_id if already claimed) and return its id."""
+    job_id = job_id or uuid.uuid4().hex[:16]
+    now = datetime.utcnow().isoformat()
+    with closing(_jobs_db()) as conn, conn:
+        conn.execute(
+            "INSERT INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (job_id, kind, "queued", json.dumps(params or {}), "[]", None, None, now, now)
+        )
+    return job_id
+
+
+def job_get(job_id: str):
+    """Return a job record as a dict, or None if unknown."""
+    with closing(_jobs_db()) as conn:
+        row = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+    if row is None:
+        return None
+    job = dict(row)
+    for field in JOB_JSON_FIELDS:
+        job[field] = json.loads(job[field]) if job[field] else None
+    return job
+
+
+def job_update(job_id: str, **fields):
+    """Update columns of a job record. No-op without a job id."""
+    if not job_id:
+        return
+    fields["updated_at"] = datetime.utcnow().isoformat()
+    for field in JOB_JSON_FIELDS:
+        if field in fields:
+            fields[field] = json.dumps(fields[field], default=str)
+    assignments = ", ".join(f"{column} = ?" for column in fields)
+    with closing(_jobs_db()) as conn, conn:
+        conn.execute(f"UPDATE jobs SET {assignments} WHERE job_id = ?", (*fields.values(), job_id))
+
+
+def job_step(job_id: str, step: str):
+    """Append a progress step and mark the job running."""
+    if not job_id:
+        return
+    job = job_get(job_id) or {}
+    steps = (job.get("steps") or []) + [{"step": step, "at": datetime.utcnow().isoformat()}]
+    job_update(job_id, status="running", steps=steps[-JOB_MAX_STEPS:])
+
+
+def job_finish(job_id: str, result: dict) -> dict:
+    """Record a job's final result (status "error" marks it failed) and return the result."""
+    failed = result.get("status") == "error"
+    job_update(job_id, status="failed" if failed else "completed", result=result,
+               error=result.get("error") if failed else None)
+    return result
+
+
+# ============================================================================
+# IDEMPOTENCY (dedupe webhook retries)
+# ============================================================================
+
+# A retried request attaches to the original job: in-flight runs are waited on, completed ones
+# replayed, failed or dead ones run again.
+# - In-flight runs hold a lease: a job not updated (job_update/job_step) for IDEMPOTENCY_LEASE
+#   seconds is treated as dead (server restart, crashed run).
+# - A client "idempotency_key" replays a completed result for IDEMPOTENCY_TTL.
+# - Without one, the body is hashed, but only to catch transport retries: an identical request
+#   after IDEMPOTENCY_RETRY_WINDOW runs again.
+IDEMPOTENCY_TTL = 24 * 3600  # Seconds a completed result is replayed for a client-supplied key
+IDEMPOTENCY_RETRY_WINDOW = 300  # Seconds an identical body (no key) counts as a retry
+IDEMPOTENCY_LEASE = 900  # Seconds without a job update before an in-flight claim is considered dead
+IDEMPOTENCY_WAIT = 600  # Max seconds a synchronous retry waits on the original run
+IDEMPOTENCY_IGNORED_FIELDS = ("idempotency_key", "async")  # Don't change what the request does
+
+
+def make_idempotency_key(scope: str, request: dict, client_key: str = None) -> str:
+    """The client's key if given, otherwise a hash of the canonical request."""
+    if client_key:
+        return f"{scope}:key:{client_key}"
+    fields = {k: v for k, v in request.items() if k not in IDEMPOTENCY_IGNORED_FIELDS}
+    canonical = json.dumps(fields, sort_keys=True, default=str)
+    return f"{scope}:body:{hashlib.sha256(canonical.encode()).hexdigest()}"
+
+
+def claim_is_live(key: str, claimed_at: float, job) -> bool:
+    """Whether a claim still owns its key: not failed, lease alive, result within its replay window."""
+    now = time.time()
+    replay_ttl = IDEMPOTENCY_TTL if ":key:" in key else IDEMPOTENCY_RETRY_WINDOW
+    if now - claimed_at > replay_ttl:
+        return False
+    if job is None:  # Claimed, job not created yet
+        return now - claimed_at <= IDEMPOTENCY_LEASE
+    if job["status"] == "failed":
+        return False
+    if job["status"] == "completed":
+        return True
+    idle = (datetime.utcnow() - datetime.fromisoformat(job["updated_at"])).total_seconds()
+    return idle <= IDEMPOTENCY_LEASE
+
+
+def claim_idempotency(key: str) -> tuple:
+    """Return (job_id, is_new). When is_new the caller creates job_id and runs it; otherwise attach to job_id."""
+    job_id = uuid.uuid4().hex[:16]
+    now = time.time()
+    with closing(_jobs_db()) as conn, conn:
+        inserted = conn.execute(
+            "INSERT OR IGNORE INTO idempotency VALUES (?, ?, ?)", (key, job_id, now)
+        ).rowcount
+        if inserted:
+            return job_id, True
+
+        existing_id, claimed_at = conn.execute(
+            "SELECT job_id, claimed_at FROM idempotency WHERE key = ?", (key,)
+        ).fetchone()
+        job = conn.execute("SELECT status, updated_at FROM jobs WHERE job_id = ?", (existing_id,)).fetchone()
+        if claim_is_live(key, claimed_at, job):
+            return existing_id, False
+
+        # Compare-and-swap on the dead owner: if another retry took over first, attach to it
+        taken = conn.execute(
+            "UPDATE idempotency SET job_id = ?, claimed_at = ? WHERE key = ? AND job_id = ?",
+            (job_id, now, key, existing_id)
+        ).rowcount
+        if not taken:
+            return conn.execute("SELECT job_id FROM idempotency WHERE key = ?", (key,)).fetchone()[0], False
+    return job_id, True
+
+
+async def replay_job(job_id: str, wait: float = 0) -> dict:
+    """Response for a duplicate request, waiting up to `wait` seconds for the original run to finish."""
+    deadline = time.time() + wait
+    job = job_get(job_id)
+    while job and job["status"] in ("queued", "running") and time.time() < deadline:
+        await asyncio.sleep(1)
+        job = job_get(job_id)
+
+    if job and job["status"] in ("completed", "failed"):
+        return {**job["result"], "job_id": job_id, "idempotent_replay": True}
+    return {"status": job["status"] if job else "queued", "job_id": job_id, "idempotent_replay": True, "poll": f"/jobs/{job_id}"}
+
+
+# ============================================================================
+# CONCURRENCY
+# ============================================================================
+
+# run_directive / run_script block for minutes (Claude calls, subprocesses), so they run on
+# a bounded worker pool instead of the event loop. Each slug also has its own in-flight cap;
+# extra requests for a busy slug wait their turn without holding a worker.
+MAX_WORKERS = int(os.getenv("LOCAL_MAX_WORKERS", "8"))
+MAX_IN_FLIGHT_PER_SLUG = int(os.getenv("LOCAL_MAX_IN_FLIGHT", "2"))  # Override per webhook with "max_in_flight"
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="webhook")
+_slug_semaphores = {}  # (slug, limit) -> asyncio.Semaphore
+
+
+def slug_semaphore(slug: str, limit: int) -> asyncio.Semaphore:
+    """Semaphore capping concurrent runs of one slug (a changed limit gets a fresh semaphore)."""
+    key = (slug, limit)
+    if key not in _slug_semaphores:
+        _slug_semaphores[key] = asyncio.Semaphore(limit)
+    return _slug_semaphores[key]
+
+
+async def run_blocking(semaphore: asyncio.Semaphore, fn, *args, **kwargs):
+    """Run a blocking call on the worker pool once the slug's semaphore admits it."""
+    async with semaphore:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_executor, functools.partial(fn, *args, **kwargs))
+
+
+@app.on_event("shutdown")
+def shutdown_executor():
+    """Let in-flight runs finish before the process exits."""
+    _executor.shutdown(wait=True)
+
+
 # ============================================================================
 # ENDPOINTS
 # ============================================================================
@@ -504,7 +903,8 @@ async def root():
         "status": "running",
         "endpoints": {
             "webhook": "POST /webhook/{slug}",
-            "list": "GET /webhooks"
+            "list": "GET /webhooks",
+            "job": "GET /jobs/{job_id}"
         }
     }
 
@@ -528,47 +928,36 @@ async def list_webhooks():
     }
 
 
-@app.post("/webhook/{slug}")
-async def execute_webhook(slug: str, payload: Optional[dict] = None):
-    """Execute a directive or script by slug."""
-    payload = payload or {}
-    input_data = payload.get("data", payload)
-    max_turns = payload.get("max_turns", 15)
-
-    # Load config
-    config = load_webhook_config()
-    webhooks = config.get("webhooks", {})
-
-    if slug not in webhooks:
-        raise HTTPException(
-            status_code=404,
-            detail=f"Unknown webhook slug: {slug}"
-        )
-
-    webhook_config = webhooks[slug]
+async def process_webhook(slug: str, webhook_config: dict, input_data: dict, max_turns: int, job_id: str) -> dict:
+    """Run a webhook's script or directive on the worker pool and record the outcome on job_id."""
     directive_name = webhook_config.get("directive")
     script_name = webhook_config.get("script")
+    semaphore = slug_semaphore(slug, webhook_config.get("max_in_flight", MAX_IN_FLIGHT_PER_SLUG))
 
     # Handle script-type webhooks
     if script_name:
         logger.info(f"🔧 Running script: {script_name}")
         try:
-            result = run_script(script_name, input_data)
-            return {
+            job_step(job_id, f"Running {script_name}")
+            result = await run_blocking(semaphore, run_script, script_name, input_data)
+            return job_finish(job_id, {
                 "status": result.get("status", "completed"),
+                "job_id": job_id,
                 "slug": slug,
                 "mode": "local",
                 "type": "script",
                 "script": script_name,
                 "result": result,
                 "timestamp": datetime.utcnow().isoformat()
-            }
+            })
         except Exception as e:
             logger.error(f"Script error: {e}")
+            job_finish(job_id, {"status": "error", "error": str(e)})
             raise HTTPException(status_code=500, detail=str(e))
 
     # Handle directive-type webhooks
     if not directive_name:
+        job_finish(job_id, {"status": "error", "error": "Webhook must have either 'directive' or 'script' defined"})
         raise HTTPException(
             status_code=400,
             detail="Webhook must have either 'directive' or 'script' defined"
@@ -579,19 +968,27 @@ async def execute_webhook(slug: str, payload: Optional[dict] = None):
     try:
         directive_content = load_directive(directive_name)
     except FileNotFoundError as e:
+        job_finish(job_id, {"status": "error", "error": str(e)})
         raise HTTPException(status_code=404, detail=str(e))
 
     try:
-        result = run_directive(
+        job_update(job_id, status="running")
+        result = await run_blocking(
+            semaphore,
+            run_directive,
             slug=slug,
             directive_content=directive_content,
             input_data=input_data,
             allowed_tools=allowed_tools,
-            max_turns=max_turns
+            max_turns=max_turns,
+            max_parallel_tools=webhook_config.get("max_parallel_tools", MAX_PARALLEL_TOOLS),
+            context_budget_tokens=webhook_config.get("context_budget_tokens", CONTEXT_BUDGET_TOKENS),
+            job_id=job_id
         )
 
-        return {
+        return job_finish(job_id, {
             "status": "success",
+            "job_id": job_id,
             "slug": slug,
             "mode": "local",
             "type": "directive",
@@ -601,12 +998,67 @@ async def execute_webhook(slug: str, payload: Optional[dict] = None):
             "conversation": result["conversation"],
             "usage": result["usage"],
             "timestamp": datetime.utcnow().isoformat()
-        }
+        })
     except Exception as e:
         logger.error(f"Error: {e}")
+        job_finish(job_id, {"status": "error", "error": str(e)})
         raise HTTPException(status_code=500, detail=str(e))
 
 
+_background_jobs = set()  # Strong refs so queued tasks aren't garbage-collected mid-run
+
+
+@app.post("/webhook/{slug}")
+async def execute_webhook(slug: str, payload: Optional[dict] = None):
+    """Execute a directive or script by slug. With {"async": true}, queue it and return the job id."""
+    payload = payload or {}
+    input_data = payload.get("data", payload)
+    max_turns = payload.get("max_turns", 15)
+
+    # Load config
+    config = load_webhook_config()
+    webhooks = config.get("webhooks", {})
+
+    if slug not in webhooks:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Unknown webhook slug: {slug}"
+        )
+
+    # Upstream retries attach to the original run instead of re-spending tokens / re-sending emails
+    key = make_idempotency_key(f"webhook:{slug}", payload, payload.get("idempotency_key"))
+    job_id, is_new = claim_idempotency(key)
+    if not is_new:
+        logger.info(f"♻️ Duplicate request for {slug} → job {job_id}")
+        return await replay_job(job_id, wait=0 if payload.get("async") else IDEMPOTENCY_WAIT)
+
+    job_create("webhook", {"slug": slug}, job_id=job_id)
+    run = process_webhook(slug, webhooks[slug], input_data, max_turns, job_id)
+
+    if not payload.get("async"):
+        return await run
+
+    async def run_in_background():
+        try:
+            await run
+        except HTTPException:
+            pass  # Already recorded on the job
+
+    task = asyncio.create_task(run_in_background())
+    _background_jobs.add(task)
+    task.add_done_callback(_background_jobs.discard)
+    return JSONResponse({"status": "queued", "job_id": job_id, "slug": slug, "poll": f"/jobs/{job_id}"}, status_code=202)
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Status, steps and result of a webhook run."""
+    job = job_get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return job
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
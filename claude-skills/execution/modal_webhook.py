@@ -3,11 +3,13 @@ Modal webhook server for event-driven Claude orchestration.
 
 Deploy: modal deploy execution/modal_webhook.py
 Logs:   modal logs claude-orchestrator
+Warm:   MODAL_MIN_CONTAINERS='{"scrape_leads": 1}' modal deploy execution/modal_webhook.py
 
 Endpoints:
   GET  /test-email              - Test email (hardcoded)
   POST /d/{slug}                - Execute a specific directive by slug
   GET  /list                    - List available webhook slugs
+  GET  /jobs/{job_id}           - Status and result of a queued or finished run
 
 Configure webhooks in execution/webhooks.json
 Each slug maps to exactly ONE directive (security isolation).
@@ -17,14 +19,30 @@ import modal
 import os
 import json
 import base64
+import contextvars
+import hashlib
 import logging
+import queue
+import random
+import threading
+import time
+import uuid
+import urllib.error
 import urllib.request
 import urllib.parse
 import re
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from email.mime.text import MIMEText
 from datetime import datetime, timedelta
 from pathlib import Path
 
+# Helpers shared with the execution/ CLI scripts: next to this file locally, /app/execution in the container
+sys.path.append("/app/execution")
+from lead_partitions import STRATEGIES as PARTITION_STRATEGIES, build_run_inputs, lead_key
+from proposal_pipeline import create_pandadoc_document, extract_proposal_data
+from sheet_writer import RateLimiter, SheetWriter, column_letter
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("claude-orchestrator")
@@ -67,17 +85,213 @@ ALL_SECRETS = [
     modal.Secret.from_name("pandadoc-secret"),
 ]
 
+# Warm containers kept per endpoint (0 = scale to zero between requests).
+# Override at deploy time without editing code, e.g.
+#   MODAL_MIN_CONTAINERS='{"scrape_leads": 1, "youtube_outliers": 1}' modal deploy execution/modal_webhook.py
+MIN_CONTAINERS = {
+    "directive": 0,
+    "directive_background": 0,
+    "general_agent": 0,
+    "scrape_leads": 0,
+    "scrape_leads_background": 0,
+    "generate_proposal": 0,
+    "create_proposal_from_transcript": 0,
+    "generate_proposals_batch": 0,
+    "youtube_outliers": 0,
+    "youtube_outliers_background": 0,
+}
+MIN_CONTAINERS.update(json.loads(os.getenv("MODAL_MIN_CONTAINERS") or "{}"))
+
+
+def endpoint_label(name: str) -> str:
+    """URL label a function-style endpoint called `name` would get, so class endpoints keep their URLs."""
+    return f"{app.name}-{name.replace('_', '-')}"
+
+
 # ============================================================================
-# HELPER FUNCTIONS
+# GOOGLE CLIENTS (cached per container)
 # ============================================================================
 
-def column_letter(n):
-    """Convert column index (0-based) to Excel-style column letter (A, B, ... Z, AA, AB, ...)."""
-    result = ""
-    while n >= 0:
-        result = chr(65 + (n % 26)) + result
-        n = n // 26 - 1
-    return result
+# Access tokens are refreshed only when they are this close to expiring
+TOKEN_REFRESH_MARGIN = timedelta(minutes=5)
+
+_google_lock = threading.Lock()
+_google_credentials = {}  # token identity -> Credentials (shared, refreshed in place)
+_google_refresh_locks = {}  # token identity -> Lock held while that token refreshes
+_gspread_clients = {}  # token identity -> gspread.Client
+_google_services = threading.local()  # Per-thread discovery clients (httplib2 is not thread-safe)
+
+
+def _token_identity(token_data: dict) -> str:
+    """Cache key for a Google token that doesn't keep the secret itself around as a key."""
+    raw = f"{token_data.get('client_id')}:{token_data.get('refresh_token')}"
+    return hashlib.sha256(raw.encode()).hexdigest()[:16]
+
+
+def _parse_token_expiry(value):
+    """Parse the 'expiry' field of an authorized-user token (naive UTC, as google-auth expects)."""
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value.rstrip("Z").split(".")[0], "%Y-%m-%dT%H:%M:%S")
+    except ValueError:
+        return None
+
+
+def get_google_credentials(token_data: dict):
+    """Return cached OAuth credentials for token_data, refreshing only near expiry."""
+    from google.oauth2.credentials import Credentials
+    from google.auth.transport.requests import Request
+
+    key = _token_identity(token_data)
+    with _google_lock:
+        creds = _google_credentials.get(key)
+        if creds is None:
+            creds = Credentials(
+                token=token_data["token"],
+                refresh_token=token_data["refresh_token"],
+                token_uri=token_data["token_uri"],
+                client_id=token_data["client_id"],
+                client_secret=token_data["client_secret"],
+                scopes=token_data["scopes"],
+                expiry=_parse_token_expiry(token_data.get("expiry"))
+            )
+            _google_credentials[key] = creds
+        refresh_lock = _google_refresh_locks.setdefault(key, threading.Lock())
+
+    # Unknown expiry (first use) or about to expire -> refresh once for everyone using this token.
+    # The network call holds only this token's lock, not the cache lock.
+    with refresh_lock:
+        near_expiry = creds.expiry is None or creds.expiry - datetime.utcnow() < TOKEN_REFRESH_MARGIN
+        if near_expiry and creds.refresh_token:
+            creds.refresh(Request())
+
+    return creds
+
+
+def get_google_service(api: str, version: str, token_data: dict):
+    """Return a discovery client (built once per thread from the static discovery document; tool calls run on the long-lived _tool_pool)."""
+    from googleapiclient.discovery import build
+
+    creds = get_google_credentials(token_data)
+
+    services = getattr(_google_services, "cache", None)
+    if services is None:
+        services = _google_services.cache = {}
+
+    key = (api, version, _token_identity(token_data))
+    if key not in services:
+        services[key] = build(api, version, credentials=creds, cache_discovery=False, static_discovery=True)
+    return services[key]
+
+
+def get_gspread_client(token_data: dict):
+    """Return a cached gspread client (its authorized session refreshes the shared credentials)."""
+    import gspread
+
+    creds = get_google_credentials(token_data)
+
+    key = _token_identity(token_data)
+    with _google_lock:
+        if key not in _gspread_clients:
+            _gspread_clients[key] = gspread.authorize(creds)
+        return _gspread_clients[key]
+
+
+# ============================================================================
+# API CLIENTS (cached per container)
+# ============================================================================
+
+_api_clients = {}
+_api_clients_lock = threading.Lock()
+
+
+def get_anthropic_client(api_key: str = None):
+    """Return the container's Anthropic client (thread-safe, reuses its connection pool)."""
+    import anthropic
+
+    api_key = api_key or os.getenv("ANTHROPIC_API_KEY")
+    key = ("anthropic", api_key)
+    with _api_clients_lock:
+        if key not in _api_clients:
+            _api_clients[key] = anthropic.Anthropic(api_key=api_key)
+        return _api_clients[key]
+
+
+def get_apify_client(api_token: str = None):
+    """Return the container's Apify client."""
+    from apify_client import ApifyClient
+
+    api_token = api_token or os.getenv("APIFY_API_TOKEN")
+    key = ("apify", api_token)
+    with _api_clients_lock:
+        if key not in _api_clients:
+            _api_clients[key] = ApifyClient(api_token)
+        return _api_clients[key]
+
+
+def get_http_session(pool_size: int = 20):
+    """Return the container's pooled requests.Session (keep-alive across calls and threads)."""
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    with _api_clients_lock:
+        if "http" not in _api_clients:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _api_clients["http"] = session
+        return _api_clients["http"]
+
+
+DICT_READ_CONCURRENCY = 16  # modal.Dict lookups in flight at once (it has no multi-get)
+
+
+def dict_get_many(store, keys) -> dict:
+    """{key: value} for the keys present in a modal.Dict, looked up concurrently instead of one round trip at a time."""
+    keys = list(keys)
+    if not keys:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(DICT_READ_CONCURRENCY, len(keys))) as executor:
+        values = executor.map(store.get, keys)
+        return {key: value for key, value in zip(keys, values) if value is not None}
+
+
+def warm_container():
+    """Import heavy modules and build API clients before the first request hits this container."""
+    started = time.time()
+
+    import anthropic  # noqa: F401
+    import apify_client  # noqa: F401
+    import googleapiclient.discovery  # noqa: F401
+    import gspread  # noqa: F401
+    import pandas  # noqa: F401
+    import requests  # noqa: F401
+
+    if os.getenv("ANTHROPIC_API_KEY"):
+        get_anthropic_client()
+    if os.getenv("APIFY_API_TOKEN"):
+        get_apify_client()
+
+    try:
+        token_data = json.loads(os.getenv("GOOGLE_TOKEN_JSON", "{}"))
+        if token_data:
+            get_gspread_client(token_data)
+            get_google_service("sheets", "v4", token_data)
+    except Exception as e:
+        # Never fail container start over Google; the request path reports auth errors properly
+        logger.warning(f"Google warm-up skipped: {e}")
+
+    logger.info(f"🔥 Container warm in {time.time() - started:.1f}s")
+
+
+class WarmContainer:
+    """Base for endpoint classes: heavy imports and API clients are set up once per container."""
+
+    @modal.enter()
+    def warm_up(self):
+        warm_container()
 
 
 # ============================================================================
@@ -179,22 +393,7 @@ ALL_TOOLS = {
 
 def send_email_impl(to: str, subject: str, body: str, token_data: dict) -> dict:
     """Send email via Gmail API."""
-    from google.oauth2.credentials import Credentials
-    from googleapiclient.discovery import build
-    from google.auth.transport.requests import Request
-
-    creds = Credentials(
-        token=token_data["token"],
-        refresh_token=token_data["refresh_token"],
-        token_uri=token_data["token_uri"],
-        client_id=token_data["client_id"],
-        client_secret=token_data["client_secret"],
-        scopes=token_data["scopes"]
-    )
-    if creds.expired:
-        creds.refresh(Request())
-
-    service = build("gmail", "v1", credentials=creds)
+    service = get_google_service("gmail", "v1", token_data)
     message = MIMEText(body)
     message["to"] = to
     message["subject"] = subject
@@ -207,22 +406,7 @@ def send_email_impl(to: str, subject: str, body: str, token_data: dict) -> dict:
 
 def read_sheet_impl(spreadsheet_id: str, range: str, token_data: dict) -> dict:
     """Read from Google Sheet."""
-    from google.oauth2.credentials import Credentials
-    from googleapiclient.discovery import build
-    from google.auth.transport.requests import Request
-
-    creds = Credentials(
-        token=token_data["token"],
-        refresh_token=token_data["refresh_token"],
-        token_uri=token_data["token_uri"],
-        client_id=token_data["client_id"],
-        client_secret=token_data["client_secret"],
-        scopes=token_data["scopes"]
-    )
-    if creds.expired:
-        creds.refresh(Request())
-
-    service = build("sheets", "v4", credentials=creds)
+    service = get_google_service("sheets", "v4", token_data)
     result = service.spreadsheets().values().get(
         spreadsheetId=spreadsheet_id,
         range=range
@@ -235,22 +419,7 @@ def read_sheet_impl(spreadsheet_id: str, range: str, token_data: dict) -> dict:
 
 def update_sheet_impl(spreadsheet_id: str, range: str, values: list, token_data: dict) -> dict:
     """Update Google Sheet."""
-    from google.oauth2.credentials import Credentials
-    from googleapiclient.discovery import build
-    from google.auth.transport.requests import Request
-
-    creds = Credentials(
-        token=token_data["token"],
-        refresh_token=token_data["refresh_token"],
-        token_uri=token_data["token_uri"],
-        client_id=token_data["client_id"],
-        client_secret=token_data["client_secret"],
-        scopes=token_data["scopes"]
-    )
-    if creds.expired:
-        creds.refresh(Request())
-
-    service = build("sheets", "v4", credentials=creds)
+    service = get_google_service("sheets", "v4", token_data)
     result = service.spreadsheets().values().update(
         spreadsheetId=spreadsheet_id,
         range=range,
@@ -436,26 +605,155 @@ TOOL_IMPLEMENTATIONS = {
 # Tools that need token_data
 TOOLS_NEEDING_TOKEN = {"send_email", "read_sheet", "update_sheet"}
 
+# Max tool calls run concurrently within one directive turn (override per webhook with "max_parallel_tools")
+MAX_PARALLEL_TOOLS = 4
+TOOL_POOL_WORKERS = 16  # Tool threads kept for the container's lifetime, so their per-thread Google clients stay warm
+
+_tool_pool = ThreadPoolExecutor(max_workers=TOOL_POOL_WORKERS, thread_name_prefix="tools")
+
+
+def execute_tool_call(tool_use, allowed_tools: list, token_data: dict) -> tuple:
+    """Execute a single tool_use block. Returns (tool_result_json, is_error)."""
+    # Security check: only execute allowed tools
+    if tool_use.name not in allowed_tools:
+        return json.dumps({"error": f"Tool '{tool_use.name}' not permitted for this directive"}), True
+
+    impl = TOOL_IMPLEMENTATIONS.get(tool_use.name)
+    if not impl:
+        return json.dumps({"error": f"No implementation for {tool_use.name}"}), True
+
+    try:
+        # Add token_data for tools that need it
+        if tool_use.name in TOOLS_NEEDING_TOKEN:
+            result = impl(**tool_use.input, token_data=token_data)
+        else:
+            result = impl(**tool_use.input)
+        return json.dumps(result), False
+    except Exception as e:
+        logger.error(f"Tool error ({tool_use.name}): {e}")
+        return json.dumps({"error": str(e)}), True
+
 # ============================================================================
 # SLACK NOTIFICATIONS
 # ============================================================================
 
+# Notifications are queued and posted by a background thread, so Slack latency never lands on
+# the caller. Messages arriving within SLACK_BATCH_WINDOW are coalesced into one post (up to
+# Slack's block limit) and posts are spaced to respect the ~1 msg/sec webhook rate limit.
+# Each item is tagged with the run that queued it (slack_run, set once at the start of every
+# endpoint / background run), so concurrent runs in one container never share a post. The id
+# lives in a contextvar: streamed responses keep their handler's context (streaming_response),
+# and a worker thread that notifies must be started in a copy of the run's context.
+SLACK_BATCH_WINDOW = 1.0  # seconds to wait for more messages before posting
+SLACK_MIN_INTERVAL = 1.0  # seconds between posts
+SLACK_MAX_BLOCKS = 50  # Slack's per-message block limit
+
+_slack_queue = queue.Queue()  # (run id, message, blocks) or a flush Event
+_slack_worker = None
+_slack_worker_lock = threading.Lock()
+_slack_run_id = contextvars.ContextVar("slack_run_id", default=None)
+
+
+def _slack_post(webhook_url: str, payload: dict):
+    """POST one payload to the Slack webhook, honouring Retry-After on 429."""
+    data = json.dumps(payload).encode("utf-8")
+    for attempt in range(3):
+        req = urllib.request.Request(webhook_url, data=data, headers={"Content-Type": "application/json"})
+        try:
+            urllib.request.urlopen(req, timeout=5)
+            return
+        except urllib.error.HTTPError as e:
+            if e.code != 429 or attempt == 2:
+                raise
+            time.sleep(float(e.headers.get("Retry-After", 1)))
+
+
+def _slack_send_batch(webhook_url: str, batch: list, last_post: float) -> float:
+    """Post queued (run id, message, blocks) items as few Slack messages as possible, one run per post. Returns last post time."""
+    runs = {}
+    for run_id, message, blocks in batch:
+        runs.setdefault(run_id, []).append((message, blocks))
+
+    posts = []
+    for items in runs.values():
+        first = len(posts)
+        for message, blocks in items:
+            blocks = blocks or [{"type": "section", "text": {"type": "mrkdwn", "text": message[:3000]}}]
+            if len(posts) == first or len(posts[-1]["blocks"]) + len(blocks) > SLACK_MAX_BLOCKS:
+                posts.append({"texts": [], "blocks": []})
+            posts[-1]["texts"].append(message)
+            posts[-1]["blocks"].extend(blocks[:SLACK_MAX_BLOCKS])
+
+    for post in posts:
+        wait = SLACK_MIN_INTERVAL - (time.monotonic() - last_post)
+        if wait > 0:
+            time.sleep(wait)
+        try:
+            _slack_post(webhook_url, {"text": " | ".join(post["texts"])[:3000], "blocks": post["blocks"]})
+        except Exception as e:
+            logger.error(f"Slack failed: {e}")
+        last_post = time.monotonic()
+
+    return last_post
+
+
+def _slack_worker_loop(webhook_url: str):
+    """Drain the Slack queue forever, coalescing bursts into batched posts."""
+    last_post = 0.0
+    while True:
+        item = _slack_queue.get()
+        batch, flushes = [], []
+        deadline = time.monotonic() + SLACK_BATCH_WINDOW
+
+        while True:
+            if isinstance(item, threading.Event):
+                flushes.append(item)  # Flush request: post what we have right away
+                break
+            batch.append(item)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or sum(len(b or [None]) for _, _, b in batch) >= SLACK_MAX_BLOCKS:
+                break
+            try:
+                item = _slack_queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+
+        if batch:
+            last_post = _slack_send_batch(webhook_url, batch, last_post)
+        for flushed in flushes:
+            flushed.set()
+
+
+def slack_run(run_id: str = None) -> str:
+    """Tag this run's notifications with run_id (e.g. its job id; a new id if None). Call once per run."""
+    run_id = run_id or uuid.uuid4().hex
+    _slack_run_id.set(run_id)
+    return run_id
+
+
 def slack_notify(message: str, blocks: list = None):
-    """Send notification to Slack."""
+    """Queue a notification for Slack (non-blocking)."""
+    global _slack_worker
+
     webhook_url = os.getenv("SLACK_WEBHOOK_URL")
     if not webhook_url:
         return
 
-    payload = {"text": message}
-    if blocks:
-        payload["blocks"] = blocks
+    with _slack_worker_lock:
+        if _slack_worker is None or not _slack_worker.is_alive():
+            _slack_worker = threading.Thread(target=_slack_worker_loop, args=(webhook_url,), daemon=True, name="slack-notifier")
+            _slack_worker.start()
 
-    try:
-        data = json.dumps(payload).encode("utf-8")
-        req = urllib.request.Request(webhook_url, data=data, headers={"Content-Type": "application/json"})
-        urllib.request.urlopen(req, timeout=5)
-    except Exception as e:
-        logger.error(f"Slack failed: {e}")
+    _slack_queue.put((_slack_run_id.get() or slack_run(), message, blocks))
+
+
+def slack_flush(timeout: float = 10):
+    """Wait (up to timeout) until every queued Slack notification has been posted."""
+    if _slack_worker is None or not _slack_worker.is_alive():
+        return
+    flushed = threading.Event()
+    _slack_queue.put(flushed)
+    flushed.wait(timeout)
 
 
 def slack_directive_start(slug: str, directive: str, input_data: dict):
@@ -499,16 +797,19 @@ def slack_complete(response: str, usage: dict):
         {"type": "header", "text": {"type": "plain_text", "text": "✨ Complete", "emoji": True}},
         {"type": "section", "fields": [
             {"type": "mrkdwn", "text": f"*Tokens:* {usage['input_tokens']}→{usage['output_tokens']}"},
-            {"type": "mrkdwn", "text": f"*Turns:* {usage['turns']}"}
+            {"type": "mrkdwn", "text": f"*Turns:* {usage['turns']}"},
+            {"type": "mrkdwn", "text": f"*Cache:* {usage.get('cache_read_input_tokens', 0)} read / {usage.get('cache_creation_input_tokens', 0)} written"}
         ]},
         {"type": "section", "text": {"type": "mrkdwn", "text": f"*Response:*\n```{truncated}```"}}
     ]
     slack_notify("Complete", blocks=blocks)
+    slack_flush()
 
 
 def slack_error(error: str):
     blocks = [{"type": "section", "text": {"type": "mrkdwn", "text": f"❌ *Error:*\n```{error[:2000]}```"}}]
     slack_notify(f"Error", blocks=blocks)
+    slack_flush()
 
 
 # ============================================================================
@@ -557,12 +858,35 @@ def run_procedural_script(script_name: str, payload: dict, token_data: dict) ->
 # CORE ENGINE
 # ============================================================================
 
+_file_cache = {}  # (path, parser) -> (mtime_ns, parsed value)
+_file_cache_lock = threading.Lock()
+
+
+def read_cached(path: Path, parse=None):
+    """
+    Return the (optionally parsed) contents of path, re-reading only when its mtime changes.
+    Parsed values are shared between callers, so treat them as read-only.
+    """
+    mtime = path.stat().st_mtime_ns
+    key = (str(path), parse)
+    with _file_cache_lock:
+        cached = _file_cache.get(key)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    text = path.read_text()
+    value = parse(text) if parse else text
+    with _file_cache_lock:
+        _file_cache[key] = (mtime, value)
+    return value
+
+
 def load_webhook_config():
-    """Load webhook configuration."""
+    """Load webhook configuration (cached until webhooks.json changes)."""
     config_path = Path("/app/webhooks.json")
     if not config_path.exists():
         return {"webhooks": {}}
-    return json.loads(config_path.read_text())
+    return read_cached(config_path, json.loads)
 
 
 def load_directive(directive_name: str) -> str:
@@ -570,21 +894,154 @@ def load_directive(directive_name: str) -> str:
     directive_path = Path(f"/app/directives/{directive_name}.md")
     if not directive_path.exists():
         raise FileNotFoundError(f"Directive not found: {directive_name}")
-    return directive_path.read_text()
+    return read_cached(directive_path)
 
 
-def run_directive(
+# Prompt caching: the tool schemas and the directive/system prompt are identical on every turn,
+# so they get fixed cache breakpoints; a rolling breakpoint on the latest tool results lets each
+# turn read the whole previous conversation from cache (max 4 breakpoints per request).
+CACHE_CONTROL = {"type": "ephemeral"}
+
+
+def cached_tools(tools: list) -> list:
+    """Copy tool schemas with a cache breakpoint on the last one (caches the full tool prefix)."""
+    if not tools:
+        return tools
+    return tools[:-1] + [{**tools[-1], "cache_control": CACHE_CONTROL}]
+
+
+def set_rolling_cache_breakpoint(messages: list):
+    """Move the rolling cache breakpoint to the last block of the latest user message."""
+    for message in messages[1:]:  # The first message keeps its fixed breakpoint
+        if message["role"] == "user" and isinstance(message["content"], list):
+            for block in message["content"]:
+                block.pop("cache_control", None)
+
+    last = messages[-1]
+    if last["role"] == "user" and isinstance(last["content"], list) and last["content"]:
+        last["content"][-1]["cache_control"] = CACHE_CONTROL
+
+
+def new_usage() -> dict:
+    """Empty token counters, including prompt-cache reads and writes."""
+    return {"input_tokens": 0, "output_tokens": 0, "cache_read_input_tokens": 0, "cache_creation_input_tokens": 0}
+
+
+def add_usage(totals: dict, usage):
+    """Accumulate an API response's usage into totals."""
+    totals["input_tokens"] += usage.input_tokens
+    totals["output_tokens"] += usage.output_tokens
+    totals["cache_read_input_tokens"] += getattr(usage, "cache_read_input_tokens", 0) or 0
+    totals["cache_creation_input_tokens"] += getattr(usage, "cache_creation_input_tokens", 0) or 0
+
+
+# Conversation compaction: once the prompt of a directive run grows past the context budget,
+# older turns lose their thinking blocks and their tool results are truncated. The most recent
+# turns stay verbatim so tool_use/tool_result pairing and the last thinking block remain valid.
+# Compaction overshoots (down to COMPACT_TARGET_RATIO of the budget) so it happens rarely: every
+# compaction rewrites history and invalidates the prompt cache from the first changed message on.
+CONTEXT_BUDGET_TOKENS = 60000  # Override per webhook with "context_budget_tokens"
+COMPACT_TARGET_RATIO = 0.5  # Share of the budget a compaction aims to bring the context down to
+COMPACT_KEEP_TURNS = 2
+COMPACTED_RESULT_CHARS = 1500
+COMPACTED_RESULT_MIN_CHARS = 300  # Tighter truncation when the first pass doesn't free enough
+CHARS_PER_TOKEN = 4  # Rough conversion for turning a token excess into characters to remove
+COMPACTED_MARKER = re.compile(r"\.\.\. \[compacted: (\d+) chars omitted\]$")
+
+
+def context_tokens(usage) -> int:
+    """Size of the conversation after a response: full prompt (cached or not) plus the new output."""
+    return (
+        usage.input_tokens
+        + (getattr(usage, "cache_read_input_tokens", 0) or 0)
+        + (getattr(usage, "cache_creation_input_tokens", 0) or 0)
+        + usage.output_tokens
+    )
+
+
+def truncate_result(content: str, limit: int) -> tuple:
+    """Truncate a tool result to limit chars (keeping an earlier compaction's count). Returns (content, chars removed)."""
+    marker = COMPACTED_MARKER.search(content)
+    body, omitted = (content[:marker.start()], int(marker.group(1))) if marker else (content, 0)
+    if len(body) <= limit:
+        return content, 0
+    return body[:limit] + f"... [compacted: {omitted + len(body) - limit} chars omitted]", len(body) - limit
+
+
+def compact_messages(messages: list, keep_turns: int = COMPACT_KEEP_TURNS, min_removed: int = 0) -> int:
+    """
+    Compact all but the last keep_turns assistant/tool_result pairs in place.
+    messages[0] is the directive prompt and is never touched. Returns characters removed.
+    If a pass frees fewer than min_removed characters, later passes truncate results harder
+    and then compact all but the latest turn.
+    """
+    removed = 0
+    passes = [(keep_turns, COMPACTED_RESULT_CHARS), (keep_turns, COMPACTED_RESULT_MIN_CHARS), (1, COMPACTED_RESULT_MIN_CHARS)]
+
+    for keep, result_chars in passes:
+        cutoff = len(messages) - 2 * keep
+
+        for idx in range(1, max(cutoff, 1)):
+            message = messages[idx]
+
+            if message["role"] == "assistant":
+                # Drop stale thinking - tool_use blocks must stay so results keep their pairing
+                kept = []
+                for block in message["content"]:
+                    if getattr(block, "type", None) in ("thinking", "redacted_thinking"):
+                        removed += len(getattr(block, "thinking", "") or "")
+                    else:
+                        kept.append(block)
+                message["content"] = kept
+
+            elif isinstance(message["content"], list):
+                for block in message["content"]:
+                    if block.get("type") == "tool_result" and isinstance(block.get("content"), str):
+                        block["content"], cut = truncate_result(block["content"], result_chars)
+                        removed += cut
+
+        if removed >= min_removed:
+            break
+
+    return removed
+
+
+def stream_claude(client, turn, **kwargs):
+    """
+    Call Claude via the streaming API.
+    Yields thinking/text delta events as they arrive and returns the final Message.
+    """
+    with client.messages.stream(**kwargs) as stream:
+        for event in stream:
+            if event.type != "content_block_delta":
+                continue
+            if event.delta.type == "thinking_delta":
+                yield {"type": "thinking_delta", "turn": turn, "text": event.delta.thinking}
+            elif event.delta.type == "text_delta":
+                yield {"type": "text_delta", "turn": turn, "text": event.delta.text}
+        return stream.get_final_message()
+
+
+def iter_directive_events(
     slug: str,
     directive_content: str,
     input_data: dict,
     allowed_tools: list,
     token_data: dict,
-    max_turns: int = 15
-) -> dict:
-    """Execute a directive with scoped tools."""
-    import anthropic
+    max_turns: int = 15,
+    max_parallel_tools: int = MAX_PARALLEL_TOOLS,
+    slack_progress: bool = True,
+    context_budget_tokens: int = CONTEXT_BUDGET_TOKENS
+):
+    """
+    Execute a directive with scoped tools, yielding progress events as they happen:
+    start, thinking_delta, text_delta, tool_call, tool_result, compacted and finally
+    complete (whose "result" holds the response/thinking/conversation/usage dict).
 
-    client = anthropic.Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY"))
+    slack_progress=False skips the per-thinking/per-tool Slack posts (streaming callers
+    already receive those events); start/complete notifications are always sent.
+    """
+    client = get_anthropic_client()
 
     # Build prompt with directive + input
     prompt = f"""You are executing a specific directive. Follow it precisely.
@@ -603,29 +1060,31 @@ def run_directive(
 Execute the directive now."""
 
     # Filter tools to only allowed ones
-    tools = [ALL_TOOLS[t] for t in allowed_tools if t in ALL_TOOLS]
+    tools = cached_tools([ALL_TOOLS[t] for t in allowed_tools if t in ALL_TOOLS])
 
-    messages = [{"role": "user", "content": prompt}]
+    # Directive + input never change during the run - cache them with the tools
+    messages = [{"role": "user", "content": [{"type": "text", "text": prompt, "cache_control": CACHE_CONTROL}]}]
     conversation_log = []
     thinking_log = []
-    total_input_tokens = 0
-    total_output_tokens = 0
+    totals = new_usage()
     turn_count = 0
+    model_calls = 0  # Reported as usage turns: every API call, including the final answer
+    compactions = 0
 
     logger.info(f"🎯 Executing directive: {slug}")
     slack_directive_start(slug, slug, input_data)
+    yield {"type": "start", "slug": slug}
 
     request_kwargs = {
         "model": "claude-opus-4-5-20251101",
         "max_tokens": 40000,
         "tools": tools,
-        "messages": messages,
         "thinking": {"type": "enabled", "budget_tokens": 32000}
     }
 
-    response = client.messages.create(**request_kwargs)
-    total_input_tokens += response.usage.input_tokens
-    total_output_tokens += response.usage.output_tokens
+    response = yield from stream_claude(client, turn_count, **request_kwargs, messages=messages)
+    add_usage(totals, response.usage)
+    model_calls += 1
 
     while response.stop_reason == "tool_use" and turn_count < max_turns:
         turn_count += 1
@@ -634,50 +1093,56 @@ Execute the directive now."""
         for block in response.content:
             if block.type == "thinking":
                 thinking_log.append({"turn": turn_count, "thinking": block.thinking})
-                slack_thinking(turn_count, block.thinking)
+                if slack_progress:
+                    slack_thinking(turn_count, block.thinking)
 
-        # Find tool call
-        tool_use = next((b for b in response.content if b.type == "tool_use"), None)
-        if not tool_use:
+        # Collect every tool call in this turn
+        tool_uses = [b for b in response.content if b.type == "tool_use"]
+        if not tool_uses:
             break
 
-        # Security check: only execute allowed tools
-        if tool_use.name not in allowed_tools:
-            tool_result = json.dumps({"error": f"Tool '{tool_use.name}' not permitted for this directive"})
-            is_error = True
-        else:
-            slack_tool_call(turn_count, tool_use.name, tool_use.input)
-            conversation_log.append({"turn": turn_count, "tool": tool_use.name, "input": tool_use.input})
-
-            # Execute tool
-            is_error = False
-            try:
-                impl = TOOL_IMPLEMENTATIONS.get(tool_use.name)
-                if impl:
-                    # Add token_data for tools that need it
-                    if tool_use.name in TOOLS_NEEDING_TOKEN:
-                        result = impl(**tool_use.input, token_data=token_data)
-                    else:
-                        result = impl(**tool_use.input)
-                    tool_result = json.dumps(result)
-                else:
-                    tool_result = json.dumps({"error": f"No implementation for {tool_use.name}"})
-                    is_error = True
-            except Exception as e:
-                logger.error(f"Tool error: {e}")
-                tool_result = json.dumps({"error": str(e)})
-                is_error = True
+        for tool_use in tool_uses:
+            if tool_use.name in allowed_tools:
+                yield {"type": "tool_call", "turn": turn_count, "tool": tool_use.name, "input": tool_use.input}
+                if slack_progress:
+                    slack_tool_call(turn_count, tool_use.name, tool_use.input)
+
+        # Execute tool calls concurrently on the shared tool pool, at most max_parallel_tools at a time
+        # (results keep the order Claude requested them in)
+        workers = max(1, min(max_parallel_tools, TOOL_POOL_WORKERS))
+        outcomes = []
+        for i in range(0, len(tool_uses), workers):
+            outcomes.extend(_tool_pool.map(lambda b: execute_tool_call(b, allowed_tools, token_data), tool_uses[i:i + workers]))
+
+        tool_results = []
+        for tool_use, (tool_result, is_error) in zip(tool_uses, outcomes):
+            if tool_use.name in allowed_tools:
+                conversation_log.append({"turn": turn_count, "tool": tool_use.name, "input": tool_use.input, "result": tool_result})
+                if slack_progress:
+                    slack_tool_result(turn_count, tool_use.name, tool_result, is_error)
+            yield {"type": "tool_result", "turn": turn_count, "tool": tool_use.name, "result": tool_result, "is_error": is_error}
+
+            tool_results.append({"type": "tool_result", "tool_use_id": tool_use.id, "content": tool_result, "is_error": is_error})
+
+        # Continue conversation - all tool results go back in a single user message
+        messages.append({"role": "assistant", "content": response.content})
+        messages.append({"role": "user", "content": tool_results})
 
-            conversation_log[-1]["result"] = tool_result
-            slack_tool_result(turn_count, tool_use.name, tool_result, is_error)
+        # Keep per-turn input flat on long runs
+        context_size = context_tokens(response.usage)
+        if context_size > context_budget_tokens:
+            excess = context_size - int(context_budget_tokens * COMPACT_TARGET_RATIO)
+            removed = compact_messages(messages, min_removed=excess * CHARS_PER_TOKEN)
+            if removed:
+                compactions += 1
+                logger.info(f"🗜️ Compacted context at turn {turn_count} ({context_size} tokens, {removed} chars removed)")
+                yield {"type": "compacted", "turn": turn_count, "context_tokens": context_size, "chars_removed": removed}
 
-        # Continue conversation
-        messages.append({"role": "assistant", "content": response.content})
-        messages.append({"role": "user", "content": [{"type": "tool_result", "tool_use_id": tool_use.id, "content": tool_result}]})
+        set_rolling_cache_breakpoint(messages)
 
-        response = client.messages.create(**{**request_kwargs, "messages": messages})
-        total_input_tokens += response.usage.input_tokens
-        total_output_tokens += response.usage.output_tokens
+        response = yield from stream_claude(client, turn_count, **request_kwargs, messages=messages)
+        add_usage(totals, response.usage)
+        model_calls += 1
 
     # Extract final response
     final_text = ""
@@ -687,37 +1152,322 @@ Execute the directive now."""
         if block.type == "thinking":
             thinking_log.append({"turn": "final", "thinking": block.thinking})
 
-    usage = {"input_tokens": total_input_tokens, "output_tokens": total_output_tokens, "turns": turn_count}
+    usage = {**totals, "turns": model_calls, "compactions": compactions}
     slack_complete(final_text, usage)
 
-    return {
-        "response": final_text,
-        "thinking": thinking_log,
-        "conversation": conversation_log,
-        "usage": usage
+    yield {
+        "type": "complete",
+        "result": {
+            "response": final_text,
+            "thinking": thinking_log,
+            "conversation": conversation_log,
+            "usage": usage
+        }
     }
 
 
+def run_directive(
+    slug: str,
+    directive_content: str,
+    input_data: dict,
+    allowed_tools: list,
+    token_data: dict,
+    max_turns: int = 15,
+    max_parallel_tools: int = MAX_PARALLEL_TOOLS,
+    context_budget_tokens: int = CONTEXT_BUDGET_TOKENS,
+    job_id: str = None
+) -> dict:
+    """Execute a directive with scoped tools and return the final result (blocking). Tool calls become job steps."""
+    result = None
+    events = iter_directive_events(slug, directive_content, input_data, allowed_tools, token_data,
+                                   max_turns=max_turns, max_parallel_tools=max_parallel_tools,
+                                   context_budget_tokens=context_budget_tokens)
+    for event in track_job_events(job_id, events):
+        if event["type"] == "complete":
+            result = event["result"]
+    return result
+
+
 # ============================================================================
-# ENDPOINTS
+# STREAMING RESPONSES
+# ============================================================================
+
+STREAM_FORMATS = {"sse": "text/event-stream", "ndjson": "application/x-ndjson"}
+
+
+def encode_stream_event(event: dict, fmt: str) -> str:
+    """Encode one event as an SSE frame or an NDJSON line."""
+    data = json.dumps(event, default=str)
+    if fmt == "ndjson":
+        return data + "\n"
+    return f"event: {event['type']}\ndata: {data}\n\n"
+
+
+def streaming_response(events, fmt: str, final_fields: dict = None):
+    """
+    Wrap an event generator in a StreamingResponse.
+    final_fields are merged into the complete event; failures become an error event.
+    The stream runs in the caller's context, so it keeps the caller's Slack run id (the server
+    would otherwise resume each chunk in a fresh copy of the request's context).
+    """
+    from fastapi.responses import StreamingResponse
+
+    context = contextvars.copy_context()
+
+    def in_context(chunks):
+        try:
+            while True:
+                try:
+                    yield context.run(next, chunks)
+                except StopIteration:
+                    return
+        finally:
+            context.run(chunks.close)
+
+    def body():
+        try:
+            for event in events:
+                if event["type"] == "complete" and final_fields:
+                    event = {**event, **final_fields}
+                yield encode_stream_event(event, fmt)
+        except Exception as e:
+            logger.error(f"Stream error: {e}")
+            slack_error(str(e))
+            yield encode_stream_event({"type": "error", "error": str(e)}, fmt)
+
+    return StreamingResponse(in_context(body()), media_type=STREAM_FORMATS[fmt], headers={"Cache-Control": "no-cache"})
+
+
+# ============================================================================
+# JOBS (persistent status for long-running work)
+# ============================================================================
+
+# job_id -> {job_id, kind, status, params, steps, result, error, created_at, updated_at}
+# status: queued -> running -> completed | failed. Callers poll the jobs app at job_poll_url(job_id).
+job_store = modal.Dict.from_name("claude-orchestrator-jobs", create_if_missing=True)
+
+JOB_MAX_STEPS = 200  # Keep only the newest steps so chatty directives don't grow records unbounded
+
+
+def job_create(kind: str, params: dict = None, job_id: str = None) -> str:
+    """Register a queued job (under job_id if already claimed) and return its id."""
+    job_id = job_id or uuid.uuid4().hex[:16]
+    now = datetime.utcnow().isoformat()
+    job_store[job_id] = {
+        "job_id": job_id,
+        "kind": kind,
+        "status": "queued",
+        "params": params or {},
+        "steps": [],
+        "result": None,
+        "error": None,
+        "created_at": now,
+        "updated_at": now
+    }
+    return job_id
+
+
+def job_get(job_id: str):
+    """Return a job record, or None if unknown."""
+    return job_store.get(job_id)
+
+
+def job_update(job_id: str, **fields):
+    """Merge fields into a job record. No-op without a job id (cron runs, local calls)."""
+    if not job_id:
+        return
+    job = job_store.get(job_id) or {"job_id": job_id, "steps": []}
+    job.update(fields)
+    job["updated_at"] = datetime.utcnow().isoformat()
+    job["heartbeat_at"] = time.time()  # Keeps the run's idempotency lease alive
+    job_store[job_id] = job
+
+
+def job_step(job_id: str, step: str):
+    """Append a progress step and mark the job running."""
+    if not job_id:
+        return
+    job = job_store.get(job_id) or {}
+    steps = job.get("steps", []) + [{"step": step, "at": datetime.utcnow().isoformat()}]
+    job_update(job_id, status="running", steps=steps[-JOB_MAX_STEPS:])
+
+
+_jobs_base_url = None
+
+
+def job_poll_url(job_id: str) -> str:
+    """Full URL to poll a job on the jobs app (JOBS_BASE_URL overrides the deployed web URL)."""
+    global _jobs_base_url
+    if _jobs_base_url is None:
+        try:
+            _jobs_base_url = (os.getenv("JOBS_BASE_URL") or jobs.get_web_url() or "").rstrip("/")
+        except Exception as e:
+            logger.warning(f"Jobs app URL unavailable: {e}")
+            return f"/{job_id} on the {endpoint_label('jobs')} endpoint"
+    return f"{_jobs_base_url}/{job_id}"
+
+
+def job_finish(job_id: str, result: dict) -> dict:
+    """Record a job's final result (status "error" marks it failed) and return the result."""
+    failed = result.get("status") == "error"
+    job_update(job_id, status="failed" if failed else "completed", result=result,
+               error=result.get("error") if failed else None)
+    return result
+
+
+def track_job_events(job_id: str, events, final_fields: dict = None):
+    """
+    Pass directive events through, recording tool calls as job steps.
+    With final_fields, the complete event also finishes the job (streaming has no other exit).
+    If the stream stops early (client disconnect closes the generator), the job is finished as an error.
+    """
+    finished = False
+    try:
+        for event in events:
+            if event["type"] == "tool_call":
+                job_step(job_id, f"Turn {event['turn']}: {event['tool']}")
+            elif event["type"] == "compacted":
+                job_step(job_id, f"Turn {event['turn']}: compacted context")
+            elif event["type"] == "complete" and final_fields is not None:
+                job_finish(job_id, {**final_fields, **event["result"]})
+                finished = True
+            yield event
+    except Exception as e:
+        job_finish(job_id, {"status": "error", "error": str(e)})
+        finished = True
+        raise
+    finally:
+        if hasattr(events, "close"):
+            events.close()
+        if final_fields is not None and not finished:
+            job_finish(job_id, {"status": "error", "error": "Stream closed before the run completed"})
+
+
+# ============================================================================
+# IDEMPOTENCY (dedupe webhook retries)
 # ============================================================================
 
-@app.function(image=image, secrets=ALL_SECRETS, timeout=600)
-@modal.fastapi_endpoint(method="POST")
-def directive(slug: str, payload: dict = None):
+# "key#generation" -> {"job_id", "claimed_at"}, plus "key" -> {"gen"} as a hint to the newest generation.
+# A retried request attaches to the original job instead of re-running it: in-flight runs are waited
+# on or polled, completed ones are replayed. Taking over a dead claim writes the next generation with
+# skip_if_exists, so exactly one retry becomes the new owner.
+#
+# - In-flight runs hold a lease: a job that hasn't heartbeat (job_update/job_step) for
+#   IDEMPOTENCY_LEASE seconds is treated as dead (timeout, container kill, dropped stream).
+# - A client "idempotency_key" replays a completed result for IDEMPOTENCY_TTL.
+# - Without one, the request body is hashed, but only to catch transport retries: an identical
+#   request after IDEMPOTENCY_RETRY_WINDOW runs again.
+idempotency_store = modal.Dict.from_name("claude-orchestrator-idempotency", create_if_missing=True)
+
+IDEMPOTENCY_TTL = 24 * 3600  # Seconds a completed result is replayed for a client-supplied key
+IDEMPOTENCY_RETRY_WINDOW = 300  # Seconds an identical body (no key) counts as a retry
+IDEMPOTENCY_LEASE = 900  # Seconds without a heartbeat before an in-flight claim is considered dead
+IDEMPOTENCY_WAIT = 540  # Max seconds a synchronous retry waits on the original run (endpoint timeout is 600)
+IDEMPOTENCY_IGNORED_FIELDS = ("idempotency_key", "async", "stream")  # Don't change what the request does
+
+
+def make_idempotency_key(scope: str, request: dict, client_key: str = None) -> str:
+    """The client's key if given, otherwise a hash of the canonical request."""
+    if client_key:
+        return f"{scope}:key:{client_key}"
+    fields = {k: v for k, v in request.items() if k not in IDEMPOTENCY_IGNORED_FIELDS}
+    canonical = json.dumps(fields, sort_keys=True, default=str)
+    return f"{scope}:body:{hashlib.sha256(canonical.encode()).hexdigest()}"
+
+
+def current_claim(key: str) -> tuple:
+    """Return (generation, claim or None) for the newest claim on key."""
+    gen = (idempotency_store.get(key) or {}).get("gen", 0)
+    claim = idempotency_store.get(f"{key}#{gen}")
+    while True:
+        newer = idempotency_store.get(f"{key}#{gen + 1}")
+        if not newer:
+            return gen, claim
+        gen, claim = gen + 1, newer
+
+
+def claim_is_live(key: str, claim: dict) -> bool:
+    """Whether a claim still owns its key: not released/failed, lease alive, result within its replay window."""
+    if claim.get("released"):
+        return False
+    now = time.time()
+    replay_ttl = IDEMPOTENCY_TTL if ":key:" in key else IDEMPOTENCY_RETRY_WINDOW
+    if now - claim["claimed_at"] > replay_ttl:
+        return False
+
+    job = job_get(claim["job_id"])
+    if job is None:  # Claimed, job not created yet
+        return now - claim["claimed_at"] <= IDEMPOTENCY_LEASE
+    if job["status"] == "failed":
+        return False
+    if job["status"] == "completed":
+        return True
+    return now - job.get("heartbeat_at", claim["claimed_at"]) <= IDEMPOTENCY_LEASE
+
+
+def claim_idempotency(key: str) -> tuple:
     """
-    Execute a specific directive by slug.
+    Return (job_id, is_new). When is_new the caller owns the run and creates job_id;
+    otherwise job_id is the in-flight or completed run to attach to.
+    """
+    gen, existing = current_claim(key)
+    if existing:
+        if claim_is_live(key, existing):
+            return existing["job_id"], False
+        gen += 1
+
+    claim = {"job_id": uuid.uuid4().hex[:16], "claimed_at": time.time()}
+    if idempotency_store.put(f"{key}#{gen}", claim, skip_if_exists=True):
+        idempotency_store[key] = {"gen": gen}
+        return claim["job_id"], True
+
+    # Another retry took this generation first; it owns the run
+    return idempotency_store.get(f"{key}#{gen}")["job_id"], False
+
+
+def release_idempotency(key: str, job_id: str):
+    """Mark job_id's claim as released (its run never started), so the next retry runs it."""
+    gen, claim = current_claim(key)
+    if claim and claim["job_id"] == job_id:
+        idempotency_store[f"{key}#{gen}"] = {**claim, "released": True}
+
+
+def replay_job(job_id: str, wait: float = 0) -> dict:
+    """Response for a duplicate request, waiting up to `wait` seconds for the original run to finish."""
+    deadline = time.time() + wait
+    job = job_get(job_id)
+    while job and job["status"] in ("queued", "running") and time.time() < deadline:
+        time.sleep(2)
+        job = job_get(job_id)
+
+    if job and job["status"] in ("completed", "failed"):
+        return {**job["result"], "job_id": job_id, "idempotent_replay": True}
+    return {
+        "status": job["status"] if job else "queued",
+        "job_id": job_id,
+        "params": job["params"] if job else {},
+        "idempotent_replay": True,
+        "poll": job_poll_url(job_id)
+    }
+
 
-    Supports two modes:
-    - Procedural: "script" in config → runs Python script directly (Claude only for creative tasks)
-    - Agentic: "directive" in config → Claude orchestrates using tools
+# ============================================================================
+# ENDPOINTS
+# ============================================================================
 
-    URL: POST /directive?slug={slug}
-    Body: {"data": {...}}  (input data for the directive)
+def execute_directive(slug: str, payload: dict, job_id: str = None):
+    """
+    Run a webhook slug to completion (or as a stream) and record it on job_id.
+    Shared by the directive endpoint and directive_background.
     """
-    payload = payload or {}
+    slack_run(job_id)
     input_data = payload.get("data", payload)  # Support both {"data": ...} and flat payload
     max_turns = payload.get("max_turns", 15)
+    stream_format = payload.get("stream")
+    if stream_format is True:
+        stream_format = "sse"
+    if stream_format and stream_format not in STREAM_FORMATS:
+        return job_finish(job_id, {"status": "error", "error": f"Unknown stream format: {stream_format}", "available": list(STREAM_FORMATS)})
 
     # Load config
     config = load_webhook_config()
@@ -725,10 +1475,11 @@ def directive(slug: str, payload: dict = None):
 
     # Validate slug exists
     if slug not in webhooks:
-        return {"status": "error", "error": f"Unknown webhook slug: {slug}", "available": list(webhooks.keys())}
+        return job_finish(job_id, {"status": "error", "error": f"Unknown webhook slug: {slug}", "available": list(webhooks.keys())})
 
     webhook_config = webhooks[slug]
     token_data = json.loads(os.getenv("GOOGLE_TOKEN_JSON"))
+    job_update(job_id, status="running")
 
     # Check execution mode: procedural (script) vs agentic (directive)
     script_name = webhook_config.get("script")
@@ -740,6 +1491,7 @@ def directive(slug: str, payload: dict = None):
     if script_name:
         logger.info(f"🔧 Running procedural script: {script_name}")
         slack_notify(f"🔧 *Procedural:* `{slug}` → `{script_name}.py`")
+        job_step(job_id, f"Running {script_name}.py")
 
         try:
             result = run_procedural_script(script_name, input_data, token_data)
@@ -748,18 +1500,19 @@ def directive(slug: str, payload: dict = None):
             status_emoji = "✅" if result.get("status") == "success" or "error" not in result else "❌"
             slack_notify(f"{status_emoji} *{slug}* complete: {json.dumps(result)[:500]}")
 
-            return {
+            return job_finish(job_id, {
                 "status": result.get("status", "success" if "error" not in result else "error"),
+                "job_id": job_id,
                 "slug": slug,
                 "mode": "procedural",
                 "script": script_name,
                 "result": result,
                 "timestamp": datetime.utcnow().isoformat()
-            }
+            })
         except Exception as e:
             logger.error(f"Script error: {e}")
             slack_error(str(e))
-            return {"status": "error", "error": str(e)}
+            return job_finish(job_id, {"status": "error", "job_id": job_id, "error": str(e)})
 
     # =========================================================================
     # AGENTIC MODE: Claude orchestrates using directive + tools
@@ -770,34 +1523,132 @@ def directive(slug: str, payload: dict = None):
         try:
             directive_content = load_directive(directive_name)
         except FileNotFoundError as e:
-            return {"status": "error", "error": str(e)}
+            return job_finish(job_id, {"status": "error", "job_id": job_id, "error": str(e)})
 
-        try:
-            result = run_directive(
+        if stream_format:
+            final_fields = {
+                "status": "success",
+                "job_id": job_id,
+                "slug": slug,
+                "mode": "agentic",
+                "directive": directive_name,
+            }
+            events = iter_directive_events(
                 slug=slug,
                 directive_content=directive_content,
                 input_data=input_data,
                 allowed_tools=allowed_tools,
                 token_data=token_data,
-                max_turns=max_turns
+                max_turns=max_turns,
+                max_parallel_tools=webhook_config.get("max_parallel_tools", MAX_PARALLEL_TOOLS),
+                slack_progress=False,
+                context_budget_tokens=webhook_config.get("context_budget_tokens", CONTEXT_BUDGET_TOKENS)
             )
-            return {
-                "status": "success",
-                "slug": slug,
-                "mode": "agentic",
+            return streaming_response(track_job_events(job_id, events, final_fields), stream_format, final_fields=final_fields)
+
+        try:
+            result = run_directive(
+                slug=slug,
+                directive_content=directive_content,
+                input_data=input_data,
+                allowed_tools=allowed_tools,
+                token_data=token_data,
+                max_turns=max_turns,
+                max_parallel_tools=webhook_config.get("max_parallel_tools", MAX_PARALLEL_TOOLS),
+                context_budget_tokens=webhook_config.get("context_budget_tokens", CONTEXT_BUDGET_TOKENS),
+                job_id=job_id
+            )
+            return job_finish(job_id, {
+                "status": "success",
+                "job_id": job_id,
+                "slug": slug,
+                "mode": "agentic",
                 "directive": directive_name,
                 "response": result["response"],
                 "thinking": result["thinking"],
                 "conversation": result["conversation"],
                 "usage": result["usage"],
                 "timestamp": datetime.utcnow().isoformat()
-            }
+            })
         except Exception as e:
             logger.error(f"Directive error: {e}")
             slack_error(str(e))
-            return {"status": "error", "error": str(e)}
+            return job_finish(job_id, {"status": "error", "job_id": job_id, "error": str(e)})
+
+    return job_finish(job_id, {"status": "error", "error": "Webhook config must have either 'script' or 'directive'"})
+
+
+@app.function(image=image, secrets=ALL_SECRETS, timeout=1800, min_containers=MIN_CONTAINERS["directive_background"])
+def directive_background(job_id: str, slug: str, payload: dict):
+    """Background task: run a directive queued with {"async": true}."""
+    try:
+        return execute_directive(slug, {**payload, "stream": None}, job_id=job_id)
+    finally:
+        slack_flush()
+
+
+@app.cls(image=image, secrets=ALL_SECRETS, timeout=600, min_containers=MIN_CONTAINERS["directive"])
+class Directive(WarmContainer):
+    @modal.fastapi_endpoint(method="POST", label=endpoint_label("directive"))
+    def directive(self, slug: str, payload: dict = None):
+        """
+        Execute a specific directive by slug.
+
+        Supports two modes:
+        - Procedural: "script" in config → runs Python script directly (Claude only for creative tasks)
+        - Agentic: "directive" in config → Claude orchestrates using tools
+
+        URL: POST /directive?slug={slug}
+        Body: {"data": {...}}  (input data for the directive)
+
+        Agentic directives can stream progress instead of blocking until the end:
+        Body: {"data": {...}, "stream": "sse"}  (or "ndjson"; true means sse)
+        Events: start, thinking_delta, text_delta, tool_call, tool_result, complete, error
+
+        Every run is recorded as a job. With {"async": true} the directive is queued in the
+        background and the response is just the job id; poll the returned "poll" URL for progress.
+
+        Retries are deduplicated by "idempotency_key" (or an identical body within a few minutes): they get the
+        original run's result instead of re-running it. Streamed runs are not deduplicated.
+        """
+        payload = payload or {}
+
+        job_id = None
+        if not payload.get("stream"):
+            job_id, is_new = claim_idempotency(make_idempotency_key(f"directive:{slug}", payload, payload.get("idempotency_key")))
+            if not is_new:
+                logger.info(f"♻️ Duplicate request for {slug} → job {job_id}")
+                return replay_job(job_id, wait=0 if payload.get("async") else IDEMPOTENCY_WAIT)
+
+        job_id = job_create("directive", {"slug": slug}, job_id=job_id)
+
+        if payload.get("async"):
+            directive_background.spawn(job_id, slug, payload)
+            return {"status": "queued", "job_id": job_id, "slug": slug, "poll": job_poll_url(job_id)}
+
+        return execute_directive(slug, payload, job_id=job_id)
+
 
-    return {"status": "error", "error": "Webhook config must have either 'script' or 'directive'"}
+@app.function(image=image, secrets=ALL_SECRETS, timeout=30)
+@modal.asgi_app(label=endpoint_label("jobs"))
+def jobs():
+    """
+    Job status API.
+    GET /jobs/{job_id} → status, steps, result and error of a queued or finished run.
+    """
+    from fastapi import FastAPI
+    from fastapi.responses import JSONResponse
+
+    web_app = FastAPI(title="Claude Orchestrator Jobs")
+
+    @web_app.get("/{job_id}")
+    def get_job(job_id: str):
+        job = job_get(job_id)
+        if not job:
+            return JSONResponse({"status": "error", "error": f"Unknown job: {job_id}"}, status_code=404)
+        return job
+
+    return web_app
 
 
 @app.function(image=image, secrets=ALL_SECRETS, timeout=30)
@@ -824,57 +1675,51 @@ def list_webhooks():
 # GENERAL QUERY AGENT - Natural language meta-orchestrator
 # ============================================================================
 
+def directive_description(content: str) -> str:
+    """First line under a directive's Goal/Description heading."""
+    desc = ""
+    for line in content.split("\n"):
+        if line.startswith("## Goal") or line.startswith("## Description"):
+            # Get the next non-empty line
+            idx = content.find(line)
+            remaining = content[idx + len(line):].strip()
+            desc = remaining.split("\n")[0].strip()
+            break
+    return desc[:200] if desc else "No description"
+
+
+def script_description(content: str) -> str:
+    """First line of a script's module docstring."""
+    desc = ""
+    if '"""' in content:
+        start = content.find('"""') + 3
+        end = content.find('"""', start)
+        if end > start:
+            desc = content[start:end].strip().split("\n")[0]
+    return desc[:150] if desc else "No description"
+
+
 def list_available_directives() -> list[dict]:
-    """List all available directives with their descriptions."""
+    """List all available directives with their descriptions (parsed once per file version)."""
     directives_dir = Path("/app/directives")
-    directives = []
-
-    for f in directives_dir.glob("*.md"):
-        content = f.read_text()
-        # Extract first heading as title
-        title = f.stem.replace("_", " ").title()
-        # Extract goal/description from content
-        desc = ""
-        for line in content.split("\n"):
-            if line.startswith("## Goal") or line.startswith("## Description"):
-                # Get the next non-empty line
-                idx = content.find(line)
-                remaining = content[idx + len(line):].strip()
-                desc = remaining.split("\n")[0].strip()
-                break
-
-        directives.append({
+    return [
+        {
             "name": f.stem,
-            "title": title,
-            "description": desc[:200] if desc else "No description"
-        })
-
-    return directives
+            "title": f.stem.replace("_", " ").title(),
+            "description": read_cached(f, directive_description)
+        }
+        for f in sorted(directives_dir.glob("*.md"))
+    ]
 
 
 def list_available_scripts() -> list[dict]:
-    """List all available execution scripts."""
+    """List all available execution scripts (docstrings parsed once per file version)."""
     scripts_dir = Path("/app/execution")
-    scripts = []
-
-    for f in scripts_dir.glob("*.py"):
-        if f.stem.startswith("_"):
-            continue
-        # Read first docstring
-        content = f.read_text()
-        desc = ""
-        if '"""' in content:
-            start = content.find('"""') + 3
-            end = content.find('"""', start)
-            if end > start:
-                desc = content[start:end].strip().split("\n")[0]
-
-        scripts.append({
-            "name": f.stem,
-            "description": desc[:150] if desc else "No description"
-        })
-
-    return scripts
+    return [
+        {"name": f.stem, "description": read_cached(f, script_description)}
+        for f in sorted(scripts_dir.glob("*.py"))
+        if not f.stem.startswith("_")
+    ]
 
 
 AGENT_TOOLS = {
@@ -973,45 +1818,7 @@ def run_agent_tool(tool_name: str, tool_input: dict, token_data: dict) -> dict:
     return {"error": f"Unknown tool: {tool_name}"}
 
 
-def call_claude(client, **kwargs) -> tuple:
-    """Call Claude API directly (no streaming)."""
-    response = client.messages.create(**kwargs)
-    return response.content, response.usage.input_tokens, response.usage.output_tokens, response.stop_reason
-
-
-@app.function(image=image, secrets=ALL_SECRETS, timeout=300)
-@modal.fastapi_endpoint(method="GET")
-def general_agent(query: str = "", format: str = "json"):
-    """
-    General-purpose autonomous agent endpoint.
-    GET /general-agent?query=Send an email to you@yourdomain.com
-    """
-    import anthropic
-    from fastapi.responses import JSONResponse
-
-    # No query = return status
-    if not query:
-        return JSONResponse({
-            "status": "ready",
-            "message": "Provide a query parameter",
-            "example": "/agent?query=Send email to you@yourdomain.com saying hello"
-        })
-
-    slack_notify(f"🤖 *Agent Request*\n```{query[:500]}```")
-
-    # Get API key
-    api_key = os.getenv("ANTHROPIC_API_KEY")
-    if not api_key:
-        return JSONResponse({"error": "ANTHROPIC_API_KEY not set"}, status_code=500)
-
-    # Get Google token
-    try:
-        token_data = json.loads(os.getenv("GOOGLE_TOKEN_JSON", "{}"))
-    except:
-        token_data = {}
-
-    # Build system prompt
-    system = """You are an autonomous agent. Complete tasks directly.
+GENERAL_AGENT_SYSTEM = """You are an autonomous agent. Complete tasks directly.
 
 Tools available:
 - send_email: Send email. Params: to, subject, body
@@ -1022,79 +1829,146 @@ Tools available:
 
 Be concise. Complete tasks fully."""
 
-    tools = list(AGENT_TOOLS.values())
-    messages = [{"role": "user", "content": query}]
 
-    client = anthropic.Anthropic(api_key=api_key)
+def iter_agent_events(query: str, token_data: dict, api_key: str, max_turns: int = 10, slack_progress: bool = True):
+    """
+    Run the general agent loop, yielding progress events:
+    thinking/text deltas, tool_call, tool_result and finally complete.
+    """
+    client = get_anthropic_client(api_key)
+    tools = cached_tools(list(AGENT_TOOLS.values()))
+    messages = [{"role": "user", "content": query}]
     conversation = []
+    totals = new_usage()
 
-    try:
-        # Initial call
-        response = client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=4096,
-            system=system,
-            tools=tools,
-            messages=messages
-        )
+    request_kwargs = {
+        "model": "claude-sonnet-4-20250514",
+        "max_tokens": 4096,
+        "system": [{"type": "text", "text": GENERAL_AGENT_SYSTEM, "cache_control": CACHE_CONTROL}],
+        "tools": tools,
+    }
 
-        # Agentic loop
-        turns = 0
-        max_turns = 10
+    # Initial call
+    turns = 0
+    response = yield from stream_claude(client, turns, **request_kwargs, messages=messages)
+    add_usage(totals, response.usage)
 
-        while response.stop_reason == "tool_use" and turns < max_turns:
-            turns += 1
-            tool_results = []
+    # Agentic loop
+    while response.stop_reason == "tool_use" and turns < max_turns:
+        turns += 1
+        tool_results = []
 
-            for block in response.content:
-                if block.type == "tool_use":
+        for block in response.content:
+            if block.type == "tool_use":
+                yield {"type": "tool_call", "turn": turns, "tool": block.name, "input": block.input}
+                if slack_progress:
                     slack_notify(f"🔧 *Tool: {block.name}*")
 
-                    try:
-                        result = run_agent_tool(block.name, block.input, token_data)
-                        result_str = json.dumps(result) if isinstance(result, (dict, list)) else str(result)
+                is_error = False
+                try:
+                    result = run_agent_tool(block.name, block.input, token_data)
+                    result_str = json.dumps(result) if isinstance(result, (dict, list)) else str(result)
+                    if slack_progress:
                         slack_notify(f"✅ Success: {result_str[:200]}")
-                    except Exception as e:
-                        result_str = json.dumps({"error": str(e)})
+                except Exception as e:
+                    is_error = True
+                    result_str = json.dumps({"error": str(e)})
+                    if slack_progress:
                         slack_notify(f"❌ Error: {str(e)}")
 
-                    conversation.append({"tool": block.name, "result": result_str[:500]})
-                    tool_results.append({
-                        "type": "tool_result",
-                        "tool_use_id": block.id,
-                        "content": result_str[:10000]
-                    })
-
-            messages.append({"role": "assistant", "content": response.content})
-            messages.append({"role": "user", "content": tool_results})
-
-            response = client.messages.create(
-                model="claude-sonnet-4-20250514",
-                max_tokens=4096,
-                system=system,
-                tools=tools,
-                messages=messages
-            )
+                yield {"type": "tool_result", "turn": turns, "tool": block.name, "result": result_str[:10000], "is_error": is_error}
+                conversation.append({"tool": block.name, "result": result_str[:500]})
+                tool_results.append({
+                    "type": "tool_result",
+                    "tool_use_id": block.id,
+                    "content": result_str[:10000]
+                })
 
-        # Extract final text
-        final = ""
-        for block in response.content:
-            if hasattr(block, "text"):
-                final += block.text
+        messages.append({"role": "assistant", "content": response.content})
+        messages.append({"role": "user", "content": tool_results})
+        set_rolling_cache_breakpoint(messages)
 
-        slack_notify(f"🏁 *Done*\n{final[:500]}")
+        response = yield from stream_claude(client, turns, **request_kwargs, messages=messages)
+        add_usage(totals, response.usage)
 
-        return JSONResponse({
-            "status": "success",
-            "query": query,
-            "response": final,
-            "turns": turns,
-            "conversation": conversation
-        })
+    # Extract final text
+    final = ""
+    for block in response.content:
+        if hasattr(block, "text"):
+            final += block.text
 
-    except Exception as e:
-        slack_notify(f"💥 *Error*: {str(e)}")
-        return JSONResponse({"error": str(e)}, status_code=500)
+    slack_notify(f"🏁 *Done*\n{final[:500]}")
+    slack_flush()
+
+    yield {"type": "complete", "result": {"response": final, "turns": turns, "conversation": conversation, "usage": totals}}
+
+
+@app.cls(image=image, secrets=ALL_SECRETS, timeout=300, min_containers=MIN_CONTAINERS["general_agent"])
+class GeneralAgent(WarmContainer):
+    @modal.fastapi_endpoint(method="GET", label=endpoint_label("general_agent"))
+    def general_agent(self, query: str = "", format: str = "json"):
+        """
+        General-purpose autonomous agent endpoint.
+        GET /general-agent?query=Send an email to you@yourdomain.com
+
+        format=sse or format=ndjson streams deltas, tool calls and results as they happen.
+        Every run is recorded as a job; the response (or complete event) carries its job_id.
+        """
+        from fastapi.responses import JSONResponse
+
+        # No query = return status
+        if not query:
+            return JSONResponse({
+                "status": "ready",
+                "message": "Provide a query parameter",
+                "example": "/agent?query=Send email to you@yourdomain.com saying hello"
+            })
+
+        if format != "json" and format not in STREAM_FORMATS:
+            return JSONResponse({"error": f"Unknown format: {format}", "available": ["json", *STREAM_FORMATS]}, status_code=400)
+
+        slack_run()
+        slack_notify(f"🤖 *Agent Request*\n```{query[:500]}```")
+
+        # Get API key
+        api_key = os.getenv("ANTHROPIC_API_KEY")
+        if not api_key:
+            return JSONResponse({"error": "ANTHROPIC_API_KEY not set"}, status_code=500)
+
+        # Get Google token
+        try:
+            token_data = json.loads(os.getenv("GOOGLE_TOKEN_JSON", "{}"))
+        except:
+            token_data = {}
+
+        job_id = job_create("general_agent", {"query": query[:200], "format": format})
+        job_update(job_id, status="running")
+
+        if format in STREAM_FORMATS:
+            final_fields = {"status": "success", "job_id": job_id, "query": query}
+            events = iter_agent_events(query, token_data, api_key, slack_progress=False)
+            return streaming_response(track_job_events(job_id, events, final_fields), format, final_fields=final_fields)
+
+        try:
+            result = {}
+            for event in track_job_events(job_id, iter_agent_events(query, token_data, api_key)):
+                if event["type"] == "complete":
+                    result = event["result"]
+
+            return JSONResponse(job_finish(job_id, {
+                "status": "success",
+                "job_id": job_id,
+                "query": query,
+                "response": result["response"],
+                "turns": result["turns"],
+                "conversation": result["conversation"],
+                "usage": result["usage"]
+            }))
+
+        except Exception as e:
+            slack_notify(f"💥 *Error*: {str(e)}")
+            slack_flush()
+            return JSONResponse(job_finish(job_id, {"status": "error", "job_id": job_id, "error": str(e)}), status_code=500)
 
 
 # ============================================================================
@@ -1106,27 +1980,43 @@ def load_cron_config() -> dict:
     config_path = Path("/app/execution/cron_config.json")
     if not config_path.exists():
         return {}
-    return json.loads(config_path.read_text())
+    return read_cached(config_path, json.loads)
 
 
-def append_to_sheet(spreadsheet_id: str, values: list, token_data: dict) -> dict:
-    """Append rows to a Google Sheet."""
-    from google.oauth2.credentials import Credentials
-    from googleapiclient.discovery import build
-    from google.auth.transport.requests import Request
+# Places already appended by the hourly scraper, per sheet, so each place lands once across runs.
+# "sheet_id|place key" -> unix time appended. Entries expire after SEEN_PLACES_TTL (the place is
+# appended again), and expired entries are pruned at most once per SEEN_PLACES_PRUNE_INTERVAL.
+seen_places = modal.Dict.from_name("claude-orchestrator-seen-places", create_if_missing=True)
+SEEN_PLACES_TTL = 90 * 86400
+SEEN_PLACES_PRUNE_INTERVAL = 86400
+SEEN_PLACES_PRUNED_KEY = "__pruned_at__"
+
+
+def prune_seen_places(now: float) -> int:
+    """Drop entries older than SEEN_PLACES_TTL, if the last prune was long enough ago. Returns entries removed."""
+    if now - (seen_places.get(SEEN_PLACES_PRUNED_KEY) or 0) < SEEN_PLACES_PRUNE_INTERVAL:
+        return 0
+    seen_places[SEEN_PLACES_PRUNED_KEY] = now
+    expired = [key for key, at in seen_places.items() if key != SEEN_PLACES_PRUNED_KEY and now - at >= SEEN_PLACES_TTL]
+    for key in expired:
+        seen_places.pop(key)
+    return len(expired)
 
-    creds = Credentials(
-        token=token_data["token"],
-        refresh_token=token_data["refresh_token"],
-        token_uri=token_data["token_uri"],
-        client_id=token_data["client_id"],
-        client_secret=token_data["client_secret"],
-        scopes=token_data["scopes"]
-    )
-    if creds.expired:
-        creds.refresh(Request())
 
-    service = build("sheets", "v4", credentials=creds)
+def place_key(place: dict) -> str:
+    """Google Maps place id, else normalized phone digits + website domain, else name + address."""
+    if place.get("placeId"):
+        return f"place:{place['placeId']}"
+    phone = re.sub(r"\D", "", place.get("phone") or "")[-10:]
+    website = re.sub(r"^(https?://)?(www\.)?", "", (place.get("website") or "").strip().lower()).split("/")[0]
+    if phone or website:
+        return f"contact:{phone}|{website}"
+    return f"name:{memo_key(place.get('title') or '')}|{memo_key(place.get('address') or '')}"
+
+
+def append_to_sheet(spreadsheet_id: str, values: list, token_data: dict) -> dict:
+    """Append rows to a Google Sheet."""
+    service = get_google_service("sheets", "v4", token_data)
 
     result = service.spreadsheets().values().append(
         spreadsheetId=spreadsheet_id,
@@ -1148,10 +2038,9 @@ def append_to_sheet(spreadsheet_id: str, values: list, token_data: dict) -> dict
 def hourly_lead_scraper():
     """
     Hourly cron job to scrape leads and append to Google Sheet.
-    Runs at the top of every hour.
+    Runs at the top of every hour. Places appended by earlier runs (within SEEN_PLACES_TTL) are skipped.
     """
-    from apify_client import ApifyClient
-
+    slack_run()
     config = load_cron_config()
     scraper_config = config.get("hourly_scraper", {})
 
@@ -1173,8 +2062,6 @@ def hourly_lead_scraper():
         slack_error("APIFY_API_TOKEN not configured")
         return {"status": "error", "error": "No Apify token"}
 
-    client = ApifyClient(api_token)
-
     full_search = f"{search_query} in {location}"
     run_input = {
         "searchStringsArray": [full_search],
@@ -1184,44 +2071,64 @@ def hourly_lead_scraper():
     }
 
     try:
-        run = client.actor("compass/crawler-google-places").call(run_input=run_input)
+        token_data = json.loads(os.getenv("GOOGLE_TOKEN_JSON"))
+        timestamp = datetime.utcnow().isoformat()
+        seen = set()
+        leads_found = 0
+        already_seen = 0
+        appended_rows = 0
+
+        # Append each batch as the actor produces it instead of waiting for the whole run
+        for items in iter_actor_batches("compass/crawler-google-places", run_input):
+            rows = []
+            new_keys = []
+            appended_at = dict_get_many(seen_places, {f"{sheet_id}|{place_key(r)}" for r in items})
+            for r in items:
+                leads_found += 1
+                key = f"{sheet_id}|{place_key(r)}"
+                if key in seen or time.time() - appended_at.get(key, 0) < SEEN_PLACES_TTL:
+                    already_seen += 1
+                    continue
+                seen.add(key)
+                new_keys.append(key)
+                # Format for sheet
+                rows.append([
+                    timestamp,
+                    r.get("title", ""),
+                    "",  # contact_name not available from maps
+                    "",  # email not available from maps
+                    r.get("phone", ""),
+                    r.get("website", ""),
+                    r.get("address", ""),
+                    r.get("categoryName", ""),
+                    "google_maps"
+                ])
 
-        results = []
-        for item in client.dataset(run["defaultDatasetId"]).iterate_items():
-            results.append(item)
+            if rows:
+                appended_rows += append_to_sheet(sheet_id, rows, token_data).get("appended_rows", 0)
+                # Record only after the append succeeded, so a failed write is retried next hour
+                now = time.time()
+                seen_places.update({key: now for key in new_keys})
 
-        logger.info(f"Scraped {len(results)} leads")
+        new_leads = leads_found - already_seen
+        logger.info(f"Scraped {leads_found} leads ({new_leads} new, {already_seen} already in sheet)")
 
-        if not results:
+        pruned = prune_seen_places(time.time())
+        if pruned:
+            logger.info(f"Pruned {pruned} expired seen-place entries")
+
+        if not leads_found:
             slack_notify("⏰ Hourly scraper: No results found")
             return {"status": "success", "leads_found": 0}
 
-        # Format for sheet
-        timestamp = datetime.utcnow().isoformat()
-        rows = []
-        for r in results:
-            rows.append([
-                timestamp,
-                r.get("title", ""),
-                "",  # contact_name not available from maps
-                "",  # email not available from maps
-                r.get("phone", ""),
-                r.get("website", ""),
-                r.get("address", ""),
-                r.get("categoryName", ""),
-                "google_maps"
-            ])
-
-        # Append to sheet
-        token_data = json.loads(os.getenv("GOOGLE_TOKEN_JSON"))
-        append_result = append_to_sheet(sheet_id, rows, token_data)
-
-        slack_notify(f"✅ *Hourly Scraper Complete*\nLeads: {len(results)}\nAppended: {append_result.get('appended_rows', 0)} rows")
+        slack_notify(f"✅ *Hourly Scraper Complete*\nLeads: {leads_found} ({new_leads} new, {already_seen} seen)\nAppended: {appended_rows} rows")
 
         return {
             "status": "success",
-            "leads_found": len(results),
-            "appended_rows": append_result.get("appended_rows", 0),
+            "leads_found": leads_found,
+            "new_leads": new_leads,
+            "already_seen": already_seen,
+            "appended_rows": appended_rows,
             "sheet_id": sheet_id
         }
 
@@ -1230,513 +2137,940 @@ def hourly_lead_scraper():
         slack_error(f"Hourly scraper failed: {str(e)}")
         return {"status": "error", "error": str(e)}
 
+    finally:
+        slack_flush()
+
 
 # ============================================================================
-# EXECUTION-ONLY WEBHOOKS (No Claude orchestration - pure script execution)
+# APIFY STREAMING (consume a run's dataset while the actor is still scraping)
 # ============================================================================
 
-# Background function for full lead scraping workflow
-@app.function(image=image, secrets=ALL_SECRETS, timeout=1800)  # 30 min timeout for full workflow
-def scrape_leads_background(query: str, location: str, limit: int, sheet_id: str, sheet_url: str):
+APIFY_POLL_INTERVAL = 5  # Seconds between dataset polls while a run is in progress
+APIFY_PAGE_SIZE = 1000  # Items fetched per dataset request
+APIFY_TERMINAL_STATUSES = {"SUCCEEDED", "FAILED", "ABORTED", "TIMED-OUT"}
+
+
+def iter_actor_batches(actor_id: str, run_input: dict, poll_interval: float = APIFY_POLL_INTERVAL):
     """
-    Background task: Full lead scraping workflow.
-    1. Scrape leads via Apify
-    2. Upload to Google Sheet
-    3. Enrich with AnyMailFinder
-    4. Casualize company names
+    Start an Apify actor and yield lists of new dataset items as they land, until the run ends.
+    Closing the generator early aborts the run.
     """
-    from apify_client import ApifyClient
-    import gspread
-    import anthropic
-    from google.oauth2.credentials import Credentials as UserCredentials
-    from google.auth.transport.requests import Request
-    import requests as http_requests
+    client = get_apify_client()
+    run = client.actor(actor_id).start(run_input=run_input)
+    run_client = client.run(run["id"])
+    dataset = client.dataset(run["defaultDatasetId"])
+    offset = 0
+    status = run["status"]
 
     try:
-        # ===== STEP 1: Scrape with Apify =====
-        slack_notify(f"📥 *Step 1/4: Scraping*\nQuery: {query}\nLimit: {limit}")
+        while True:
+            # Read the status first: items pushed before a run finishes are drained by the last pass
+            status = run_client.get()["status"]
+            while True:
+                page = dataset.list_items(offset=offset, limit=APIFY_PAGE_SIZE)
+                if page.items:
+                    offset += len(page.items)
+                    yield page.items
+                if len(page.items) < APIFY_PAGE_SIZE:
+                    break
+
+            if status in APIFY_TERMINAL_STATUSES:
+                if status != "SUCCEEDED":
+                    logger.warning(f"Apify run {run['id']} ended {status} after {offset} items")
+                return
+            time.sleep(poll_interval)
+    finally:
+        if status not in APIFY_TERMINAL_STATUSES:
+            run_client.abort()
+
+
+def iter_partitioned_batches(actor_id: str, run_inputs: list, poll_interval: float = APIFY_POLL_INTERVAL):
+    """
+    Run one actor per input concurrently and yield (partition index, items) batches as any of them produce.
+    A failed partition is logged and skipped; the error is raised only if every partition failed.
+    """
+    if len(run_inputs) == 1:
+        for items in iter_actor_batches(actor_id, run_inputs[0], poll_interval):
+            yield 0, items
+        return
 
-        api_token = os.getenv("APIFY_API_TOKEN")
-        if not api_token:
-            raise ValueError("APIFY_API_TOKEN not configured")
+    batches = queue.Queue(maxsize=len(run_inputs) * 2)  # Bounded: slow consumers pause the pollers
+    stop = threading.Event()
+    done = object()
 
-        apify_client = ApifyClient(api_token)
+    def put(entry):
+        while not stop.is_set():
+            try:
+                batches.put(entry, timeout=1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def poll(index, run_input):
+        stream = iter_actor_batches(actor_id, run_input, poll_interval)
+        try:
+            for items in stream:
+                if not put((index, items)):
+                    break
+            put((index, done))
+        except Exception as e:
+            put((index, e))
+        finally:
+            stream.close()  # Aborts the run if we stopped early
 
-        run_input = {
-            "fetch_count": limit,
-            "contact_job_title": [query],
-            "company_keywords": [query],
-            "contact_location": [location.lower()],
-            "language": "en",
-        }
+    threads = [threading.Thread(target=poll, args=(i, run_input), daemon=True) for i, run_input in enumerate(run_inputs)]
+    for thread in threads:
+        thread.start()
 
-        run = apify_client.actor("code_crafter/leads-finder").call(run_input=run_input)
+    remaining = len(threads)
+    errors = []
+    try:
+        while remaining:
+            index, entry = batches.get()
+            if entry is done:
+                remaining -= 1
+            elif isinstance(entry, Exception):
+                remaining -= 1
+                errors.append(entry)
+                logger.warning(f"Apify partition {index + 1}/{len(run_inputs)} failed: {entry}")
+            else:
+                yield index, entry
+    finally:
+        stop.set()
+
+    if len(errors) == len(run_inputs):
+        raise errors[0]
 
-        results = []
-        for item in apify_client.dataset(run["defaultDatasetId"]).iterate_items():
-            results.append(item)
 
-        logger.info(f"Scraped {len(results)} leads")
+# ============================================================================
+# EMAIL ENRICHMENT (AnyMailFinder)
+# ============================================================================
 
-        if not results:
-            slack_notify(f"⚠️ *No leads found for query: {query}*")
-            return {"status": "no_results", "leads_found": 0}
+AMF_URL = "https://api.anymailfinder.com/v5.1/find-email/person"
+AMF_MAX_WORKERS = 10  # Concurrent lookups
+AMF_REQUESTS_PER_SECOND = 5  # Client-side cap so bursts don't trip AnyMailFinder's rate limit
+AMF_MAX_RETRIES = 4  # Retries on 429/5xx/network errors, with exponential backoff
+AMF_RETRY_STATUSES = {429, 500, 502, 503, 504}
 
-        # ===== STEP 2: Upload to Google Sheet =====
-        slack_notify(f"📤 *Step 2/4: Uploading {len(results)} leads to Sheet*")
+# Lookups are cached across runs by person + domain, misses included, so overlapping scrapes
+# (same vertical, same region) don't pay for the same contact twice.
+# key -> {"email": str ("" = not found), "at": unix time}
+enrichment_cache = modal.Dict.from_name("claude-orchestrator-enrichment", create_if_missing=True)
+AMF_HIT_TTL = 90 * 86400  # Seconds a found email is reused
+AMF_MISS_TTL = 14 * 86400  # Seconds a "not found" is trusted before asking again
 
-        import pandas as pd
 
-        token_data = json.loads(os.getenv("GOOGLE_TOKEN_JSON"))
-        creds = UserCredentials(
-            token=token_data["token"],
-            refresh_token=token_data["refresh_token"],
-            token_uri=token_data["token_uri"],
-            client_id=token_data["client_id"],
-            client_secret=token_data["client_secret"],
-            scopes=token_data["scopes"]
-        )
-        if creds.expired:
-            creds.refresh(Request())
+def amf_request_body(contact_name: str, company_name: str, website: str):
+    """Build an AnyMailFinder person lookup, or None if there isn't enough to search on."""
+    domain = ""
+    if website:
+        domain = website.replace("https://", "").replace("http://", "").replace("www.", "").split("/")[0]
 
-        gc = gspread.authorize(creds)
-        sh = gc.open_by_key(sheet_id)
-        worksheet = sh.get_worksheet(0)
+    name_parts = contact_name.split() if contact_name else []
+    first_name = name_parts[0] if name_parts else ""
+    last_name = name_parts[-1] if len(name_parts) > 1 else ""
+
+    if not ((first_name or contact_name) and (domain or company_name)):
+        return None
+
+    body = {}
+    if contact_name:
+        body["full_name"] = contact_name
+    if first_name:
+        body["first_name"] = first_name
+    if last_name:
+        body["last_name"] = last_name
+    if domain:
+        body["domain"] = domain
+    if company_name:
+        body["company_name"] = company_name
+    return body
+
+
+def amf_cache_key(body: dict) -> str:
+    """Normalized "full name|domain" (company name when there's no website)."""
+    name = body.get("full_name") or f"{body.get('first_name', '')} {body.get('last_name', '')}"
+    place = body.get("domain") or body.get("company_name", "")
+    return f"{' '.join(name.lower().split())}|{place.lower().strip()}"
 
-        # Use pandas to flatten JSON like the real update_sheet.py does
-        df = pd.json_normalize(results)
 
-        # Add three casual columns for first_name, company_name, city
-        # Insert casual_first_name after first_name
-        if "first_name" in df.columns:
-            idx = df.columns.get_loc("first_name")
-            df.insert(idx + 1, "casual_first_name", "")
+def amf_find_email(body: dict, api_key: str, limiter: RateLimiter):
+    """
+    One AnyMailFinder lookup, retrying rate limits and server errors.
+    Returns the email, "" when AnyMailFinder has none, or None when the answer is unknown (don't cache).
+    """
+    import requests
 
-        # Insert casual_company_name after company_name
-        if "company_name" in df.columns:
-            idx = df.columns.get_loc("company_name")
-            df.insert(idx + 1, "casual_company_name", "")
+    session = get_http_session()
+    headers = {"Authorization": api_key, "Content-Type": "application/json"}
 
-        # Insert casual_city_name after city
-        if "city" in df.columns:
-            idx = df.columns.get_loc("city")
-            df.insert(idx + 1, "casual_city_name", "")
+    for attempt in range(AMF_MAX_RETRIES + 1):
+        limiter.wait()
+        try:
+            resp = session.post(AMF_URL, json=body, headers=headers, timeout=30)
+        except requests.RequestException:
+            if attempt == AMF_MAX_RETRIES:
+                raise
+            time.sleep(min(30, 2 ** attempt) + random.random())
+            continue
 
-        # Convert NaN to empty strings for gspread
-        df = df.fillna("")
+        if resp.status_code in AMF_RETRY_STATUSES and attempt < AMF_MAX_RETRIES:
+            retry_after = resp.headers.get("Retry-After", "")
+            time.sleep(float(retry_after) if retry_after.isdigit() else min(30, 2 ** attempt) + random.random())
+            continue
 
-        # Prepare data: headers + rows
-        headers = df.columns.tolist()
-        rows = [headers] + df.values.tolist()
+        if resp.status_code == 200:
+            return resp.json().get("email", "") or ""
+        if resp.status_code == 404:  # Searched, nothing found
+            return ""
+        logger.warning(f"AMF {resp.status_code}: {resp.text[:200]}")
+        return None
 
-        # Resize worksheet if needed
-        required_rows = len(rows)
-        required_cols = len(headers)
-        if required_rows > worksheet.row_count or required_cols > worksheet.col_count:
-            worksheet.resize(rows=max(required_rows, worksheet.row_count), cols=max(required_cols, worksheet.col_count))
+    return None
 
-        # Upload all data
-        worksheet.update(values=rows, range_name="A1")
 
-        # ===== STEP 3: Enrich with AnyMailFinder =====
-        slack_notify(f"📧 *Step 3/4: Enriching emails with AnyMailFinder*")
+def amf_cached_find_email(body: dict, api_key: str, limiter: RateLimiter) -> tuple:
+    """Cache-first lookup. Returns (email or "" / None as in amf_find_email, served_from_cache)."""
+    key = amf_cache_key(body)
+    cached = enrichment_cache.get(key)
+    if cached:
+        ttl = AMF_HIT_TTL if cached["email"] else AMF_MISS_TTL
+        if time.time() - cached["at"] < ttl:
+            return cached["email"], True
 
-        amf_api_key = os.getenv("ANYMAILFINDER_API_KEY")
-        if not amf_api_key:
-            slack_notify("⚠️ ANYMAILFINDER_API_KEY not configured, skipping enrichment")
-        else:
-            # Get rows that need enrichment (no email)
-            all_data = worksheet.get_all_values()
-            header_row = all_data[0]
-
-            # Find column indices
-            email_col = header_row.index("email") if "email" in header_row else -1
-            company_col = header_row.index("company_name") if "company_name" in header_row else -1
-            contact_col = header_row.index("contact_name") if "contact_name" in header_row else -1
-            website_col = header_row.index("website") if "website" in header_row else -1
-
-            enriched_count = 0
-            for row_idx, row in enumerate(all_data[1:], start=2):  # Skip header, 1-indexed in sheets
-                if email_col >= 0 and row[email_col]:  # Already has email
-                    continue
+    email = amf_find_email(body, api_key, limiter)
+    if email is not None:
+        enrichment_cache[key] = {"email": email, "at": time.time()}
+    return email, False
 
-                company_name = row[company_col] if company_col >= 0 else ""
-                contact_name = row[contact_col] if contact_col >= 0 else ""
-                website = row[website_col] if website_col >= 0 else ""
 
-                # Extract domain from website
-                domain = ""
-                if website:
-                    domain = website.replace("https://", "").replace("http://", "").replace("www.", "").split("/")[0]
+def enrich_emails(lookups: dict, api_key: str) -> tuple:
+    """
+    Run AnyMailFinder lookups concurrently, cache first.
+    lookups maps any key (e.g. sheet row) -> request body.
+    Returns ({key: email} for hits, {"cached": n, "errors": n}).
+    """
+    limiter = RateLimiter(AMF_REQUESTS_PER_SECOND)
+    found = {}
+    stats = {"cached": 0, "errors": 0}
 
-                # Parse contact name
-                name_parts = contact_name.split() if contact_name else []
-                first_name = name_parts[0] if name_parts else ""
-                last_name = name_parts[-1] if len(name_parts) > 1 else ""
+    with ThreadPoolExecutor(max_workers=AMF_MAX_WORKERS) as executor:
+        futures = {key: executor.submit(amf_cached_find_email, body, api_key, limiter) for key, body in lookups.items()}
+        for key, future in futures.items():
+            try:
+                email, from_cache = future.result()
+            except Exception as e:
+                stats["errors"] += 1
+                logger.warning(f"AMF error for {lookups[key].get('full_name', key)}: {e}")
+                continue
+            stats["cached"] += from_cache
+            if email:
+                found[key] = email
 
-                # Call AnyMailFinder API
-                try:
-                    amf_url = "https://api.anymailfinder.com/v5.1/find-email/person"
-                    amf_headers = {"Authorization": amf_api_key, "Content-Type": "application/json"}
-                    amf_body = {}
-
-                    if contact_name:
-                        amf_body["full_name"] = contact_name
-                    if first_name:
-                        amf_body["first_name"] = first_name
-                    if last_name:
-                        amf_body["last_name"] = last_name
-                    if domain:
-                        amf_body["domain"] = domain
-                    if company_name:
-                        amf_body["company_name"] = company_name
-
-                    if (first_name or contact_name) and (domain or company_name):
-                        resp = http_requests.post(amf_url, json=amf_body, headers=amf_headers, timeout=30)
-                        if resp.status_code == 200:
-                            data = resp.json()
-                            email = data.get("email", "")
-                            if email:
-                                # Update cell
-                                cell = f"{chr(65 + email_col)}{row_idx}"
-                                worksheet.update_acell(cell, email)
-                                enriched_count += 1
-                except Exception as e:
-                    logger.warning(f"AMF error for {contact_name}: {e}")
+    return found, stats
 
-            slack_notify(f"✅ Enriched {enriched_count} emails")
 
-        # ===== STEP 4: Casualize first names, company names, and cities =====
-        slack_notify(f"✨ *Step 4/4: Casualizing names (first, company, city)*")
+def enrich_frame(df, api_key: str) -> dict:
+    """
+    Fill the email column of a lead table (indexed by sheet row) for rows that don't have one.
+    Updates df in place and returns stats incl. lookups/found.
+    """
+    blank = [""] * len(df)
+    missing = df["email"] == ""
+    lookups = {}
+    for row_num, contact, company, website in zip(
+        df.index[missing],
+        df["contact_name"][missing] if "contact_name" in df else blank,
+        df["company_name"][missing] if "company_name" in df else blank,
+        df["website"][missing] if "website" in df else blank,
+    ):
+        body = amf_request_body(contact, company, website)
+        if body:
+            lookups[row_num] = body
+
+    found, stats = enrich_emails(lookups, api_key)
+    if found:
+        df.loc[list(found), "email"] = list(found.values())
+    return {**stats, "lookups": len(lookups), "found": len(found)}
 
-        anthropic_key = os.getenv("ANTHROPIC_API_KEY")
-        if not anthropic_key:
-            slack_notify("⚠️ ANTHROPIC_API_KEY not configured, skipping casualization")
-        else:
-            claude_client = anthropic.Anthropic(api_key=anthropic_key)
-
-            # Re-fetch data
-            all_data = worksheet.get_all_values()
-            header_row = all_data[0]
-
-            # Find column indices
-            first_name_col = header_row.index("first_name") if "first_name" in header_row else -1
-            company_col = header_row.index("company_name") if "company_name" in header_row else -1
-            city_col = header_row.index("city") if "city" in header_row else -1
-            casual_first_col = header_row.index("casual_first_name") if "casual_first_name" in header_row else -1
-            casual_company_col = header_row.index("casual_company_name") if "casual_company_name" in header_row else -1
-            casual_city_col = header_row.index("casual_city_name") if "casual_city_name" in header_row else -1
-
-            # Batch process 50 at a time (like casualize_batch.py)
-            BATCH_SIZE = 50
-            data_rows = all_data[1:]
-            total_batches = (len(data_rows) + BATCH_SIZE - 1) // BATCH_SIZE
-
-            for batch_num, batch_start in enumerate(range(0, len(data_rows), BATCH_SIZE), 1):
-                batch_end = min(batch_start + BATCH_SIZE, len(data_rows))
-                batch_rows = data_rows[batch_start:batch_end]
-
-                # Build records for this batch
-                records = []
-                for row in batch_rows:
-                    first_name = row[first_name_col] if first_name_col >= 0 and len(row) > first_name_col else ""
-                    company_name = row[company_col] if company_col >= 0 and len(row) > company_col else ""
-                    city = row[city_col] if city_col >= 0 and len(row) > city_col else ""
-                    records.append({
-                        "first_name": first_name,
-                        "company_name": company_name,
-                        "city": city
-                    })
-
-                if not any(r["first_name"] or r["company_name"] or r["city"] for r in records):
-                    continue
 
-                # Format as compact JSON
-                records_json = json.dumps([
-                    {"id": i+1, "first_name": r["first_name"], "company_name": r["company_name"], "city": r["city"]}
-                    for i, r in enumerate(records)
-                ])
+# ============================================================================
+# CASUALIZATION (first names, company names, cities for cold emails)
+# ============================================================================
 
-                prompt = f"""Convert to casual forms for cold emails. Return ONLY valid JSON array.
+CASUALIZE_MODEL = "claude-3-5-haiku-20241022"
+CASUALIZE_BATCH_SIZE = 50
+CASUALIZE_CONCURRENCY = int(os.getenv("CASUALIZE_CONCURRENCY", "4"))  # Batches in flight at once
+CASUALIZE_REQUESTS_PER_SECOND = 2  # Spacing between batch starts
+
+CASUALIZE_FIELDS = {"first_name": "casual_first_name", "company_name": "casual_company_name", "city": "casual_city_name"}
+
+# Forced tool use gives schema-shaped output instead of free text that needs fence stripping
+CASUALIZE_TOOL = {
+    "name": "record_casual_forms",
+    "description": "Record the casual form of every input record, keyed by its id.",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "records": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "id": {"type": "integer"},
+                        "casual_first_name": {"type": "string"},
+                        "casual_company_name": {"type": "string"},
+                        "casual_city_name": {"type": "string"}
+                    },
+                    "required": ["id", "casual_first_name", "casual_company_name", "casual_city_name"]
+                }
+            }
+        },
+        "required": ["records"]
+    }
+}
+
+CASUALIZE_PROMPT = """Convert to casual forms for cold emails.
 
 Rules:
 - first_name: Common nicknames (William→Will, Jennifer→Jen), keep if no nickname
 - company_name: Remove "The", legal suffixes (LLC/Inc/Corp/Ltd), generic words (Realty/Real Estate/Group/Services). Use "you guys" if too generic
 - city: Local nicknames (San Francisco→SF, Philadelphia→Philly), keep if none
 
-Input: {records_json}
+Record one entry per input id with record_casual_forms.
 
-Output JSON only (no markdown, no explanations):"""
+Input: {records_json}"""
 
-                try:
-                    msg = claude_client.messages.create(
-                        model="claude-3-5-haiku-20241022",
-                        max_tokens=6000,
-                        messages=[{"role": "user", "content": prompt}]
-                    )
-                    response_text = msg.content[0].text.strip()
-
-                    # Remove markdown code blocks if present
-                    if response_text.startswith("```"):
-                        lines = response_text.split('\n')
-                        response_text = '\n'.join(lines[1:-1])
-
-                    # Parse JSON response
-                    results_json = json.loads(response_text)
-
-                    # Update cells in batch
-                    updates = []
-                    for i, result in enumerate(results_json):
-                        row_num = batch_start + i + 2  # +2 for header and 1-indexing
-
-                        if casual_first_col >= 0:
-                            casual_first = result.get("casual_first_name", result.get("first_name", ""))
-                            cell = f"{column_letter(casual_first_col)}{row_num}"
-                            updates.append({"range": cell, "values": [[casual_first]]})
-
-                        if casual_company_col >= 0:
-                            casual_company = result.get("casual_company_name", result.get("company_name", ""))
-                            cell = f"{column_letter(casual_company_col)}{row_num}"
-                            updates.append({"range": cell, "values": [[casual_company]]})
-
-                        if casual_city_col >= 0:
-                            casual_city = result.get("casual_city_name", result.get("city", ""))
-                            cell = f"{column_letter(casual_city_col)}{row_num}"
-                            updates.append({"range": cell, "values": [[casual_city]]})
-
-                    if updates:
-                        worksheet.batch_update(updates)
-
-                    logger.info(f"Batch {batch_num}/{total_batches} complete")
 
+def casualize_batch(client, records: dict) -> dict:
+    """Casualize {id: {first_name, company_name, city}} in one call. Returns {id: {casual_*}} for the ids Claude returned."""
+    records_json = json.dumps([{"id": record_id, **record} for record_id, record in records.items()])
+    msg = client.messages.create(
+        model=CASUALIZE_MODEL,
+        max_tokens=8000,
+        tools=[CASUALIZE_TOOL],
+        tool_choice={"type": "tool", "name": CASUALIZE_TOOL["name"]},
+        messages=[{"role": "user", "content": CASUALIZE_PROMPT.format(records_json=records_json)}]
+    )
+    tool_use = next(block for block in msg.content if block.type == "tool_use")
+    return {
+        item["id"]: {field: item.get(field, "") for field in CASUALIZE_FIELDS.values()}
+        for item in tool_use.input.get("records", [])
+        if item.get("id") in records
+    }
+
+
+def casualize_records(records: dict, client, concurrency: int = CASUALIZE_CONCURRENCY,
+                      batch_size: int = CASUALIZE_BATCH_SIZE) -> tuple:
+    """
+    Casualize {id: record} with batches running concurrently.
+    Records from failed batches (or missing from a response) are retried once in half-size batches.
+    Returns ({id: {casual_*}}, number of records that still failed).
+    """
+    limiter = RateLimiter(CASUALIZE_REQUESTS_PER_SECOND)
+    results = {}
+
+    def run(batch):
+        limiter.wait()
+        return casualize_batch(client, batch)
+
+    def run_all(items: list, size: int) -> list:
+        """Run items in batches of size; returns the ids that didn't come back."""
+        batches = [dict(items[i:i + size]) for i in range(0, len(items), size)]
+        leftover = []
+        with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(batches)))) as executor:
+            futures = {executor.submit(run, batch): batch for batch in batches}
+            for future, batch in futures.items():
+                try:
+                    results.update(future.result())
                 except Exception as e:
-                    logger.warning(f"Casualization batch {batch_num} error: {e}")
+                    logger.warning(f"Casualization batch of {len(batch)} failed: {e}")
+                leftover.extend(record_id for record_id in batch if record_id not in results)
+        return leftover
 
-        # ===== COMPLETE =====
-        slack_notify(f"✅ *Lead Scraping Complete!*\nLeads: {len(results)}\nSheet: {sheet_url}")
+    leftover = run_all(list(records.items()), batch_size)
+    if leftover:
+        logger.info(f"Retrying {len(leftover)} records in smaller batches")
+        leftover = run_all([(record_id, records[record_id]) for record_id in leftover], max(1, batch_size // 2))
 
-        return {
-            "status": "success",
-            "leads_found": len(results),
-            "sheet_url": sheet_url
-        }
+    return results, len(leftover)
 
-    except Exception as e:
-        logger.error(f"Background scrape error: {e}")
-        slack_error(f"Lead scraping failed: {str(e)}")
-        return {"status": "error", "error": str(e)}
 
+# Memo of past casualizations, consulted before Claude: "field|normalized value" -> casual form.
+# Names and cities repeat constantly across scrapes (William→Will, Philadelphia→Philly).
+casual_memo = modal.Dict.from_name("claude-orchestrator-casual-memo", create_if_missing=True)
 
-@app.function(image=image, secrets=ALL_SECRETS, timeout=60)
-@modal.fastapi_endpoint(method="GET")
-def scrape_leads(query: str = "", location: str = "United States", limit: int = 100):
-    """
-    Execution-only: Scrape leads with full workflow.
+LEGAL_SUFFIX_PATTERN = re.compile(
+    r"[\s,]+(?:l\.?l\.?c|inc|incorporated|corp|corporation|co|company|ltd|limited|llp|lp|pllc|p\.?c|plc)\.?$",
+    re.IGNORECASE
+)
+GENERIC_COMPANY_PATTERN = re.compile(r"(?:^|\s+)(?:realty|real estate|group|services)$", re.IGNORECASE)
+# Words that don't identify a business on their own ("Plumbing Co" -> "you guys", not "Plumbing")
+GENERIC_COMPANY_WORDS = {
+    "realty", "real", "estate", "group", "services", "service", "solutions", "enterprises", "holdings",
+    "partners", "associates", "management", "consulting", "marketing", "agency", "properties",
+    "construction", "plumbing", "roofing", "cleaning", "landscaping", "dental", "law", "insurance",
+    "home", "homes", "and", "&",
+}
+RULE_MAX_COMPANY_WORDS = 3  # Longer names still go to Claude (it shortens them)
 
-    URL: GET /scrape-leads?query=dentists&location=United States&limit=100
 
-    Returns 201 immediately with Google Sheet URL.
-    Background task then:
-    1. Scrapes leads via Apify
-    2. Uploads to the sheet
-    3. Enriches emails with AnyMailFinder
-    4. Casualizes company names
+def memo_key(value: str) -> str:
+    """Case- and whitespace-insensitive memo key."""
+    return " ".join(value.lower().split())
 
-    Monitor progress via Slack notifications.
+
+def casual_company_rule(name: str):
     """
-    from fastapi.responses import JSONResponse
-    import gspread
-    from google.oauth2.credentials import Credentials as UserCredentials
-    from google.auth.transport.requests import Request
+    Deterministic company casualization, or None if it needs Claude. Only answers when a leading
+    "The" or a legal suffix was stripped and what's left is distinctive; generic names
+    ("Plumbing Services", "Realty Group LLC") go to Claude, which knows when to say "you guys".
+    """
+    casual = re.sub(r"^the\s+", "", name.strip(), flags=re.IGNORECASE)
+    previous = None
+    while casual != previous:
+        previous = casual
+        casual = LEGAL_SUFFIX_PATTERN.sub("", casual).strip(" ,.&-")
+    words = casual.lower().split()
+    if casual == name.strip() or not words or len(words) > RULE_MAX_COMPANY_WORDS:
+        return None
+    if GENERIC_COMPANY_PATTERN.search(casual) or all(word in GENERIC_COMPANY_WORDS for word in words):
+        return None
+    return casual
 
-    if not query:
-        return JSONResponse({
-            "status": "error",
-            "error": "Missing 'query' parameter",
-            "example": "/scrape-leads?query=dentists&location=United States&limit=100"
-        }, status_code=400)
 
-    try:
-        # Create Google Sheet immediately
-        token_data = json.loads(os.getenv("GOOGLE_TOKEN_JSON"))
-        creds = UserCredentials(
-            token=token_data["token"],
-            refresh_token=token_data["refresh_token"],
-            token_uri=token_data["token_uri"],
-            client_id=token_data["client_id"],
-            client_secret=token_data["client_secret"],
-            scopes=token_data["scopes"]
-        )
-        if creds.expired:
-            creds.refresh(Request())
+def casualize_with_memo(records: dict, client) -> tuple:
+    """
+    Casualize {id: record}, sending Claude only values that neither the rules nor the memo know.
+    Returns ({id: {casual_*}}, number of records left unresolved, number of values sent to Claude).
+    """
+    ruled = {value: casual_company_rule(value) for value in {r.get("company_name") for r in records.values()} if value}
+    memo = dict_get_many(casual_memo, {
+        f"{field}|{memo_key(value)}"
+        for record in records.values()
+        for field, value in record.items()
+        if value and not (field == "company_name" and ruled.get(value) is not None)
+    })
+
+    def resolve(field, value):
+        if not value:
+            return ""
+        if field == "company_name" and ruled.get(value) is not None:
+            return ruled[value]
+        return memo.get(f"{field}|{memo_key(value)}")
+
+    # Each unseen value goes to Claude once (other fields blank so it only works on what's new)
+    queued = {field: set() for field in CASUALIZE_FIELDS}
+    unseen = []
+    for record in records.values():
+        pending = {}
+        for field, value in record.items():
+            new = resolve(field, value) is None and memo_key(value) not in queued[field]
+            pending[field] = value if new else ""
+            if new:
+                queued[field].add(memo_key(value))
+        if any(pending.values()):
+            unseen.append(pending)
+
+    if unseen:
+        llm_records = dict(enumerate(unseen, start=1))
+        casual, _ = casualize_records(llm_records, client)
+        learned = {}
+        for record_id, values in casual.items():
+            for field, casual_field in CASUALIZE_FIELDS.items():
+                value = llm_records[record_id][field]
+                if value:
+                    learned[f"{field}|{memo_key(value)}"] = values[casual_field]
+
+        # One key per value, so concurrent runs only ever overwrite the same answer
+        if learned:
+            memo.update(learned)
+            casual_memo.update(learned)
+
+    results = {}
+    for record_id, record in records.items():
+        values = {CASUALIZE_FIELDS[field]: resolve(field, value) for field, value in record.items()}
+        if None not in values.values():
+            results[record_id] = values
+
+    return results, len(records) - len(results), sum(len(values) for values in queued.values())
+
+
+def casualize_frame(df, client) -> dict:
+    """
+    Fill the casual_* columns of a lead table. Each distinct (first name, company, city)
+    combination is resolved once and mapped back onto every row that has it.
+    Updates df in place and returns stats.
+    """
+    import pandas as pd
 
-        gc = gspread.authorize(creds)
+    sources = df.reindex(columns=list(CASUALIZE_FIELDS), fill_value="").astype(str)
+    distinct = sources[(sources != "").any(axis=1)].drop_duplicates()
 
-        sheet_name = f"Leads - {query} - {datetime.utcnow().strftime('%Y-%m-%d %H:%M')}"
-        sh = gc.create(sheet_name)
-        sheet_id = sh.id
-        sheet_url = sh.url
+    casual, failed, sent = casualize_with_memo(distinct.to_dict("index"), client)
+    if casual:
+        resolved = distinct.join(pd.DataFrame.from_dict(casual, orient="index"), how="inner")
+        mapped = sources.reset_index().merge(resolved, on=list(CASUALIZE_FIELDS)).set_index("index")
+        targets = [casual_field for casual_field in CASUALIZE_FIELDS.values() if casual_field in df]
+        df.loc[mapped.index, targets] = mapped[targets].values
+    return {"casualized": len(casual), "casualize_failed": failed, "sent_to_claude": sent}
 
-        # Don't add headers yet - background task will set them based on actual Apify response fields
-        slack_notify(f"🚀 *Lead Scraping Started*\nQuery: {query}\nLocation: {location}\nLimit: {limit}\nSheet: {sheet_url}")
 
-        # Spawn background task
-        scrape_leads_background.spawn(query, location, limit, sheet_id, sheet_url)
+# ============================================================================
+# LEAD PIPELINE (scrape → append → enrich → casualize, chunk by chunk)
+# ============================================================================
 
-        # Return 201 immediately
-        return JSONResponse({
-            "status": "accepted",
-            "message": "Lead scraping started. Monitor Slack for progress.",
-            "sheet_url": sheet_url,
-            "sheet_name": sheet_name,
-            "workflow": [
-                "1. Scraping leads via Apify",
-                "2. Uploading to Google Sheet",
-                "3. Enriching emails with AnyMailFinder",
-                "4. Casualizing company names"
-            ]
-        }, status_code=201)
+LEAD_CHUNK_SIZE = 200  # Leads appended, enriched and casualized together
+LEAD_MAX_PENDING_CHUNKS = 2  # Chunks queued for enrichment before scraping waits (bounds memory)
 
-    except Exception as e:
-        logger.error(f"Scrape init error: {e}")
-        slack_error(f"Scrape init failed: {str(e)}")
-        return JSONResponse({
-            "status": "error",
-            "error": str(e)
-        }, status_code=500)
 
+def with_casual_columns(columns: list) -> list:
+    """Insert casual_* columns right after first_name, company_name and city."""
+    result = []
+    for column in columns:
+        result.append(column)
+        if column in CASUALIZE_FIELDS and CASUALIZE_FIELDS[column] not in columns:
+            result.append(CASUALIZE_FIELDS[column])
+    return result
 
-@app.function(image=image, secrets=ALL_SECRETS, timeout=300)
-@modal.fastapi_endpoint(method="POST")
-def generate_proposal(request_body: dict = None):
-    """
-    Execution-only: Generate a proposal using PandaDoc.
 
-    URL: POST /generate-proposal
-    Body: JSON with client info and project details
+def diff_updates(before, after) -> list:
+    """
+    batch_update entries for the cells that differ between two versions of a lead table
+    (indexed by sheet row), one range per run of consecutive changed rows in a column.
+    """
+    changed = before.ne(after)
+    updates = []
+    for column in changed.columns[changed.any()]:
+        letter = column_letter(after.columns.get_loc(column))
+        rows = changed.index[changed[column]]
+        # Split where the row number jumps: each run is a contiguous block in the sheet
+        breaks = [0] + [i for i in range(1, len(rows)) if rows[i] != rows[i - 1] + 1] + [len(rows)]
+        for start, end in zip(breaks, breaks[1:]):
+            first, last = rows[start], rows[end - 1]
+            updates.append({
+                "range": f"{letter}{first}:{letter}{last}",
+                "values": [[value] for value in after.loc[first:last, column].tolist()]
+            })
+    return updates
 
-    For demo, uses local transcript files if no transcripts provided.
 
-    You (the local agent) orchestrate: read transcripts, extract info, format input, call this.
+class LeadSheet:
+    """
+    A worksheet filled chunk by chunk. Owns the header; new fields are added as columns at the end.
+    Writes are queued on a SheetWriter, so a chunk's rows go out together with its enrichment.
     """
-    from fastapi.responses import JSONResponse
 
-    if not request_body:
-        # Return example format
-        return JSONResponse({
-            "status": "info",
-            "message": "POST JSON body required",
-            "example": {
-                "client": {
-                    "first_name": "Kelly",
-                    "last_name": "Longhouse",
-                    "email": "kelly@executivesocial.com",
-                    "company": "Executive Social"
-                },
-                "project": {
-                    "title": "LinkedIn Thought Leadership Campaign",
-                    "monthOneInvestment": "3500",
-                    "monthTwoInvestment": "3500",
-                    "monthThreeInvestment": "3500",
-                    "problems": {
-                        "problem01": "Low LinkedIn engagement despite posting",
-                        "problem02": "No time for consistent content creation",
-                        "problem03": "Current posts feel too corporate",
-                        "problem04": "Missing opportunities to be top-of-mind"
-                    },
-                    "benefits": {
-                        "benefit01": "Increased visibility with target audience",
-                        "benefit02": "Consistent professional presence",
-                        "benefit03": "More inbound leads from thought leadership",
-                        "benefit04": "Time savings on content creation"
-                    }
-                }
-            },
-            "demo_transcripts_available": True,
-            "demo_kickoff": "/app/demo_kickoff_call_transcript.md",
-            "demo_sales": "/app/demo_sales_call_transcript.md"
-        })
+    def __init__(self, worksheet):
+        self.writer = SheetWriter(worksheet)
+        self.header = []
+        self.next_row = 2  # Row 1 is the header
+
+    def append(self, items: list):
+        """
+        Queue leads below the existing rows. Returns them as a lead table (columns = header,
+        index = sheet row), the authoritative copy of those rows for enrichment and casualization.
+        """
+        import pandas as pd
+
+        df = pd.json_normalize(items)
+        new_columns = [c for c in df.columns if c not in self.header]
+        if new_columns:
+            self.header = self.header + [c for c in with_casual_columns(new_columns) if c not in self.header]
+
+        df = df.reindex(columns=self.header).fillna("")
+        df.index = pd.RangeIndex(self.next_row, self.next_row + len(df))
+
+        self.writer.update(f"A{self.next_row}", df.values.tolist())
+        if new_columns:
+            self.writer.update("A1", [self.header])
+
+        self.next_row += len(df)
+        return df
+
+
+def process_lead_chunk(writer: SheetWriter, chunk, amf_api_key: str, claude_client) -> dict:
+    """Enrich and casualize one appended chunk, then flush it with only the cells that changed."""
+    before = chunk.copy()
+    stats = {}
 
-    slack_notify(f"📄 *Proposal Generation Started*\nClient: {request_body.get('client', {}).get('company', 'Unknown')}")
+    if amf_api_key and "email" in chunk:
+        stats.update(enrich_frame(chunk, amf_api_key))
 
+    if claude_client:
+        stats.update(casualize_frame(chunk, claude_client))
+
+    writer.batch_update(diff_updates(before, chunk))
+    writer.flush()
+    return stats
+
+
+# ============================================================================
+# EXECUTION-ONLY WEBHOOKS (No Claude orchestration - pure script execution)
+# ============================================================================
+
+# Background function for full lead scraping workflow
+@app.function(image=image, secrets=ALL_SECRETS, timeout=1800, min_containers=MIN_CONTAINERS["scrape_leads_background"])  # 30 min timeout for full workflow
+def scrape_leads_background(query: str, location: str, limit: int, sheet_id: str, sheet_url: str, job_id: str = None, partitions: int = 1,
+                            strategy: str = "regions"):
+    """
+    Background task: Full lead scraping workflow, streamed chunk by chunk as Apify produces leads.
+    1. Scrape leads via Apify (dataset polled while the actor runs)
+    2. Append each new chunk of leads to the Google Sheet
+    3. Enrich the chunk's emails with AnyMailFinder
+    4. Casualize the chunk's first names, company names and cities
+    Steps 3-4 run on a worker thread, so they overlap with scraping and appending the next chunk.
+    With partitions > 1 one actor runs per partition: strategy "regions" splits the location (by state
+    for the US), "keywords" splits a comma-separated query.
+    """
+    slack_run(job_id)
     try:
-        import requests
-
-        API_KEY = os.getenv("PANDADOC_API_KEY")
-        if not API_KEY:
-            raise ValueError("PANDADOC_API_KEY not configured")
-
-        TEMPLATE_UUID = "G8GhAvKGa9D8dmpwTnEWyV"
-        API_URL = "https://api.pandadoc.com/public/v1/documents"
-
-        client = request_body.get("client", {})
-        project = request_body.get("project", {})
-        problems = project.get("problems", {})
-        benefits = project.get("benefits", {})
-
-        # Build tokens
-        tokens = [
-            {"name": "Client.Company", "value": client.get("company", "")},
-            {"name": "Personalization.Project.Title", "value": project.get("title", "")},
-            {"name": "MonthOneInvestment", "value": str(project.get("monthOneInvestment", ""))},
-            {"name": "MonthTwoInvestment", "value": str(project.get("monthTwoInvestment", ""))},
-            {"name": "MonthThreeInvestment", "value": str(project.get("monthThreeInvestment", ""))},
-            {"name": "Personalization.Project.Problem01", "value": problems.get("problem01", "")},
-            {"name": "Personalization.Project.Problem02", "value": problems.get("problem02", "")},
-            {"name": "Personalization.Project.Problem03", "value": problems.get("problem03", "")},
-            {"name": "Personalization.Project.Problem04", "value": problems.get("problem04", "")},
-            {"name": "Personalization.Project.Benefit.01", "value": benefits.get("benefit01", "")},
-            {"name": "Personalization.Project.Benefit.02", "value": benefits.get("benefit02", "")},
-            {"name": "Personalization.Project.Benefit.03", "value": benefits.get("benefit03", "")},
-            {"name": "Personalization.Project.Benefit.04", "value": benefits.get("benefit04", "")},
-            {"name": "Slide.Footer", "value": f"{client.get('company', 'Client')} x YourCompany"},
-            {"name": "Document.CreatedDate", "value": datetime.utcnow().strftime("%B %d, %Y")},
-        ]
+        # ===== STEP 1: Scrape with Apify =====
+        slack_notify(f"📥 *Step 1/4: Scraping*\nQuery: {query}\nLimit: {limit}")
+        job_step(job_id, "1/4 Scraping leads via Apify")
 
-        # Create document
-        payload = {
-            "name": f"Proposal - {client.get('company', 'Client')} - {project.get('title', 'Project')}",
-            "template_uuid": TEMPLATE_UUID,
-            "recipients": [
-                {
-                    "email": client.get("email", ""),
-                    "first_name": client.get("first_name", ""),
-                    "last_name": client.get("last_name", ""),
-                    "role": "Client"
-                }
-            ],
-            "tokens": tokens
-        }
+        if not os.getenv("APIFY_API_TOKEN"):
+            raise ValueError("APIFY_API_TOKEN not configured")
 
-        headers = {
-            "Authorization": f"API-Key {API_KEY}",
-            "Content-Type": "application/json"
-        }
+        run_inputs = build_run_inputs(query, location, limit, partitions, strategy)
+        if len(run_inputs) > 1:
+            slack_notify(f"🔀 Split into {len(run_inputs)} partitions by {strategy}")
 
-        response = requests.post(API_URL, json=payload, headers=headers)
-        response.raise_for_status()
+        token_data = json.loads(os.getenv("GOOGLE_TOKEN_JSON"))
+        gc = get_gspread_client(token_data)
+        worksheet = gc.open_by_key(sheet_id).get_worksheet(0)
+        sheet = LeadSheet(worksheet)
 
-        doc_data = response.json()
-        doc_id = doc_data.get("id")
-        doc_url = f"https://app.pandadoc.com/a/#/documents/{doc_id}"
+        amf_api_key = os.getenv("ANYMAILFINDER_API_KEY")
+        if not amf_api_key:
+            slack_notify("⚠️ ANYMAILFINDER_API_KEY not configured, skipping enrichment")
 
-        slack_notify(f"✅ *Proposal Created*\nClient: {client.get('company')}\nDoc: {doc_url}")
+        anthropic_key = os.getenv("ANTHROPIC_API_KEY")
+        claude_client = get_anthropic_client(anthropic_key) if anthropic_key else None
+        if not claude_client:
+            slack_notify("⚠️ ANTHROPIC_API_KEY not configured, skipping casualization")
 
-        return JSONResponse({
+        totals = {"leads": 0, "duplicates": 0}
+        seen = set()
+        buffer = []
+        pending = []
+
+        def collect(future):
+            for name, value in future.result().items():
+                totals[name] = totals.get(name, 0) + value
+
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="lead-pipeline") as pipeline:
+
+            def flush():
+                # ===== STEP 2: Append chunk to Google Sheet =====
+                chunk = sheet.append(buffer)
+                totals["leads"] += len(chunk)
+                buffer.clear()
+                slack_notify(f"📤 *Step 2/4: +{len(chunk)} leads* (total {totals['leads']})")
+                job_step(job_id, f"2/4 Appended leads (total {totals['leads']})")
+
+                # ===== STEPS 3-4: Enrich + casualize on the worker while scraping continues =====
+                pending.append(pipeline.submit(process_lead_chunk, sheet.writer, chunk, amf_api_key, claude_client))
+                while len(pending) > LEAD_MAX_PENDING_CHUNKS:
+                    collect(pending.pop(0))
+
+            stream = iter_partitioned_batches("code_crafter/leads-finder", run_inputs)
+            try:
+                for _, items in stream:
+                    for item in items:
+                        key = lead_key(item)
+                        if key in seen:
+                            totals["duplicates"] += 1
+                            continue
+                        seen.add(key)
+                        buffer.append(item)
+                    del buffer[max(0, limit - totals["leads"]):]  # Partitions round up; keep the total at the limit
+                    if len(buffer) >= LEAD_CHUNK_SIZE:
+                        flush()
+                    if totals["leads"] + len(buffer) >= limit:
+                        break
+            finally:
+                stream.close()  # Aborts any partition still running
+
+            if buffer:
+                flush()
+
+            job_step(job_id, "3-4/4 Finishing enrichment and casualization")
+            for future in pending:
+                collect(future)
+        sheet.writer.flush()
+
+        logger.info(f"Scraped {totals['leads']} leads ({totals['duplicates']} duplicates skipped)")
+
+        if not totals["leads"]:
+            slack_notify(f"⚠️ *No leads found for query: {query}*")
+            return job_finish(job_id, {"status": "no_results", "leads_found": 0})
+
+        if amf_api_key:
+            slack_notify(
+                f"✅ Enriched {totals.get('found', 0)}/{totals.get('lookups', 0)} emails ({totals.get('cached', 0)} from cache)"
+                + (f", {totals['errors']} lookups failed" if totals.get("errors") else "")
+            )
+        if claude_client:
+            logger.info(f"Casualized {totals.get('casualized', 0)} records ({totals.get('sent_to_claude', 0)} new values sent to Claude)")
+            if totals.get("casualize_failed"):
+                slack_notify(f"⚠️ Casualization failed for {totals['casualize_failed']} records")
+
+        # ===== COMPLETE =====
+        slack_notify(f"✅ *Lead Scraping Complete!*\nLeads: {totals['leads']}\nSheet: {sheet_url}")
+
+        return job_finish(job_id, {
             "status": "success",
-            "document_id": doc_id,
-            "document_url": doc_url,
-            "client": client.get("company"),
-            "project_title": project.get("title")
+            "leads_found": totals["leads"],
+            "duplicates_skipped": totals["duplicates"],
+            "emails_found": totals.get("found", 0),
+            "sheet_url": sheet_url
         })
 
     except Exception as e:
-        logger.error(f"Proposal error: {e}")
-        slack_error(f"Proposal failed: {str(e)}")
-        return JSONResponse({
-            "status": "error",
-            "error": str(e)
-        }, status_code=500)
+        logger.error(f"Background scrape error: {e}")
+        slack_error(f"Lead scraping failed: {str(e)}")
+        return job_finish(job_id, {"status": "error", "error": str(e)})
+
+    finally:
+        slack_flush()
+
+
+@app.cls(image=image, secrets=ALL_SECRETS, timeout=60, min_containers=MIN_CONTAINERS["scrape_leads"])
+class ScrapeLeads(WarmContainer):
+    @modal.fastapi_endpoint(method="GET", label=endpoint_label("scrape_leads"))
+    def scrape_leads(self, query: str = "", location: str = "United States", limit: int = 100, partitions: int = 1,
+                     strategy: str = "regions", idempotency_key: str = ""):
+        """
+        Execution-only: Scrape leads with full workflow.
+
+        URL: GET /scrape-leads?query=dentists&location=United States&limit=100
+
+        Large pulls: add &partitions=4 to split the location (by state for the US, or
+        "Texas; Florida" lists) across concurrent Apify runs; results are merged and deduped.
+        &strategy=keywords splits a comma-separated query ("dentist, orthodontist") instead.
+
+        Returns 201 immediately with Google Sheet URL.
+        Background task then:
+        1. Scrapes leads via Apify
+        2. Uploads to the sheet
+        3. Enriches emails with AnyMailFinder
+        4. Casualizes company names
+
+        Monitor progress via Slack notifications or poll the returned "poll" URL.
+        A retry within a few minutes (or with the same idempotency_key within 24h) returns the original job.
+        """
+        from fastapi.responses import JSONResponse
+
+        if not query:
+            return JSONResponse({
+                "status": "error",
+                "error": "Missing 'query' parameter",
+                "example": "/scrape-leads?query=dentists&location=United States&limit=100"
+            }, status_code=400)
+        if strategy not in PARTITION_STRATEGIES:
+            return JSONResponse({
+                "status": "error",
+                "error": f"Unknown strategy: {strategy}",
+                "available": list(PARTITION_STRATEGIES)
+            }, status_code=400)
+
+        key = make_idempotency_key("scrape_leads", {
+            "query": query, "location": location, "limit": limit, "partitions": partitions, "strategy": strategy
+        }, idempotency_key)
+        job_id, is_new = claim_idempotency(key)
+        if not is_new:
+            return JSONResponse(replay_job(job_id))
+
+        try:
+            # Create Google Sheet immediately
+            token_data = json.loads(os.getenv("GOOGLE_TOKEN_JSON"))
+            gc = get_gspread_client(token_data)
+
+            sheet_name = f"Leads - {query} - {datetime.utcnow().strftime('%Y-%m-%d %H:%M')}"
+            sh = gc.create(sheet_name)
+            sheet_id = sh.id
+            sheet_url = sh.url
+
+            # Don't add headers yet - background task will set them based on actual Apify response fields
+            slack_run()
+            slack_notify(f"🚀 *Lead Scraping Started*\nQuery: {query}\nLocation: {location}\nLimit: {limit}\nSheet: {sheet_url}")
+
+            # Spawn background task
+            job_create("scrape_leads", {
+                "query": query, "location": location, "limit": limit, "partitions": partitions, "strategy": strategy, "sheet_url": sheet_url
+            }, job_id=job_id)
+            scrape_leads_background.spawn(query, location, limit, sheet_id, sheet_url, job_id, partitions, strategy)
+
+            # Return 201 immediately
+            return JSONResponse({
+                "status": "accepted",
+                "message": "Lead scraping started. Monitor Slack or poll the job for progress.",
+                "job_id": job_id,
+                "poll": job_poll_url(job_id),
+                "sheet_url": sheet_url,
+                "sheet_name": sheet_name,
+                "workflow": [
+                    "1. Scraping leads via Apify",
+                    "2. Uploading to Google Sheet",
+                    "3. Enriching emails with AnyMailFinder",
+                    "4. Casualizing company names"
+                ]
+            }, status_code=201)
+
+        except Exception as e:
+            release_idempotency(key, job_id)
+            logger.error(f"Scrape init error: {e}")
+            slack_error(f"Scrape init failed: {str(e)}")
+            return JSONResponse({
+                "status": "error",
+                "error": str(e)
+            }, status_code=500)
+
+
+# ============================================================================
+# PROPOSALS (extraction + PandaDoc live in proposal_pipeline.py; shared by the single and batch endpoints)
+# ============================================================================
+
+PROPOSAL_BATCH_WORKERS = 5  # Proposals extracted/created concurrently per batch
+PROPOSAL_BATCH_MAX_ITEMS = 50
+
+DEMO_TRANSCRIPTS = {
+    "kickoff": "/app/demo_kickoff_call_transcript.md",
+    "sales": "/app/demo_sales_call_transcript.md"
+}
+
+
+def generate_batch_proposal(item: dict, claude_client) -> dict:
+    """
+    One batch item -> per-item result. The item is either {client, project} (used as-is),
+    {"transcript": "<text>"} or {"demo": "sales"|"kickoff"} (extracted with Claude first,
+    unless this transcript was already extracted; "refresh": true forces a new extraction).
+    "send": true emails the document to the client once PandaDoc has it in draft state
+    (status "created_not_sent" if the document was created but couldn't be sent).
+    """
+    result = {"id": item.get("id")}
+    try:
+        if item.get("client") and item.get("project"):
+            client_info, project = item["client"], item["project"]
+        else:
+            transcript_content = item.get("transcript")
+            if not transcript_content and item.get("demo") in DEMO_TRANSCRIPTS:
+                transcript_content = read_cached(Path(DEMO_TRANSCRIPTS[item["demo"]]))
+            if not transcript_content:
+                raise ValueError('Item needs {client, project}, "transcript" or "demo"')
+            extracted, cached = extract_proposal_data(transcript_content, claude_client, refresh=bool(item.get("refresh")))
+            client_info, project = extracted.get("client", {}), extracted.get("project", {})
+            result["extracted_data"] = extracted
+            result["extraction_cached"] = cached
+
+        send = bool(item.get("send"))
+        document = create_pandadoc_document(client_info, project, default_email="demo@example.com", send=send, message=item.get("message", ""))
+        status = "created_not_sent" if send and not document["sent"] else "success"
+        return {**result, "status": status, **document, "client": client_info.get("company"), "project_title": project.get("title")}
+
+    except json.JSONDecodeError as e:
+        return {**result, "status": "error", "error": f"Failed to parse extracted data: {str(e)}"}
+    except Exception as e:
+        return {**result, "status": "error", "error": str(e)}
+
+
+@app.cls(image=image, secrets=ALL_SECRETS, timeout=300, min_containers=MIN_CONTAINERS["generate_proposal"])
+class GenerateProposal(WarmContainer):
+    @modal.fastapi_endpoint(method="POST", label=endpoint_label("generate_proposal"))
+    def generate_proposal(self, request_body: dict = None):
+        """
+        Execution-only: Generate a proposal using PandaDoc.
+
+        URL: POST /generate-proposal
+        Body: JSON with client info and project details
+
+        For demo, uses local transcript files if no transcripts provided.
+
+        You (the local agent) orchestrate: read transcripts, extract info, format input, call this.
+        Add "send": true (and optionally "message") to email the document to client.email once it's ready.
+        A body retried within a few minutes (or the same "idempotency_key" within 24h) returns the first document.
+        """
+        from fastapi.responses import JSONResponse
+
+        if not request_body:
+            # Return example format
+            return JSONResponse({
+                "status": "info",
+                "message": "POST JSON body required",
+                "example": {
+                    "client": {
+                        "first_name": "Kelly",
+                        "last_name": "Longhouse",
+                        "email": "kelly@executivesocial.com",
+                        "company": "Executive Social"
+                    },
+                    "project": {
+                        "title": "LinkedIn Thought Leadership Campaign",
+                        "monthOneInvestment": "3500",
+                        "monthTwoInvestment": "3500",
+                        "monthThreeInvestment": "3500",
+                        "problems": {
+                            "problem01": "Low LinkedIn engagement despite posting",
+                            "problem02": "No time for consistent content creation",
+                            "problem03": "Current posts feel too corporate",
+                            "problem04": "Missing opportunities to be top-of-mind"
+                        },
+                        "benefits": {
+                            "benefit01": "Increased visibility with target audience",
+                            "benefit02": "Consistent professional presence",
+                            "benefit03": "More inbound leads from thought leadership",
+                            "benefit04": "Time savings on content creation"
+                        }
+                    }
+                },
+                "demo_transcripts_available": True,
+                "demo_kickoff": "/app/demo_kickoff_call_transcript.md",
+                "demo_sales": "/app/demo_sales_call_transcript.md"
+            })
+
+        job_id, is_new = claim_idempotency(make_idempotency_key("generate_proposal", request_body, request_body.get("idempotency_key")))
+        if not is_new:
+            return JSONResponse(replay_job(job_id, wait=IDEMPOTENCY_WAIT))
+        job_create("generate_proposal", {"client": request_body.get("client", {}).get("company")}, job_id=job_id)
+        slack_run(job_id)
+
+        slack_notify(f"📄 *Proposal Generation Started*\nClient: {request_body.get('client', {}).get('company', 'Unknown')}")
+
+        try:
+            client = request_body.get("client", {})
+            project = request_body.get("project", {})
+
+            send = bool(request_body.get("send"))
+            document = create_pandadoc_document(client, project, send=send, message=request_body.get("message", ""))
+            doc_id, doc_url = document["document_id"], document["document_url"]
+
+            if send and not document["sent"]:
+                slack_error(f"Proposal created, not sent ({client.get('company')}): {document['send_error']}\nDoc: {doc_url}")
+            else:
+                slack_notify(f"✅ *Proposal {'Sent' if send else 'Created'}*\nClient: {client.get('company')}\nDoc: {doc_url}")
+
+            return JSONResponse(job_finish(job_id, {
+                "status": "created_not_sent" if send and not document["sent"] else "success",
+                "job_id": job_id,
+                "document_id": doc_id,
+                "document_url": doc_url,
+                "document_status": document["document_status"],
+                "sent": document["sent"],
+                "send_error": document.get("send_error"),
+                "client": client.get("company"),
+                "project_title": project.get("title")
+            }))
+
+        except Exception as e:
+            logger.error(f"Proposal error: {e}")
+            slack_error(f"Proposal failed: {str(e)}")
+            return JSONResponse(job_finish(job_id, {
+                "status": "error",
+                "job_id": job_id,
+                "error": str(e)
+            }), status_code=500)
 
 
 @app.function(image=image, secrets=ALL_SECRETS, timeout=60)
@@ -1778,281 +3112,418 @@ def read_demo_transcript(name: str = "kickoff"):
         }, status_code=500)
 
 
-@app.function(image=image, secrets=ALL_SECRETS, timeout=300)
-@modal.fastapi_endpoint(method="GET")
-def create_proposal_from_transcript(transcript: str = "sales", demo: bool = True):
-    """
-    End-to-end proposal generation from transcript.
-
-    URL: GET /create-proposal-from-transcript?transcript=sales&demo=true
-
-    This endpoint:
-    1. Reads the demo transcript (stored locally on Modal)
-    2. Uses Claude to extract client info and generate expanded problems/benefits
-    3. Creates a PandaDoc proposal with all the details
+@app.cls(image=image, secrets=ALL_SECRETS, timeout=300, min_containers=MIN_CONTAINERS["create_proposal_from_transcript"])
+class CreateProposalFromTranscript(WarmContainer):
+    @modal.fastapi_endpoint(method="GET", label=endpoint_label("create_proposal_from_transcript"))
+    def create_proposal_from_transcript(self, transcript: str = "sales", demo: bool = True, refresh: bool = False, send: bool = False, idempotency_key: str = ""):
+        """
+        End-to-end proposal generation from transcript.
+
+        URL: GET /create-proposal-from-transcript?transcript=sales&demo=true
+
+        This endpoint:
+        1. Reads the demo transcript (stored locally on Modal)
+        2. Uses Claude to extract client info and generate expanded problems/benefits
+        3. Creates a PandaDoc proposal with all the details
+
+        Parameters:
+        - transcript: "sales" or "kickoff" (default: sales)
+        - demo: If true, uses stored demo transcripts (default: true)
+        - refresh: Re-run the Claude extraction even if this transcript was extracted before (default: false)
+        - send: Email the document to the client once PandaDoc has it in draft state; needs an email in the transcript (default: false)
+        - idempotency_key: Retries with the same key within 24h (or same params within a few minutes) return the first document
+        """
+        from fastapi.responses import JSONResponse
+
+        if transcript not in DEMO_TRANSCRIPTS:
+            return JSONResponse({
+                "status": "error",
+                "error": f"Unknown transcript: {transcript}",
+                "available": list(DEMO_TRANSCRIPTS.keys())
+            }, status_code=400)
+
+        job_id, is_new = claim_idempotency(make_idempotency_key(
+            "create_proposal_from_transcript", {"transcript": transcript, "demo": demo, "refresh": refresh, "send": send}, idempotency_key
+        ))
+        if not is_new:
+            return JSONResponse(replay_job(job_id, wait=IDEMPOTENCY_WAIT))
+        job_create("create_proposal_from_transcript", {"transcript": transcript, "demo": demo}, job_id=job_id)
+        slack_run(job_id)
+
+        slack_notify(f"📄 *Create Proposal from Transcript*\nTranscript: {transcript}\nDemo mode: {demo}")
 
-    Parameters:
-    - transcript: "sales" or "kickoff" (default: sales)
-    - demo: If true, uses stored demo transcripts (default: true)
-    """
-    from fastapi.responses import JSONResponse
-    import anthropic
-    import requests
+        try:
+            # Step 1: Read the transcript
+            transcript_content = read_cached(Path(DEMO_TRANSCRIPTS[transcript]))
+
+            slack_notify(f"📝 *Step 1/3: Transcript loaded*\n{len(transcript_content)} characters")
+
+            # Step 2: Use Claude to extract info and generate expanded content (cached per transcript)
+            anthropic_key = os.getenv("ANTHROPIC_API_KEY")
+            claude_client = get_anthropic_client(anthropic_key) if anthropic_key else None
+
+            extracted_data, cached = extract_proposal_data(transcript_content, claude_client, refresh=refresh)
+
+            slack_notify(f"🧠 *Step 2/3: Info extracted{' (cached)' if cached else ''}*\nClient: {extracted_data['client']['company']}")
+
+            # Step 3: Create PandaDoc proposal
+            client_info = extracted_data.get("client", {})
+            project = extracted_data.get("project", {})
+
+            document = create_pandadoc_document(client_info, project, default_email="demo@example.com", send=send)
+            doc_id, doc_url = document["document_id"], document["document_url"]
+
+            if send and not document["sent"]:
+                slack_error(f"Proposal created, not sent ({client_info.get('company')}): {document['send_error']}\nDoc: {doc_url}")
+            else:
+                slack_notify(f"✅ *Step 3/3: Proposal {'Sent' if send else 'Created'}*\nClient: {client_info.get('company')}\nDoc: {doc_url}")
+
+            return JSONResponse(job_finish(job_id, {
+                "status": "created_not_sent" if send and not document["sent"] else "success",
+                "job_id": job_id,
+                "transcript_used": transcript,
+                "document_id": doc_id,
+                "document_url": doc_url,
+                "document_status": document["document_status"],
+                "sent": document["sent"],
+                "send_error": document.get("send_error"),
+                "client": client_info,
+                "project_title": project.get("title"),
+                "extracted_data": extracted_data,
+                "extraction_cached": cached
+            }))
+
+        except json.JSONDecodeError as e:
+            logger.error(f"JSON parse error: {e}")
+            slack_error(f"Failed to parse Claude response: {str(e)}")
+            return JSONResponse(job_finish(job_id, {
+                "status": "error",
+                "job_id": job_id,
+                "error": f"Failed to parse extracted data: {str(e)}"
+            }), status_code=500)
 
-    transcript_map = {
-        "kickoff": "/app/demo_kickoff_call_transcript.md",
-        "sales": "/app/demo_sales_call_transcript.md"
-    }
+        except Exception as e:
+            logger.error(f"Proposal creation error: {e}")
+            slack_error(f"Proposal creation failed: {str(e)}")
+            return JSONResponse(job_finish(job_id, {
+                "status": "error",
+                "job_id": job_id,
+                "error": str(e)
+            }), status_code=500)
+
+
+@app.cls(image=image, secrets=ALL_SECRETS, timeout=900, min_containers=MIN_CONTAINERS["generate_proposals_batch"])
+class GenerateProposalsBatch(WarmContainer):
+    @modal.fastapi_endpoint(method="POST", label=endpoint_label("generate_proposals_batch"))
+    def generate_proposals_batch(self, request_body: dict = None):
+        """
+        Execution-only: Generate many proposals in one call (e.g. the week's sales calls).
+
+        URL: POST /generate-proposals-batch
+        Body: {"items": [{"client": {...}, "project": {...}} | {"transcript": "<text>"} | {"demo": "sales"}, ...]}
+        Optional per-item "id" is echoed back in its result. "send": true (per item or for the
+        whole body) sends each document to its client once it reaches draft state.
+
+        Transcripts are extracted with Claude concurrently; documents are created through a pooled,
+        rate-limited PandaDoc session. One failing item doesn't fail the batch: each result has its own status.
+        """
+        from fastapi.responses import JSONResponse
+
+        items = (request_body or {}).get("items") if isinstance(request_body, dict) else None
+        if not isinstance(items, list) or not items or not all(isinstance(item, dict) for item in items):
+            return JSONResponse({
+                "status": "error",
+                "error": "POST JSON body with a non-empty 'items' list of objects required",
+                "example": {"items": [{"id": "acme", "demo": "sales"}, {"id": "beta", "transcript": "..."}]}
+            }, status_code=400)
+        if len(items) > PROPOSAL_BATCH_MAX_ITEMS:
+            return JSONResponse({
+                "status": "error",
+                "error": f"At most {PROPOSAL_BATCH_MAX_ITEMS} items per batch (got {len(items)})"
+            }, status_code=400)
+
+        job_id, is_new = claim_idempotency(make_idempotency_key("generate_proposals_batch", request_body, request_body.get("idempotency_key")))
+        if not is_new:
+            return JSONResponse(replay_job(job_id, wait=IDEMPOTENCY_WAIT))
+        job_create("generate_proposals_batch", {"items": len(items)}, job_id=job_id)
+        slack_run(job_id)
 
-    if transcript not in transcript_map:
-        return JSONResponse({
-            "status": "error",
-            "error": f"Unknown transcript: {transcript}",
-            "available": list(transcript_map.keys())
-        }, status_code=400)
+        try:
+            slack_notify(f"📄 *Batch Proposal Generation Started*\nItems: {len(items)}")
+
+            anthropic_key = os.getenv("ANTHROPIC_API_KEY")
+            claude_client = get_anthropic_client(anthropic_key) if anthropic_key else None
+
+            # Body-level "send" / "message" apply to every item that doesn't set its own
+            defaults = {key: request_body[key] for key in ("send", "message") if key in request_body}
+
+            results = [None] * len(items)
+            with ThreadPoolExecutor(max_workers=min(PROPOSAL_BATCH_WORKERS, len(items))) as executor:
+                futures = {executor.submit(generate_batch_proposal, {**defaults, **item}, claude_client): i for i, item in enumerate(items)}
+                for done, future in enumerate(as_completed(futures), start=1):
+                    i = futures[future]
+                    results[i] = {"index": i, **future.result()}
+                    job_step(job_id, f"{done}/{len(items)} {results[i]['status']}: {results[i].get('client') or results[i].get('error', '')}"[:200])
+
+            succeeded = sum(1 for r in results if r["status"] == "success")
+            not_sent = sum(1 for r in results if r["status"] == "created_not_sent")
+            failed = len(results) - succeeded - not_sent
+            slack_notify(
+                f"✅ *Batch Proposals Complete*\nCreated: {succeeded + not_sent}/{len(items)}"
+                + "".join(f"\n• {r['client']}: {r['document_url']}" for r in results if r["status"] != "error")
+            )
+            if failed or not_sent:
+                slack_error(f"Batch proposals: {failed} of {len(items)} failed, {not_sent} created but not sent")
+
+            return JSONResponse(job_finish(job_id, {
+                "status": "success" if not (failed or not_sent) else ("partial" if succeeded or not_sent else "error"),
+                "job_id": job_id,
+                "succeeded": succeeded,
+                "not_sent": not_sent,
+                "failed": failed,
+                "results": results
+            }), status_code=200 if succeeded or not_sent or not failed else 500)
 
-    slack_notify(f"📄 *Create Proposal from Transcript*\nTranscript: {transcript}\nDemo mode: {demo}")
+        except Exception as e:
+            logger.error(f"Batch proposal error: {e}")
+            slack_error(f"Batch proposals failed: {str(e)}")
+            return JSONResponse(job_finish(job_id, {
+                "status": "error",
+                "job_id": job_id,
+                "error": str(e)
+            }), status_code=500)
 
-    try:
-        # Step 1: Read the transcript
-        with open(transcript_map[transcript], "r") as f:
-            transcript_content = f.read()
 
-        slack_notify(f"📝 *Step 1/3: Transcript loaded*\n{len(transcript_content)} characters")
+# ============================================================================
+# YOUTUBE OUTLIER DETECTION (Using Apify - more reliable in cloud)
+# ============================================================================
 
-        # Step 2: Use Claude to extract info and generate expanded content
-        anthropic_key = os.getenv("ANTHROPIC_API_KEY")
-        if not anthropic_key:
-            raise ValueError("ANTHROPIC_API_KEY not configured")
-
-        client = anthropic.Anthropic(api_key=anthropic_key)
-
-        extraction_prompt = f"""Analyze this sales call transcript and extract the following information. Return ONLY valid JSON.
-
-TRANSCRIPT:
-{transcript_content}
-
-Extract and return this exact JSON structure:
-{{
-  "client": {{
-    "firstName": "first name of the prospect",
-    "lastName": "last name of the prospect",
-    "email": "their email (use placeholder if not mentioned)",
-    "company": "their company name"
-  }},
-  "project": {{
-    "title": "short 3-4 word project title (e.g. 'Outbound Lead System', 'LinkedIn Growth Engine')",
-    "monthOneInvestment": "investment amount for month 1 (use 1980 if revenue share mentioned)",
-    "monthTwoInvestment": "monthly amount (use 0 for revenue share)",
-    "monthThreeInvestment": "monthly amount (use 0 for revenue share)",
-    "problems": {{
-      "problem01": "Expanded 1-2 paragraph (max 50 words) about their first pain point. Use 'you' language, focus on revenue impact.",
-      "problem02": "Expanded problem about their second pain point.",
-      "problem03": "Expanded problem about their third pain point.",
-      "problem04": "Expanded problem about their fourth pain point."
-    }},
-    "benefits": {{
-      "benefit01": "Expanded 1-2 paragraph (max 50 words) about benefit 1. Focus on ROI and concrete deliverables.",
-      "benefit02": "Expanded benefit 2.",
-      "benefit03": "Expanded benefit 3.",
-      "benefit04": "Expanded benefit 4."
-    }}
-  }}
-}}
-
-RULES for problems:
-- Use direct "you" language (not third-person)
-- Focus on revenue impact and dollar amounts
-- Be specific and actionable
-- Example: "Right now, your top-of-funnel is converting very poorly to booked meetings. You have no problem generating opportunities; your problem is capitalizing on them."
-
-RULES for benefits:
-- Use direct "you" language
-- Emphasize ROI and payback period
-- Focus on concrete deliverables and measurable results
-
-Return ONLY the JSON, no markdown code blocks or explanations."""
-
-        msg = client.messages.create(
-            model="claude-opus-4-5-20251101",
-            max_tokens=4000,
-            messages=[{"role": "user", "content": extraction_prompt}]
-        )
+YOUTUBE_SEARCH_CONCURRENCY = int(os.getenv("YOUTUBE_SEARCH_CONCURRENCY", "4"))  # Actor runs in flight at once
 
-        response_text = msg.content[0].text.strip()
-
-        # Remove markdown code blocks if present
-        if response_text.startswith("```"):
-            lines = response_text.split('\n')
-            response_text = '\n'.join(lines[1:-1])
-
-        extracted_data = json.loads(response_text)
-
-        slack_notify(f"🧠 *Step 2/3: Info extracted*\nClient: {extracted_data['client']['company']}")
-
-        # Step 3: Create PandaDoc proposal
-        API_KEY = os.getenv("PANDADOC_API_KEY")
-        if not API_KEY:
-            raise ValueError("PANDADOC_API_KEY not configured")
-
-        TEMPLATE_UUID = "G8GhAvKGa9D8dmpwTnEWyV"
-        API_URL = "https://api.pandadoc.com/public/v1/documents"
-
-        client_info = extracted_data.get("client", {})
-        project = extracted_data.get("project", {})
-        problems = project.get("problems", {})
-        benefits = project.get("benefits", {})
-
-        # Build tokens
-        tokens = [
-            {"name": "Client.Company", "value": client_info.get("company", "")},
-            {"name": "Personalization.Project.Title", "value": project.get("title", "")},
-            {"name": "MonthOneInvestment", "value": str(project.get("monthOneInvestment", ""))},
-            {"name": "MonthTwoInvestment", "value": str(project.get("monthTwoInvestment", ""))},
-            {"name": "MonthThreeInvestment", "value": str(project.get("monthThreeInvestment", ""))},
-            {"name": "Personalization.Project.Problem01", "value": problems.get("problem01", "")},
-            {"name": "Personalization.Project.Problem02", "value": problems.get("problem02", "")},
-            {"name": "Personalization.Project.Problem03", "value": problems.get("problem03", "")},
-            {"name": "Personalization.Project.Problem04", "value": problems.get("problem04", "")},
-            {"name": "Personalization.Project.Benefit.01", "value": benefits.get("benefit01", "")},
-            {"name": "Personalization.Project.Benefit.02", "value": benefits.get("benefit02", "")},
-            {"name": "Personalization.Project.Benefit.03", "value": benefits.get("benefit03", "")},
-            {"name": "Personalization.Project.Benefit.04", "value": benefits.get("benefit04", "")},
-            {"name": "Slide.Footer", "value": f"{client_info.get('company', 'Client')} x YourCompany"},
-            {"name": "Document.CreatedDate", "value": datetime.utcnow().strftime("%B %d, %Y")},
-        ]
 
-        # Create document
-        payload = {
-            "name": f"Proposal - {client_info.get('company', 'Client')} - {project.get('title', 'Project')}",
-            "template_uuid": TEMPLATE_UUID,
-            "recipients": [
-                {
-                    "email": client_info.get("email", "demo@example.com"),
-                    "first_name": client_info.get("firstName", ""),
-                    "last_name": client_info.get("lastName", ""),
-                    "role": "Client"
-                }
-            ],
-            "tokens": tokens
-        }
+def search_youtube_keyword(keyword: str, max_per_keyword: int, client) -> list:
+    """One streamers/youtube-scraper run for a keyword -> normalized video dicts."""
+    # streamers/youtube-scraper - exact input schema
+    run_input = {
+        "searchQueries": [keyword],
+        "maxResults": max_per_keyword,
+        "maxResultsShorts": 0,
+        "maxResultStreams": 0,
+    }
 
-        headers = {
-            "Authorization": f"API-Key {API_KEY}",
-            "Content-Type": "application/json"
+    run = client.actor("streamers/youtube-scraper").call(run_input=run_input, timeout_secs=60)
+
+    videos = []
+    for item in client.dataset(run["defaultDatasetId"]).iterate_items():
+        video_id = item.get("id") or item.get("videoId")
+        if not video_id:
+            url = item.get("url") or ""
+            if "v=" in url:
+                video_id = url.split("v=")[-1].split("&")[0]
+
+        view_count = item.get("viewCount") or 0
+
+        video_data = {
+            "title": item.get("title"),
+            "url": item.get("url") or f"https://www.youtube.com/watch?v={video_id}",
+            "view_count": view_count,
+            "channel_name": item.get("channelName"),
+            "channel_url": item.get("channelUrl"),
+            "thumbnail_url": item.get("thumbnailUrl"),
+            "date": item.get("date"),
+            "video_id": video_id,
         }
 
-        response = requests.post(API_URL, json=payload, headers=headers, timeout=30)
-        response.raise_for_status()
+        if video_data["title"] and video_data["video_id"]:
+            videos.append(video_data)
 
-        doc_data = response.json()
-        doc_id = doc_data.get("id")
-        doc_url = f"https://app.pandadoc.com/a/#/documents/{doc_id}"
+    return videos
 
-        slack_notify(f"✅ *Step 3/3: Proposal Created*\nClient: {client_info.get('company')}\nDoc: {doc_url}")
-
-        return JSONResponse({
-            "status": "success",
-            "transcript_used": transcript,
-            "document_id": doc_id,
-            "document_url": doc_url,
-            "client": client_info,
-            "project_title": project.get("title"),
-            "extracted_data": extracted_data
-        })
-
-    except json.JSONDecodeError as e:
-        logger.error(f"JSON parse error: {e}")
-        slack_error(f"Failed to parse Claude response: {str(e)}")
-        return JSONResponse({
-            "status": "error",
-            "error": f"Failed to parse extracted data: {str(e)}",
-            "raw_response": response_text[:1000] if 'response_text' in dir() else "N/A"
-        }, status_code=500)
-
-    except Exception as e:
-        logger.error(f"Proposal creation error: {e}")
-        slack_error(f"Proposal creation failed: {str(e)}")
-        return JSONResponse({
-            "status": "error",
-            "error": str(e)
-        }, status_code=500)
-
-
-# ============================================================================
-# YOUTUBE OUTLIER DETECTION (Using Apify - more reliable in cloud)
-# ============================================================================
 
 def scrape_youtube_with_apify(keywords: list, max_per_keyword: int, days_back: int) -> list:
     """
     FAST YouTube search using streamers/youtube-scraper.
     ~15 seconds for 3 results. Pay-per-result pricing.
+    Keywords run as concurrent actor runs (at most YOUTUBE_SEARCH_CONCURRENCY at once);
+    results keep keyword order and one Slack summary is posted at the end.
     """
-    from apify_client import ApifyClient
-
     apify_token = os.getenv("APIFY_API_TOKEN")
     if not apify_token:
         slack_notify("Error: APIFY_API_TOKEN not set")
         return []
 
-    client = ApifyClient(apify_token)
-    all_videos = []
+    if not keywords:
+        return []
 
-    for keyword in keywords:
-        try:
-            slack_notify(f"Searching: {keyword}")
-
-            # streamers/youtube-scraper - exact input schema
-            run_input = {
-                "searchQueries": [keyword],
-                "maxResults": max_per_keyword,
-                "maxResultsShorts": 0,
-                "maxResultStreams": 0,
-            }
+    client = get_apify_client(apify_token)
+    results = [[] for _ in keywords]
+    errors = {}
 
-            run = client.actor("streamers/youtube-scraper").call(run_input=run_input, timeout_secs=60)
-
-            count = 0
-            for item in client.dataset(run["defaultDatasetId"]).iterate_items():
-                video_id = item.get("id") or item.get("videoId")
-                if not video_id:
-                    url = item.get("url") or ""
-                    if "v=" in url:
-                        video_id = url.split("v=")[-1].split("&")[0]
-
-                view_count = item.get("viewCount") or 0
-
-                video_data = {
-                    "title": item.get("title"),
-                    "url": item.get("url") or f"https://www.youtube.com/watch?v={video_id}",
-                    "view_count": view_count,
-                    "channel_name": item.get("channelName"),
-                    "channel_url": item.get("channelUrl"),
-                    "thumbnail_url": item.get("thumbnailUrl"),
-                    "date": item.get("date"),
-                    "video_id": video_id,
-                }
+    with ThreadPoolExecutor(max_workers=max(1, min(YOUTUBE_SEARCH_CONCURRENCY, len(keywords)))) as executor:
+        futures = {executor.submit(search_youtube_keyword, keyword, max_per_keyword, client): i for i, keyword in enumerate(keywords)}
+        for future in as_completed(futures):
+            i = futures[future]
+            try:
+                results[i] = future.result()
+            except Exception as e:
+                errors[keywords[i]] = str(e)[:150]
+                logger.error(f"Apify error for '{keywords[i]}': {errors[keywords[i]]}")
 
-                if video_data["title"] and video_data["video_id"]:
-                    all_videos.append(video_data)
-                    count += 1
+    summary = ", ".join(f"{keyword}: {len(videos)}" for keyword, videos in zip(keywords, results) if keyword not in errors)
+    slack_notify(
+        f"Found {sum(map(len, results))} videos across {len(keywords)} keywords ({summary})"
+        + "".join(f"\nApify error for '{keyword}': {error}" for keyword, error in errors.items())
+    )
 
-            slack_notify(f"Found {count} videos for '{keyword}'")
+    return [video for videos in results for video in videos]
+
+
+# Channel averages are looked up at query time and refreshed in the background, so scoring
+# against the real channel average never adds Apify latency to a request.
+# normalized channel url -> {"avg": rolling average views (None until first refresh), "samples": int,
+#                            "at": unix time of last refresh, "queued_at": unix time of last refresh request}
+channel_stats = modal.Dict.from_name("claude-orchestrator-channel-stats", create_if_missing=True)
+CHANNEL_STATS_TTL = 7 * 86400  # Averages older than this are still used, but refreshed
+CHANNEL_STATS_RECENT_VIDEOS = 10  # Latest uploads sampled per channel on refresh
+CHANNEL_STATS_SMOOTHING = 0.5  # Weight of a new sample in the rolling average
+CHANNEL_REFRESH_BATCH = 20  # Channels per actor run
+CHANNEL_REFRESH_CONCURRENCY = 4  # Actor runs in flight at once during a refresh
+CHANNEL_REFRESH_COOLDOWN = 3600  # Don't queue the same channel again within this window
+
+
+def channel_key(channel_url: str) -> str:
+    """Normalize channel URLs so host variants, /videos and trailing slashes don't split a channel's stats."""
+    url = (channel_url or "").strip().rstrip("/")
+    for suffix in ("/videos", "/featured", "/shorts", "/streams"):
+        if url.lower().endswith(suffix):
+            url = url[:-len(suffix)]
+    match = re.match(r"(?:https?://)?(?:www\.|m\.)?youtube\.com(/.*)?$", url, re.IGNORECASE)
+    if not match:
+        return url
+    path = match.group(1) or ""
+    # Handles are case-insensitive; /channel/UC... ids are not
+    return "https://youtube.com" + (path.lower() if path.startswith("/@") else path)
+
+
+def lookup_channel_averages(channel_urls: list) -> tuple:
+    """
+    Read cached channel averages. Returns ({channel key: avg} for known channels,
+    channel URLs to refresh: missing or older than CHANNEL_STATS_TTL and not queued recently).
+    """
+    now = time.time()
+    urls = {channel_key(u): u for u in channel_urls if u}
+    entries = dict_get_many(channel_stats, urls)
+    averages = {}
+    queued = {}
+    for key, url in urls.items():
+        entry = entries.get(key) or {}
+        if entry.get("avg"):
+            averages[key] = entry["avg"]
+        fresh = entry.get("avg") is not None and now - entry.get("at", 0) < CHANNEL_STATS_TTL
+        if not fresh and now - entry.get("queued_at", 0) >= CHANNEL_REFRESH_COOLDOWN:
+            queued[key] = {**entry, "queued_at": now}
+    if queued:
+        channel_stats.update(queued)
+    return averages, [urls[key] for key in queued]
+
+
+def sample_channel_views(channel_urls: list, client) -> dict:
+    """One streamers/youtube-scraper run over a batch of channels -> {channel key: [recent video views]}."""
+    run_input = {
+        "startUrls": [{"url": f"{channel_key(url)}/videos"} for url in channel_urls],
+        "maxResults": CHANNEL_STATS_RECENT_VIDEOS,
+        "maxResultsShorts": 0,
+        "maxResultStreams": 0,
+    }
+    run = client.actor("streamers/youtube-scraper").call(run_input=run_input, timeout_secs=300)
+
+    views = {channel_key(url): [] for url in channel_urls}
+    for item in client.dataset(run["defaultDatasetId"]).iterate_items():
+        key = channel_key(item.get("inputChannelUrl") or item.get("channelUrl") or "")
+        if key in views and item.get("viewCount") is not None:
+            views[key].append(int(item["viewCount"]))
+    return views
+
+
+@app.function(image=image, secrets=ALL_SECRETS, timeout=900)
+def refresh_channel_stats(channel_urls: list):
+    """
+    Background: sample recent uploads of each channel (batched actor runs, a few in parallel)
+    and fold their mean views into the rolling channel average.
+    """
+    client = get_apify_client()
+    batches = [channel_urls[i:i + CHANNEL_REFRESH_BATCH] for i in range(0, len(channel_urls), CHANNEL_REFRESH_BATCH)]
+    updated = 0
+
+    with ThreadPoolExecutor(max_workers=max(1, min(CHANNEL_REFRESH_CONCURRENCY, len(batches)))) as executor:
+        futures = [executor.submit(sample_channel_views, batch, client) for batch in batches]
+        for future in as_completed(futures):
+            try:
+                sampled = future.result()
+            except Exception as e:
+                logger.warning(f"Channel stats batch failed: {str(e)[:150]}")
+                continue
+
+            now = time.time()
+            sampled = {key: views for key, views in sampled.items() if views}
+            entries = dict_get_many(channel_stats, sampled)
+            batch = {}
+            for key, views in sampled.items():
+                entry = entries.get(key) or {}
+                mean = sum(views) / len(views)
+                avg = entry["avg"] + CHANNEL_STATS_SMOOTHING * (mean - entry["avg"]) if entry.get("avg") else mean
+                batch[key] = {**entry, "avg": avg, "samples": entry.get("samples", 0) + len(views), "at": now}
+            if batch:
+                channel_stats.update(batch)
+                updated += len(batch)
+
+    logger.info(f"Refreshed stats for {updated}/{len(channel_urls)} channels")
+    return {"requested": len(channel_urls), "updated": updated}
+
+
+def score_outliers(videos: list) -> dict:
+    """
+    Set outlier_score = views / channel average, from the channel stats store (score_basis "channel").
+    Channels not in the store yet get views / median views of this search instead (score_basis
+    "search_median") - a different scale, so those rows are provisional and ranked separately (see
+    rank_outliers). Their channels are queued for a background refresh. Returns counts.
+    """
+    averages, to_refresh = lookup_channel_averages([v.get("channel_url") for v in videos])
+    if to_refresh:
+        refresh_channel_stats.spawn(to_refresh)
+
+    views = sorted(v["view_count"] for v in videos)
+    median_views = views[len(views) // 2] if views else 0
+
+    scored = 0
+    for video in videos:
+        avg = averages.get(channel_key(video.get("channel_url")))
+        if avg:
+            video["outlier_score"] = round(video["view_count"] / avg, 2)
+            video["channel_avg"] = int(avg)
+            video["score_basis"] = "channel"
+            scored += 1
+        else:
+            video["outlier_score"] = round(video["view_count"] / median_views, 2) if median_views else 0
+            video["channel_avg"] = 0  # Not known yet
+            video["score_basis"] = "search_median"
+    return {"channel_scored": scored, "fallback": len(videos) - scored, "refresh_queued": len(to_refresh)}
 
-        except Exception as e:
-            error_msg = str(e)[:150]
-            logger.error(f"Apify error for '{keyword}': {error_msg}")
-            slack_notify(f"Apify error: {error_msg}")
 
-    return all_videos
+def outlier_rank(video: dict) -> tuple:
+    """Sort key (descending): channel-scored videos first, provisional search-median scores after."""
+    return (video.get("score_basis") == "channel", video.get("outlier_score") or 0)
 
 
-def get_channel_average_apify(channel_url: str, apify_client) -> int:
+def rank_outliers(videos: list, min_score: float, top_n: int) -> list:
     """
-    Skip channel average calculation - not needed with absolute view thresholds.
-    We'll score videos by absolute view count instead of relative to channel average.
+    Top videos by channel score >= min_score. min_score only applies to channel scores, so
+    provisional (search-median) videos never compete with them: they only fill slots left over.
     """
-    return 0
+    ranked = sorted(videos, key=outlier_rank, reverse=True)
+    channel = [v for v in ranked if v["score_basis"] == "channel" and v["outlier_score"] >= min_score]
+    provisional = [v for v in ranked if v["score_basis"] != "channel"]
+    return (channel + provisional)[:top_n]
 
 
 def fetch_youtube_transcript(video_id, apify_client):
@@ -2106,7 +3577,7 @@ Do not use any markdown formatting (no asterisks, no bullet points, no headers w
         return f"Error summarizing: {e}"
 
 
-@app.function(image=image, secrets=ALL_SECRETS, timeout=1800)
+@app.function(image=image, secrets=ALL_SECRETS, timeout=1800, min_containers=MIN_CONTAINERS["youtube_outliers_background"])
 def youtube_outliers_background(
     keywords: list,
     days_back: int,
@@ -2114,21 +3585,19 @@ def youtube_outliers_background(
     top_n: int,
     min_score: float,
     sheet_id: str,
-    sheet_url: str
+    sheet_url: str,
+    job_id: str = None
 ):
     """
     Background task: Full YouTube outlier detection workflow.
     """
     from concurrent.futures import ThreadPoolExecutor, as_completed
-    from apify_client import ApifyClient
-    import anthropic
-    import gspread
-    from google.oauth2.credentials import Credentials as UserCredentials
-    from google.auth.transport.requests import Request
 
+    slack_run(job_id)
     try:
         # Step 1: Scrape Videos using Apify (yt-dlp blocked on cloud IPs)
         slack_notify(f"Step 1/5: Scraping YouTube via Apify\nKeywords: {len(keywords)}, Days: {days_back}")
+        job_step(job_id, "1/5 Scraping YouTube via Apify")
 
         all_videos = scrape_youtube_with_apify(keywords, max_videos_per_keyword, days_back)
 
@@ -2139,41 +3608,43 @@ def youtube_outliers_background(
 
         if not videos:
             slack_notify("No videos found - check Apify actor availability")
-            return {"status": "no_results", "videos_found": 0}
-
-        # Step 2: Skip channel stats (too slow with Apify) - use absolute view ranking instead
-        slack_notify("Step 2/5: Ranking by view count (skipping channel stats for speed)")
-
-        # Step 3: Rank videos by view count (simple but effective)
-        slack_notify("Step 3/5: Selecting top videos by views")
+            return job_finish(job_id, {"status": "no_results", "videos_found": 0})
 
-        # Filter videos with view counts and sort by views
+        # Step 2: Score against cached channel averages (missing channels refresh in the background)
+        job_step(job_id, f"2/5 Scoring {len(videos)} videos against channel averages")
         videos_with_views = [v for v in videos if v.get("view_count") and v.get("view_count") > 0]
-        videos_with_views.sort(key=lambda x: x.get("view_count", 0), reverse=True)
+        scoring = score_outliers(videos_with_views)
+        slack_notify(
+            f"Step 2/5: Scored {scoring['channel_scored']} videos against channel averages"
+            f" ({scoring['fallback']} by search median, {scoring['refresh_queued']} channels queued for stats refresh)"
+        )
 
-        # Take top N videos as "outliers"
-        top_outliers = videos_with_views[:top_n]
+        # Step 3: Channel-scored videos at or above min_score first, provisional ones fill the rest
+        slack_notify("Step 3/5: Selecting top outliers")
+        job_step(job_id, "3/5 Selecting top outliers")
 
-        # Add placeholder scores based on view count
-        for i, video in enumerate(top_outliers):
-            video["outlier_score"] = round(video.get("view_count", 0) / 1000, 2)  # Score = views/1000
-            video["channel_avg"] = 0  # Not calculated
+        top_outliers = rank_outliers(videos_with_views, min_score, top_n)
+        provisional = sum(1 for v in top_outliers if v["score_basis"] != "channel")
 
-        slack_notify(f"Selected top {len(top_outliers)} videos by view count")
+        slack_notify(
+            f"Selected top {len(top_outliers) - provisional} videos scoring >= {min_score} against their channel"
+            + (f", plus {provisional} provisional (search median)" if provisional else "")
+        )
 
         if not top_outliers:
             slack_notify("No outliers found above threshold")
-            return {"status": "no_outliers", "videos_found": len(videos)}
+            return job_finish(job_id, {"status": "no_outliers", "videos_found": len(videos)})
 
         # Step 4: Fetch Transcripts & Summarize
         slack_notify("Step 4/5: Fetching transcripts & summarizing")
+        job_step(job_id, "4/5 Fetching transcripts & summarizing")
 
         apify_token = os.getenv("APIFY_API_TOKEN")
         anthropic_key = os.getenv("ANTHROPIC_API_KEY")
 
         if apify_token and anthropic_key:
-            apify_client = ApifyClient(apify_token)
-            claude_client = anthropic.Anthropic(api_key=anthropic_key)
+            apify_client = get_apify_client(apify_token)
+            claude_client = get_anthropic_client(anthropic_key)
 
             def process_outlier(video):
                 video_id = video.get("video_id")
@@ -2189,34 +3660,24 @@ def youtube_outliers_background(
             for video in top_outliers:
                 video["summary"] = "API keys not configured"
 
-        top_outliers.sort(key=lambda x: x["outlier_score"], reverse=True)
+        top_outliers.sort(key=outlier_rank, reverse=True)
 
         # Step 5: Upload to Google Sheet
         slack_notify(f"Step 5/5: Uploading {len(top_outliers)} outliers to Sheet")
+        job_step(job_id, f"5/5 Uploading {len(top_outliers)} outliers to Sheet")
 
         token_data = json.loads(os.getenv("GOOGLE_TOKEN_JSON"))
-        creds = UserCredentials(
-            token=token_data["token"],
-            refresh_token=token_data["refresh_token"],
-            token_uri=token_data["token_uri"],
-            client_id=token_data["client_id"],
-            client_secret=token_data["client_secret"],
-            scopes=token_data["scopes"]
-        )
-        if creds.expired:
-            creds.refresh(Request())
-
-        gc = gspread.authorize(creds)
+        gc = get_gspread_client(token_data)
         sh = gc.open_by_key(sheet_id)
         ws = sh.get_worksheet(0)
 
-        headers = ["Outlier Score", "Title", "Video Link", "View Count", "Channel Name", "Channel Avg", "Thumbnail", "Summary", "Publish Date"]
-        ws.append_row(headers)
+        headers = ["Outlier Score", "Score Basis", "Title", "Video Link", "View Count", "Channel Name", "Channel Avg", "Thumbnail", "Summary", "Publish Date"]
 
-        rows = []
+        rows = [headers]
         for v in top_outliers:
             rows.append([
                 v.get("outlier_score"),
+                "channel avg" if v.get("score_basis") == "channel" else "search median (provisional)",
                 v.get("title"),
                 v.get("url"),
                 v.get("view_count"),
@@ -2227,97 +3688,108 @@ def youtube_outliers_background(
                 v.get("date")
             ])
 
-        ws.append_rows(rows, value_input_option='USER_ENTERED')
+        writer = SheetWriter(ws, value_input_option="USER_ENTERED")
+        writer.update("A1", rows)
+        writer.flush()
 
         slack_notify(f"YouTube Outliers Complete!\nOutliers: {len(top_outliers)}\nSheet: {sheet_url}")
 
-        return {"status": "success", "videos_scraped": len(videos), "outliers_found": len(top_outliers), "sheet_url": sheet_url}
+        return job_finish(job_id, {"status": "success", "videos_scraped": len(videos), "outliers_found": len(top_outliers), "provisional": provisional, "sheet_url": sheet_url})
 
     except Exception as e:
         logger.error(f"YouTube outliers error: {e}")
         slack_error(f"YouTube outliers failed: {str(e)}")
-        return {"status": "error", "error": str(e)}
-
-
-@app.function(image=image, secrets=ALL_SECRETS, timeout=60)
-@modal.fastapi_endpoint(method="GET")
-def youtube_outliers(
-    keywords: str = "",
-    days: int = 7,
-    max_per_keyword: int = 30,
-    top_n: int = 10,
-    min_score: float = 0.9
-):
-    """
-    Find YouTube outlier videos.
-
-    URL: GET /youtube-outliers?keywords=AI+agents,ChatGPT&days=7&top_n=10
-
-    Returns 201 immediately with Google Sheet URL. Background task scrapes,
-    calculates scores, fetches transcripts, summarizes, and uploads to Sheet.
-    Monitor progress via Slack.
-    """
-    from fastapi.responses import JSONResponse
-    import gspread
-    from google.oauth2.credentials import Credentials as UserCredentials
-    from google.auth.transport.requests import Request
-
-    default_keywords = [
-        "agentic workflows",
-        "AI agents",
-        "agent framework",
-        "multi-agent systems",
-        "AI automation agents",
-        "LangGraph",
-        "CrewAI",
-        "AutoGPT"
-    ]
-
-    keyword_list = [k.strip() for k in keywords.split(",") if k.strip()] if keywords else default_keywords
-
-    try:
-        token_data = json.loads(os.getenv("GOOGLE_TOKEN_JSON"))
-        creds = UserCredentials(
-            token=token_data["token"],
-            refresh_token=token_data["refresh_token"],
-            token_uri=token_data["token_uri"],
-            client_id=token_data["client_id"],
-            client_secret=token_data["client_secret"],
-            scopes=token_data["scopes"]
-        )
-        if creds.expired:
-            creds.refresh(Request())
-
-        gc = gspread.authorize(creds)
-        sheet_name = f"YouTube Outliers {datetime.utcnow().strftime('%Y-%m-%d %H:%M')}"
-        sh = gc.create(sheet_name)
-        sheet_id = sh.id
-        sheet_url = sh.url
+        return job_finish(job_id, {"status": "error", "error": str(e)})
+
+    finally:
+        slack_flush()
+
+
+@app.cls(image=image, secrets=ALL_SECRETS, timeout=60, min_containers=MIN_CONTAINERS["youtube_outliers"])
+class YoutubeOutliers(WarmContainer):
+    @modal.fastapi_endpoint(method="GET", label=endpoint_label("youtube_outliers"))
+    def youtube_outliers(
+        self,
+        keywords: str = "",
+        days: int = 7,
+        max_per_keyword: int = 30,
+        top_n: int = 10,
+        min_score: float = 0.9,
+        idempotency_key: str = ""
+    ):
+        """
+        Find YouTube outlier videos.
+
+        URL: GET /youtube-outliers?keywords=AI+agents,ChatGPT&days=7&top_n=10
+
+        Returns 201 immediately with Google Sheet URL. Background task scrapes,
+        calculates scores, fetches transcripts, summarizes, and uploads to Sheet.
+        Score = views / the channel's average views (cached and refreshed in the background).
+        Only videos scoring >= min_score are kept. Channels seen for the first time have no
+        average yet: their videos are scored against the search median, marked provisional in
+        the sheet, and only fill slots the channel-scored videos leave open.
+        Monitor progress via Slack or poll the returned "poll" URL.
+        A retry within a few minutes (or with the same idempotency_key within 24h) returns the original job.
+        """
+        from fastapi.responses import JSONResponse
+
+        default_keywords = [
+            "agentic workflows",
+            "AI agents",
+            "agent framework",
+            "multi-agent systems",
+            "AI automation agents",
+            "LangGraph",
+            "CrewAI",
+            "AutoGPT"
+        ]
 
-        slack_notify(f"YouTube Outliers Started\nKeywords: {', '.join(keyword_list[:3])}{'...' if len(keyword_list) > 3 else ''}\nDays: {days}\nSheet: {sheet_url}")
+        keyword_list = [k.strip() for k in keywords.split(",") if k.strip()] if keywords else default_keywords
 
-        youtube_outliers_background.spawn(keyword_list, days, max_per_keyword, top_n, min_score, sheet_id, sheet_url)
+        key = make_idempotency_key("youtube_outliers", {
+            "keywords": keyword_list, "days": days, "max_per_keyword": max_per_keyword, "top_n": top_n, "min_score": min_score
+        }, idempotency_key)
+        job_id, is_new = claim_idempotency(key)
+        if not is_new:
+            return JSONResponse(replay_job(job_id))
 
-        return JSONResponse({
-            "status": "accepted",
-            "message": "YouTube outlier detection started. Monitor Slack for progress.",
-            "sheet_url": sheet_url,
-            "sheet_name": sheet_name,
-            "keywords": keyword_list,
-            "workflow": [
-                "1. Scraping YouTube videos via yt-dlp",
-                "2. Fetching channel statistics",
-                "3. Calculating outlier scores",
-                "4. Fetching transcripts via Apify",
-                "5. Summarizing with Claude",
-                "6. Uploading to Google Sheet"
-            ]
-        }, status_code=201)
+        slack_run(job_id)
+        try:
+            token_data = json.loads(os.getenv("GOOGLE_TOKEN_JSON"))
+            gc = get_gspread_client(token_data)
+            sheet_name = f"YouTube Outliers {datetime.utcnow().strftime('%Y-%m-%d %H:%M')}"
+            sh = gc.create(sheet_name)
+            sheet_id = sh.id
+            sheet_url = sh.url
+
+            slack_notify(f"YouTube Outliers Started\nKeywords: {', '.join(keyword_list[:3])}{'...' if len(keyword_list) > 3 else ''}\nDays: {days}\nSheet: {sheet_url}")
+
+            job_create("youtube_outliers", {"keywords": keyword_list, "days": days, "top_n": top_n, "sheet_url": sheet_url}, job_id=job_id)
+            youtube_outliers_background.spawn(keyword_list, days, max_per_keyword, top_n, min_score, sheet_id, sheet_url, job_id)
+
+            return JSONResponse({
+                "status": "accepted",
+                "message": "YouTube outlier detection started. Monitor Slack or poll the job for progress.",
+                "job_id": job_id,
+                "poll": job_poll_url(job_id),
+                "sheet_url": sheet_url,
+                "sheet_name": sheet_name,
+                "keywords": keyword_list,
+                "workflow": [
+                    "1. Scraping YouTube videos via yt-dlp",
+                    "2. Fetching channel statistics",
+                    "3. Calculating outlier scores",
+                    "4. Fetching transcripts via Apify",
+                    "5. Summarizing with Claude",
+                    "6. Uploading to Google Sheet"
+                ]
+            }, status_code=201)
 
-    except Exception as e:
-        logger.error(f"YouTube outliers init error: {e}")
-        slack_error(f"YouTube outliers init failed: {str(e)}")
-        return JSONResponse({"status": "error", "error": str(e)}, status_code=500)
+        except Exception as e:
+            release_idempotency(key, job_id)
+            logger.error(f"YouTube outliers init error: {e}")
+            slack_error(f"YouTube outliers init failed: {str(e)}")
+            return JSONResponse({"status": "error", "error": str(e)}, status_code=500)
 
 
 @app.local_entrypoint()
@@ -2330,12 +3802,15 @@ def main():
     print("Endpoints:")
     print("  POST /directive?slug={slug}  - Execute a directive")
     print("  GET  /agent?query=...        - General-purpose agent (proof of concept)")
+    print("                                 add format=sse|ndjson (agent) or \"stream\": \"sse\" (directive) to stream")
     print("  GET  /list-webhooks          - List available slugs")
+    print("  GET  /jobs/{job_id}          - Job status, steps and result (add \"async\": true to queue a directive)")
     print("  GET  /test-email             - Test email")
     print("")
     print("Execution-Only Endpoints (for local agent orchestration):")
     print("  GET  /scrape-leads?query=dentists&location=US&limit=100")
     print("  POST /generate-proposal      - Body: {client, project}")
+    print("  POST /generate-proposals-batch - Body: {items: [{client, project} | {transcript} | {demo}]}")
     print("  GET  /read-demo-transcript?name=kickoff|sales")
     print("  GET  /create-proposal-from-transcript?transcript=sales")
     print("  GET  /youtube-outliers?keywords=AI+agents,ChatGPT&days=7&top_n=10")
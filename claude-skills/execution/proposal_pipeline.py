@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+Proposal pipeline used by modal_webhook.py's proposal endpoints: Claude extraction of a call
+transcript (cached per transcript), PandaDoc template tokens, and document create/send.
+
+PandaDoc calls go through pandadoc_request: paced per API key, retried only where a retry
+can't create or send a document twice. A create whose outcome is unknown is looked up by its
+proposal_ref metadata, never posted again.
+
+Usage:
+    from proposal_pipeline import create_pandadoc_document, extract_proposal_data
+
+    data, cached = extract_proposal_data(transcript, anthropic_client)
+    document = create_pandadoc_document(data["client"], data["project"], send=True)
+"""
+
+import os
+import json
+import time
+import uuid
+import random
+import hashlib
+import logging
+import threading
+from datetime import datetime
+
+import modal
+
+from sheet_writer import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+PANDADOC_URL = "https://api.pandadoc.com/public/v1/documents"
+PANDADOC_TEMPLATE_UUID = "G8GhAvKGa9D8dmpwTnEWyV"
+PANDADOC_REQUESTS_PER_SECOND = 2  # Document creation is rate limited per API key
+PANDADOC_MAX_RETRIES = 3  # Retries with exponential backoff (see pandadoc_request for which errors)
+PANDADOC_RETRY_STATUSES = {429, 500, 502, 503, 504}
+PANDADOC_POLL_INTERVAL = 2  # Seconds between status checks while a new document is processed
+PANDADOC_POLL_TIMEOUT = 60  # Give up waiting for draft state (and skip sending) after this long
+PANDADOC_LOOKUP_TIMEOUT = 30  # How long a create with an unknown outcome is looked up before giving up
+PROPOSAL_EXTRACTION_MODEL = "claude-opus-4-5-20251101"
+
+_pandadoc_limiter = RateLimiter(PANDADOC_REQUESTS_PER_SECOND)
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session(pool_size: int = 10):
+    """Pooled requests.Session for PandaDoc calls (keep-alive across calls and threads)."""
+    global _session
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            _session.mount("https://", HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size))
+        return _session
+
+PROPOSAL_EXTRACTION_PROMPT = """Analyze this sales call transcript and extract the following information. Return ONLY valid JSON.
+
+TRANSCRIPT:
+{transcript}
+
+Extract and return this exact JSON structure:
+{{
+  "client": {{
+    "firstName": "first name of the prospect",
+    "lastName": "last name of the prospect",
+    "email": "their email (use placeholder if not mentioned)",
+    "company": "their company name"
+  }},
+  "project": {{
+    "title": "short 3-4 word project title (e.g. 'Outbound Lead System', 'LinkedIn Growth Engine')",
+    "monthOneInvestment": "investment amount for month 1 (use 1980 if revenue share mentioned)",
+    "monthTwoInvestment": "monthly amount (use 0 for revenue share)",
+    "monthThreeInvestment": "monthly amount (use 0 for revenue share)",
+    "problems": {{
+      "problem01": "Expanded 1-2 paragraph (max 50 words) about their first pain point. Use 'you' language, focus on revenue impact.",
+      "problem02": "Expanded problem about their second pain point.",
+      "problem03": "Expanded problem about their third pain point.",
+      "problem04": "Expanded problem about their fourth pain point."
+    }},
+    "benefits": {{
+      "benefit01": "Expanded 1-2 paragraph (max 50 words) about benefit 1. Focus on ROI and concrete deliverables.",
+      "benefit02": "Expanded benefit 2.",
+      "benefit03": "Expanded benefit 3.",
+      "benefit04": "Expanded benefit 4."
+    }}
+  }}
+}}
+
+RULES for problems:
+- Use direct "you" language (not third-person)
+- Focus on revenue impact and dollar amounts
+- Be specific and actionable
+- Example: "Right now, your top-of-funnel is converting very poorly to booked meetings. You have no problem generating opportunities; your problem is capitalizing on them."
+
+RULES for benefits:
+- Use direct "you" language
+- Emphasize ROI and payback period
+- Focus on concrete deliverables and measurable results
+
+Return ONLY the JSON, no markdown code blocks or explanations."""
+
+# Extractions are cached by transcript content, so re-rendering a proposal (e.g. after a template
+# tweak) skips the model call. The key includes the model and a hash of the prompt: changing either
+# invalidates old entries. "model|prompt version|transcript sha256" -> {"data": dict, "at": unix time}
+proposal_extraction_cache = modal.Dict.from_name("claude-orchestrator-proposal-extractions", create_if_missing=True)
+PROPOSAL_PROMPT_VERSION = hashlib.sha256(PROPOSAL_EXTRACTION_PROMPT.encode()).hexdigest()[:12]
+
+
+def proposal_extraction_key(transcript_content: str) -> str:
+    """Cache key for one transcript under the current model and prompt."""
+    transcript_hash = hashlib.sha256(transcript_content.encode()).hexdigest()
+    return f"{PROPOSAL_EXTRACTION_MODEL}|{PROPOSAL_PROMPT_VERSION}|{transcript_hash}"
+
+
+def extract_proposal_data(transcript_content: str, client, refresh: bool = False) -> tuple:
+    """
+    Pull client info and expanded problems/benefits out of a call transcript, cache-first.
+    refresh=True ignores (and replaces) a cached extraction. Returns (data, served_from_cache).
+    """
+    key = proposal_extraction_key(transcript_content)
+    if not refresh:
+        cached = proposal_extraction_cache.get(key)
+        if cached:
+            return cached["data"], True
+
+    if not client:
+        raise ValueError("ANTHROPIC_API_KEY not configured")
+
+    msg = client.messages.create(
+        model=PROPOSAL_EXTRACTION_MODEL,
+        max_tokens=4000,
+        messages=[{"role": "user", "content": PROPOSAL_EXTRACTION_PROMPT.format(transcript=transcript_content)}]
+    )
+
+    response_text = msg.content[0].text.strip()
+
+    # Remove markdown code blocks if present
+    if response_text.startswith("```"):
+        lines = response_text.split('\n')
+        response_text = '\n'.join(lines[1:-1])
+
+    data = json.loads(response_text)
+    proposal_extraction_cache[key] = {"data": data, "at": time.time()}
+    return data, False
+
+
+# Template token -> "client.<field>" / "project.<field>" path in the proposal schema.
+# Footer and created date are derived, see build_proposal_tokens.
+PROPOSAL_TOKENS = {
+    "Client.Company": "client.company",
+    "Personalization.Project.Title": "project.title",
+    "MonthOneInvestment": "project.monthOneInvestment",
+    "MonthTwoInvestment": "project.monthTwoInvestment",
+    "MonthThreeInvestment": "project.monthThreeInvestment",
+    "Personalization.Project.Problem01": "project.problems.problem01",
+    "Personalization.Project.Problem02": "project.problems.problem02",
+    "Personalization.Project.Problem03": "project.problems.problem03",
+    "Personalization.Project.Problem04": "project.problems.problem04",
+    "Personalization.Project.Benefit.01": "project.benefits.benefit01",
+    "Personalization.Project.Benefit.02": "project.benefits.benefit02",
+    "Personalization.Project.Benefit.03": "project.benefits.benefit03",
+    "Personalization.Project.Benefit.04": "project.benefits.benefit04",
+}
+_proposal_token_paths = [(name, tuple(path.split("."))) for name, path in PROPOSAL_TOKENS.items()]
+
+
+def build_proposal_tokens(client_info: dict, project: dict) -> list:
+    """PandaDoc template tokens for one proposal."""
+    data = {"client": client_info, "project": project}
+    tokens = []
+    for name, path in _proposal_token_paths:
+        value = data
+        for part in path:
+            value = value.get(part) if isinstance(value, dict) else None
+        tokens.append({"name": name, "value": "" if value is None else str(value)})
+
+    tokens.append({"name": "Slide.Footer", "value": f"{client_info.get('company', 'Client')} x YourCompany"})
+    tokens.append({"name": "Document.CreatedDate", "value": datetime.utcnow().strftime("%B %d, %Y")})
+    return tokens
+
+
+def request_not_sent(error) -> bool:
+    """True when a requests error happened before anything reached PandaDoc (connect timeout / refused / DNS)."""
+    import requests
+    from urllib3.exceptions import NewConnectionError
+
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    if isinstance(error, requests.ConnectionError):
+        reason = getattr(error.args[0], "reason", None) if error.args else None
+        return isinstance(reason, NewConnectionError)
+    return False
+
+
+def pandadoc_request(method: str, url: str, idempotent: bool = None, **kwargs):
+    """
+    One PandaDoc API call through the pooled session, paced by the shared limiter.
+    Idempotent calls (GETs by default) retry 429/5xx and network errors. Others (document
+    creation, /send) only retry 429 and connection errors where the request never went out,
+    so a retry can't create or send a document twice.
+    """
+    import requests
+
+    api_key = os.getenv("PANDADOC_API_KEY")
+    if not api_key:
+        raise ValueError("PANDADOC_API_KEY not configured")
+
+    headers = {
+        "Authorization": f"API-Key {api_key}",
+        "Content-Type": "application/json"
+    }
+
+    if idempotent is None:
+        idempotent = method.upper() == "GET"
+    retry_statuses = PANDADOC_RETRY_STATUSES if idempotent else {429}
+
+    session = get_session()
+    for attempt in range(PANDADOC_MAX_RETRIES + 1):
+        _pandadoc_limiter.wait()
+        try:
+            response = session.request(method, url, headers=headers, timeout=30, **kwargs)
+        except requests.RequestException as e:
+            if attempt == PANDADOC_MAX_RETRIES or not (idempotent or request_not_sent(e)):
+                raise
+            time.sleep(min(30, 2 ** attempt) + random.random())
+            continue
+
+        if response.status_code in retry_statuses and attempt < PANDADOC_MAX_RETRIES:
+            retry_after = response.headers.get("Retry-After", "")
+            time.sleep(float(retry_after) if retry_after.isdigit() else min(30, 2 ** attempt) + random.random())
+            continue
+
+        response.raise_for_status()
+        return response.json() if response.content else {}
+
+
+def outcome_unknown(error) -> bool:
+    """True when a failed POST may still have been applied: timed out / dropped after sending, or a 5xx."""
+    import requests
+
+    if isinstance(error, requests.HTTPError):
+        return error.response is not None and error.response.status_code >= 500
+    return isinstance(error, requests.RequestException) and not request_not_sent(error)
+
+
+def find_pandadoc_document(proposal_ref: str):
+    """The document created with this proposal_ref metadata, or None."""
+    found = pandadoc_request("GET", PANDADOC_URL, params={"metadata_proposal_ref": proposal_ref})
+    results = found.get("results") or []
+    return results[0] if results else None
+
+
+def wait_for_document_status(doc_id: str, target: str = "document.draft", timeout: float = PANDADOC_POLL_TIMEOUT) -> str:
+    """Poll a new document until it reaches target (PandaDoc processes templates asynchronously). Returns the last status."""
+    deadline = time.time() + timeout
+    while True:
+        status = pandadoc_request("GET", f"{PANDADOC_URL}/{doc_id}").get("status", "")
+        if status == target or status == "document.error" or time.time() >= deadline:
+            return status
+        time.sleep(PANDADOC_POLL_INTERVAL)
+
+
+def create_pandadoc_document(client_info: dict, project: dict, default_email: str = "", send: bool = False, message: str = "") -> dict:
+    """
+    Create a proposal from the template. Accepts client names as first_name/last_name or
+    firstName/lastName (Claude extraction). With send=True, waits for the draft and sends it;
+    sending needs the client's own email (default_email is a placeholder recipient for drafts).
+    Returns {"document_id", "document_url", "document_status", "sent"}. If the document was
+    created but couldn't be sent, "sent" is False and "send_error" says why.
+    """
+    email = (client_info.get("email") or "").strip()
+    if send and (not email or email.lower().endswith("@example.com")):
+        raise ValueError(f"Refusing to send: no client email for {client_info.get('company', 'Client')} (create without send, add the email, then send)")
+
+    payload = {
+        "name": f"Proposal - {client_info.get('company', 'Client')} - {project.get('title', 'Project')}",
+        "template_uuid": PANDADOC_TEMPLATE_UUID,
+        "recipients": [
+            {
+                "email": email or default_email,
+                "first_name": client_info.get("first_name") or client_info.get("firstName", ""),
+                "last_name": client_info.get("last_name") or client_info.get("lastName", ""),
+                "role": "Client"
+            }
+        ],
+        "tokens": build_proposal_tokens(client_info, project)
+    }
+
+    # Tag the document so a create whose response was lost can be found instead of created twice
+    proposal_ref = uuid.uuid4().hex
+    payload["metadata"] = {"proposal_ref": proposal_ref}
+
+    try:
+        doc = pandadoc_request("POST", PANDADOC_URL, json=payload)
+    except Exception as e:
+        if not outcome_unknown(e):
+            raise
+        # Never POST again: the document may exist but not be listed yet
+        logger.warning(f"PandaDoc create outcome unknown ({e}), looking up proposal_ref {proposal_ref}")
+        deadline = time.time() + PANDADOC_LOOKUP_TIMEOUT
+        doc = None
+        while doc is None:
+            time.sleep(PANDADOC_POLL_INTERVAL)
+            doc = find_pandadoc_document(proposal_ref)
+            if doc is None and time.time() >= deadline:
+                raise RuntimeError(
+                    f"PandaDoc create outcome unknown ({e}); not retried to avoid a duplicate. "
+                    f"Check for a document with metadata proposal_ref={proposal_ref} before creating it again"
+                ) from e
+    doc_id = doc.get("id")
+    document = {
+        "document_id": doc_id,
+        "document_url": f"https://app.pandadoc.com/a/#/documents/{doc_id}",
+        "document_status": doc.get("status", "document.uploaded"),
+        "sent": False
+    }
+    if not send:
+        return document
+
+    # The document exists from here on: a failed send reports "created, not sent" rather than raising
+    try:
+        document["document_status"] = wait_for_document_status(doc_id)
+        if document["document_status"] != "document.draft":
+            raise RuntimeError(f"Document not ready to send (status: {document['document_status']})")
+        try:
+            sent = pandadoc_request("POST", f"{PANDADOC_URL}/{doc_id}/send", json={"message": message, "silent": False})
+        except Exception as e:
+            # Never re-send: if the send went through, the document has already left draft
+            if not outcome_unknown(e):
+                raise
+            sent = pandadoc_request("GET", f"{PANDADOC_URL}/{doc_id}")
+            if sent.get("status") == "document.draft":
+                raise
+        document["document_status"] = sent.get("status", "document.sent")
+        document["sent"] = True
+    except Exception as e:
+        logger.warning(f"PandaDoc document {doc_id} created, not sent: {e}")
+        document["send_error"] = str(e)
+    return document
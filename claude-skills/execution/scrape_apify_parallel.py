@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Partitioned Lead Scraper - PARALLEL VERSION
+
+Splits one large lead pull into partitions, runs one Apify actor per partition
+concurrently, then merges the results and drops duplicates (same place/LinkedIn/email,
+or same name + company) that overlapping partitions returned.
+
+Partition strategies:
+    regions   Split the location: "United States" by state, or an explicit
+              "Texas; Florida; Ohio" list by its entries (default)
+    keywords  Split a comma-separated --query ("dentist, orthodontist") by keyword
+
+Usage:
+    # 4000 dentists across the US, 4 concurrent runs
+    python3 execution/scrape_apify_parallel.py --query "Dentist" --location "United States" \
+        --total_count 4000 --partitions 4 --no-email-filter
+
+    # Single run (sequential baseline for benchmark_parallel_scraping.sh)
+    python3 execution/scrape_apify_parallel.py --query "Dentist" --total_count 4000 --partitions 1
+
+Output: .tmp/{output_prefix}_{timestamp}.json (or --output path)
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from datetime import datetime
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dotenv import load_dotenv
+
+from lead_partitions import MAX_PARTITIONS, STRATEGIES, build_run_inputs, lead_key
+
+# Load environment variables
+load_dotenv()
+
+ACTOR_ID = "code_crafter/leads-finder"
+
+
+def scrape_partition(client, run_input: dict) -> list:
+    """Run the actor for one partition and return its items."""
+    run = client.actor(ACTOR_ID).call(run_input=run_input)
+    if run["status"] != "SUCCEEDED":
+        raise RuntimeError(f"Apify run {run['id']} ended {run['status']}")
+    return list(client.dataset(run["defaultDatasetId"]).iterate_items())
+
+
+def merge_leads(partition_results: list, total_count: int, email_filter: bool) -> tuple:
+    """Merge partition results in order, dropping duplicates (and leads without email when filtering)."""
+    seen = set()
+    leads = []
+    stats = {"duplicates": 0, "no_email": 0}
+    for items in partition_results:
+        for item in items:
+            if email_filter and not item.get("email"):
+                stats["no_email"] += 1
+                continue
+            key = lead_key(item)
+            if key in seen:
+                stats["duplicates"] += 1
+                continue
+            seen.add(key)
+            leads.append(item)
+    return leads[:total_count], stats
+
+
+def main():
+    """
+    Main execution function.
+
+    Returns:
+        int: Exit code (0 for success, non-zero for failure)
+    """
+    parser = argparse.ArgumentParser(description="Scrape leads with concurrent partitioned Apify runs")
+    parser.add_argument("--query", required=True, help="Industry / job keyword(s); comma-separated for --strategy keywords")
+    parser.add_argument("--location", default="United States", help='Location, or "A; B; C" list (default: United States)')
+    parser.add_argument("--total_count", type=int, default=1000, help="Total leads to fetch (default: 1000)")
+    parser.add_argument("--partitions", type=int, default=4, help=f"Concurrent actor runs, max {MAX_PARTITIONS} (default: 4)")
+    parser.add_argument("--strategy", choices=STRATEGIES, default="regions", help="How to split the pull (default: regions)")
+    parser.add_argument("--no-email-filter", action="store_true", help="Keep leads without an email")
+    parser.add_argument("--output_prefix", default="leads", help="Output file prefix in .tmp/ (default: leads)")
+    parser.add_argument("--output", help="Explicit output path (overrides --output_prefix)")
+    args = parser.parse_args()
+
+    try:
+        api_token = os.getenv("APIFY_API_TOKEN")
+        if not api_token:
+            raise ValueError("APIFY_API_TOKEN not set")
+
+        from apify_client import ApifyClient
+        client = ApifyClient(api_token)
+
+        run_inputs = build_run_inputs(args.query, args.location, args.total_count, args.partitions, args.strategy)
+        print(f"Scraping {args.total_count} leads for '{args.query}' in {args.location} ({len(run_inputs)} partitions)")
+
+        start = time.time()
+        results = [[] for _ in run_inputs]
+        failed = 0
+        with ThreadPoolExecutor(max_workers=len(run_inputs)) as executor:
+            futures = {executor.submit(scrape_partition, client, run_input): i for i, run_input in enumerate(run_inputs)}
+            for future in as_completed(futures):
+                i = futures[future]
+                try:
+                    results[i] = future.result()
+                    print(f"  ✓ Partition {i + 1}/{len(run_inputs)}: {len(results[i])} leads ({time.time() - start:.0f}s)")
+                except Exception as e:
+                    failed += 1
+                    print(f"  ✗ Partition {i + 1}/{len(run_inputs)} failed: {e}", file=sys.stderr)
+
+        if failed == len(run_inputs):
+            raise RuntimeError("All partitions failed")
+
+        leads, stats = merge_leads(results, args.total_count, email_filter=not args.no_email_filter)
+
+        output_path = Path(args.output) if args.output else Path(".tmp") / f"{args.output_prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        output_path.write_text(json.dumps(leads, indent=2))
+
+        print(f"\nMerged {len(leads)} leads in {time.time() - start:.0f}s "
+              f"({stats['duplicates']} duplicates, {stats['no_email']} without email dropped)")
+        print(f"Saved to {output_path}")
+        return 0
+
+    except Exception as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    exit_code = main()
+    sys.exit(exit_code)
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Quota-aware Google Sheets writer shared by modal_webhook.py and the for_youtube cross-niche scrapers.
+
+Queue writes with update()/batch_update(), then flush(): cells are coalesced into
+rectangles, sent in batches sized to stay under Sheets payload limits, paced to the
+per-minute write quota, and 429/5xx responses are retried with jittered backoff.
+
+Usage (for_youtube scripts put claude-skills/execution on sys.path first):
+    from sheet_writer import SheetWriter
+
+    writer = SheetWriter(worksheet, value_input_option="USER_ENTERED")
+    writer.update("A1", rows)
+    writer.flush()
+"""
+
+import re
+import time
+import random
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+SHEETS_WRITES_PER_MINUTE = 60  # Sheets API write quota per user (requests/minute)
+SHEETS_BATCH_MAX_CELLS = 40000  # Cells per batch_update request (keeps payloads well under the 10MB limit)
+SHEETS_MAX_RETRIES = 5  # Retries on 429/5xx, with jittered exponential backoff
+SHEETS_RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class RateLimiter:
+    """Thread-safe limiter that spaces calls at least 1/rate seconds apart."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate
+        self.lock = threading.Lock()
+        self.next_at = 0.0
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            delay = self.next_at - now
+            self.next_at = max(now, self.next_at) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+_sheets_limiter = RateLimiter(SHEETS_WRITES_PER_MINUTE / 60)
+
+
+def column_letter(n):
+    """Convert column index (0-based) to Excel-style column letter (A, B, ... Z, AA, AB, ...)."""
+    result = ""
+    while n >= 0:
+        result = chr(65 + (n % 26)) + result
+        n = n // 26 - 1
+    return result
+
+
+def parse_a1(cell: str) -> tuple:
+    """"B12" (or the start of "B12:C20") -> (row, column), both 1-based."""
+    match = re.match(r"([A-Za-z]+)(\d+)", cell)
+    if not match:
+        raise ValueError(f"Unsupported A1 range: {cell}")
+    col = 0
+    for char in match.group(1).upper():
+        col = col * 26 + ord(char) - 64
+    return int(match.group(2)), col
+
+
+class SheetWriter:
+    """
+    Queues cell/range writes to one worksheet and sends them as few, quota-friendly requests.
+    Later writes to a cell replace earlier ones; adjacent cells are coalesced into rectangles,
+    which are flushed in batches of at most SHEETS_BATCH_MAX_CELLS, with 429s retried.
+    Thread-safe: several threads can queue into the same writer, and flushes run one at a time
+    so a later flush can never overtake (and be overwritten by) an earlier one.
+    """
+
+    def __init__(self, worksheet, value_input_option: str = "RAW", max_cells: int = SHEETS_BATCH_MAX_CELLS):
+        self.worksheet = worksheet
+        self.value_input_option = value_input_option
+        self.max_cells = max_cells
+        self.cells = {}  # (row, col) -> value
+        self.lock = threading.Lock()  # Guards the queued cells
+        self.send_lock = threading.Lock()  # Held from taking the queue until it's written
+        self.requests = 0
+
+    def update(self, range_name: str, values: list):
+        """Queue a 2D block of values whose top-left cell is the start of range_name."""
+        top, left = parse_a1(range_name)
+        with self.lock:
+            for r, row in enumerate(values):
+                for c, value in enumerate(row):
+                    self.cells[(top + r, left + c)] = value
+            pending = len(self.cells)
+        if pending >= self.max_cells:
+            self.flush()
+
+    def batch_update(self, data: list):
+        """Queue gspread-style [{"range": ..., "values": ...}] entries."""
+        for entry in data:
+            self.update(entry["range"], entry["values"])
+
+    def rectangles(self, cells: dict) -> list:
+        """Coalesce cells into (top, left, 2D values) blocks: vertical runs per column, then equal runs side by side."""
+        rows_by_col = {}
+        for r, c in cells:
+            rows_by_col.setdefault(c, []).append(r)
+
+        runs = []  # (top, bottom, col, values)
+        for col in sorted(rows_by_col):
+            rows = sorted(rows_by_col[col])
+            start = 0
+            for i in range(1, len(rows) + 1):
+                if i == len(rows) or rows[i] != rows[i - 1] + 1:
+                    top, bottom = rows[start], rows[i - 1]
+                    runs.append((top, bottom, col, [cells[(r, col)] for r in range(top, bottom + 1)]))
+                    start = i
+
+        blocks = []
+        open_blocks = {}  # (top, bottom) -> block still growing to the right
+        for top, bottom, col, values in runs:
+            block = open_blocks.get((top, bottom))
+            if block and block["right"] == col - 1:
+                for row, value in zip(block["values"], values):
+                    row.append(value)
+                block["right"] = col
+            else:
+                block = {"top": top, "left": col, "right": col, "values": [[value] for value in values]}
+                open_blocks[(top, bottom)] = block
+                blocks.append(block)
+        return [(block["top"], block["left"], block["values"]) for block in blocks]
+
+    def flush(self) -> int:
+        """Write everything queued. Returns the number of cells written."""
+        with self.send_lock:
+            with self.lock:
+                cells, self.cells = self.cells, {}
+            if cells:
+                self._write(cells)
+            return len(cells)
+
+    def _write(self, cells: dict):
+        """Resize the sheet if needed and send the cells as size-capped batch_update requests."""
+        # Grow the sheet first; values outside the grid are rejected
+        max_row = max(r for r, _ in cells)
+        max_col = max(c for _, c in cells)
+        if max_row > self.worksheet.row_count or max_col > self.worksheet.col_count:
+            self.worksheet.resize(rows=max(max_row, self.worksheet.row_count), cols=max(max_col, self.worksheet.col_count))
+
+        batch, batch_cells = [], 0
+        for top, left, values in self.rectangles(cells):
+            width = len(values[0])
+            rows_per_part = max(1, self.max_cells // width)
+            for offset in range(0, len(values), rows_per_part):
+                part = values[offset:offset + rows_per_part]
+                if batch and batch_cells + len(part) * width > self.max_cells:
+                    self._send(batch)
+                    batch, batch_cells = [], 0
+                batch.append({"range": f"{column_letter(left - 1)}{top + offset}", "values": part})
+                batch_cells += len(part) * width
+        if batch:
+            self._send(batch)
+
+    def _send(self, batch: list):
+        """One batch_update request, paced by the shared quota limiter, retrying 429/5xx."""
+        from gspread.exceptions import APIError
+
+        for attempt in range(SHEETS_MAX_RETRIES + 1):
+            _sheets_limiter.wait()
+            try:
+                self.worksheet.batch_update(batch, value_input_option=self.value_input_option)
+                self.requests += 1
+                return
+            except APIError as e:
+                status = getattr(e.response, "status_code", None)
+                if status not in SHEETS_RETRY_STATUSES or attempt == SHEETS_MAX_RETRIES:
+                    raise
+                delay = min(64, 2 ** attempt) + random.uniform(0, 1)
+                logger.warning(f"Sheets write got {status}, retrying in {delay:.1f}s")
+                time.sleep(delay)
@@ -24,6 +24,9 @@ from google.oauth2.credentials import Credentials
 from google.oauth2.service_account import Credentials as ServiceAccountCredentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
+# SheetWriter is shared with the webhook server in claude-skills/execution
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "execution"))
+from sheet_writer import SheetWriter  # noqa: E402
 
 # Load environment variables
 load_dotenv()
@@ -1031,7 +1034,9 @@ def main():
             o.get("source", "")
         ])
 
-    worksheet.update(range_name='A1', values=rows, value_input_option='USER_ENTERED')
+    writer = SheetWriter(worksheet, value_input_option='USER_ENTERED')
+    writer.update('A1', rows)
+    writer.flush()
 
     print(f"\n✅ Done! Created sheet with {len(outliers)} cross-niche outliers")
     print(f"   Each outlier has 3 title variants adapted for {USER_CHANNEL_NICHE}")